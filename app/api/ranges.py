@@ -0,0 +1,168 @@
+"""Object download responses with single-range and If-Range support."""
+
+import datetime as dt
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.services.utils import parse_range_spec, resolve_range
+
+_ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+_CHUNK_SIZE = 1024 * 1024
+HTTP_416_RANGE_NOT_SATISFIABLE = 416
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    size: int
+    etag: str | None
+    last_modified: dt.datetime | None
+    content_type: str
+
+
+class RangeNotSatisfiableError(Exception):
+    pass
+
+
+def _if_range_matches(value: str, info: ObjectInfo) -> bool:
+    value = value.strip()
+    if value.startswith(('"', "W/")):
+        # Ranges may only be resumed against a strong validator.
+        return not value.startswith("W/") and value == info.etag
+    if info.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return False
+    return int(since.timestamp()) == int(info.last_modified.timestamp())
+
+
+def requested_range(
+    headers: Mapping[str, str], info: ObjectInfo
+) -> tuple[int, int] | None:
+    """Inclusive byte bounds to serve, or None for the whole object.
+
+    Multi-range requests and ranges whose If-Range validator no longer
+    matches get the full object, as RFC 9110 allows.
+    """
+    header = headers.get("range")
+    if not header or "," in header or not header.lower().startswith("bytes="):
+        return None
+    if_range = headers.get("if-range")
+    if if_range and not _if_range_matches(if_range, info):
+        return None
+    spec = parse_range_spec(header)
+    if spec is None:
+        # Malformed: ignored, as RFC 9110 requires.
+        return None
+    bounds = resolve_range(spec, info.size)
+    if bounds is None:
+        raise RangeNotSatisfiableError
+    return bounds
+
+
+def object_headers(
+    info: ObjectInfo, bounds: tuple[int, int] | None, extra: dict[str, str]
+) -> dict[str, str]:
+    start, end = bounds or (0, info.size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(max(end - start + 1, 0)),
+        **extra,
+    }
+    if info.etag:
+        headers["ETag"] = info.etag
+    if info.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            info.last_modified.astimezone(dt.UTC), usegmt=True
+        )
+    if bounds is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    return headers
+
+
+def range_not_satisfiable(info: ObjectInfo) -> Response:
+    return Response(
+        status_code=HTTP_416_RANGE_NOT_SATISFIABLE,
+        headers={"Content-Range": f"bytes */{info.size}", "Accept-Ranges": "bytes"},
+    )
+
+
+class FileRangeResponse(Response):
+    """Serves ``length`` bytes of a file from ``offset``.
+
+    Uses the ASGI zero-copy send extension (sendfile) when the server offers
+    it; otherwise reads the range in chunks off the event loop.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: Path,
+        *,
+        offset: int,
+        length: int,
+        status_code: int,
+        headers: dict[str, str],
+        media_type: str,
+        background: BackgroundTask | None = None,
+    ):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = background
+        self.init_headers(headers)
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send  # noqa: ARG002
+    ) -> None:
+        with open(self.path, "rb") as file:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            if _ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": _ZEROCOPY_EXTENSION,
+                        "file": file,
+                        "offset": self.offset,
+                        "count": self.length,
+                    }
+                )
+            else:
+                await self._send_chunks(file.fileno(), send)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_chunks(self, fd: int, send: Send) -> None:
+        position, remaining = self.offset, self.length
+        while remaining > 0:
+            chunk = await anyio.to_thread.run_sync(
+                os.pread, fd, min(_CHUNK_SIZE, remaining), position
+            )
+            if not chunk:
+                break
+            position += len(chunk)
+            remaining -= len(chunk)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                }
+            )
+        if remaining > 0 or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
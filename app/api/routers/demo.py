@@ -23,5 +23,6 @@ async def start_demo(response: Response, _: None = _RL_DEMO_START_DEP):
         secure=settings.app_env == "prod",
         max_age=deps.DEMO_COOKIE_MAX_AGE_SECONDS,
     )
-    # TODO: Add scheduled cleanup to delete expired demo files from storage and DB.
+    # Expired demo users and their files are purged by
+    # app.services.maintenance.cleanup_expired_demos.
     return {"ok": True}
@@ -1,20 +1,55 @@
 import datetime as dt
-import hashlib
+import math
 import uuid
+from pathlib import Path
+from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel
+from fastapi.responses import RedirectResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api import deps
+from app.api.ranges import (
+    FileRangeResponse,
+    ObjectInfo,
+    RangeNotSatisfiableError,
+    object_headers,
+    range_not_satisfiable,
+    requested_range,
+)
+from app.core.metrics import SCAN_ADMISSION_REJECTIONS
 from app.core.rate_limit import rate_limit_user
 from app.core.security import get_password_hash
 from app.db import models
+from app.services.admission import check_admission
 from app.services.audit import log_event
+from app.services.dedup import acquire_reference, find_duplicate
 from app.services.file_type_policy import validate_upload_metadata
+from app.services.inspection import (
+    SNIFF_RANGE,
+    ZIP_TAIL_BYTES,
+    ObjectInspector,
+    inspect_zip_tail,
+    inspection_record,
+    sniff_mime,
+)
+from app.services.local_storage import LocalStorageClient
 from app.services.quota import QuotaService
-from app.services.scanner import enqueue_scan
-from app.services.storage import StorageClient
+from app.services.scanner import (
+    MAX_SIZE_BYTES,
+    OFFICE_REQUIRED_ZIP_ENTRIES,
+    enqueue_scan,
+)
+from app.services.storage import (
+    AsyncStorageBackend,
+    download_response_params,
+    get_async_storage,
+    get_storage,
+    stored_checksum_sha256_hex,
+)
+from app.services.url_cache import get_download_url_cache
 from app.web import templates
 
 router = APIRouter()
@@ -25,8 +60,13 @@ _CURRENT_USER_OPTIONAL_DEP = Depends(deps.get_current_user_optional)
 _DEMO_ID_DEP = Depends(deps.get_demo_id)
 _RL_INIT_DEP = Depends(rate_limit_user("files_init", 10, 60))
 _RL_COMPLETE_DEP = Depends(rate_limit_user("files_complete", 20, 60))
+_RL_PARTS_DEP = Depends(rate_limit_user("files_parts", 60, 60))
 _RL_DOWNLOAD_URL_DEP = Depends(rate_limit_user("files_download_url", 30, 60))
+# Resumed downloads issue one request per range.
+_RL_CONTENT_DEP = Depends(rate_limit_user("files_content", 120, 60))
 DEMO_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+S3_MAX_PARTS = 10_000
+_MULTIPART_INVALID_CODES = {"EntityTooSmall", "InvalidPart", "InvalidPartOrder"}
 
 
 def utcnow_naive() -> dt.datetime:
@@ -39,14 +79,38 @@ class InitRequest(BaseModel):
     content_type: str
     checksum_sha256: str
     size_bytes: int | None = None
+    upload_mode: Literal["single", "multipart", "post"] = "single"
+
+
+class PresignedPart(BaseModel):
+    part_number: int
+    url: str
 
 
 class InitResponse(BaseModel):
     file_id: str
     object_key: str
-    upload_url: str
+    upload_url: str | None = None
     expires_in: int
     headers_to_include: dict[str, str]
+    upload_id: str | None = None
+    part_size: int | None = None
+    parts: list[PresignedPart] = Field(default_factory=list)
+    # "post" mode: form fields to send (before the file) with a POST to upload_url.
+    fields: dict[str, str] = Field(default_factory=dict)
+    # True when an identical ACTIVE upload was reused: nothing to PUT/complete.
+    deduplicated: bool = False
+    state: models.FileObjectState = models.FileObjectState.INITIATED
+
+
+class PartUrlsRequest(BaseModel):
+    part_numbers: list[int] = Field(min_length=1)
+
+
+class PartUrlsResponse(BaseModel):
+    upload_id: str
+    parts: list[PresignedPart]
+    expires_in: int
 
 
 class CompleteResponse(BaseModel):
@@ -87,6 +151,147 @@ def _require_demo_started(demo_id: str | None) -> str:
     return demo_id
 
 
+def _get_upload_for_actor(
+    db: Session,
+    file_id: str,
+    current_user: models.User | None,
+    demo_id: str | None,
+) -> models.FileObject:
+    file_obj: models.FileObject | None = db.get(models.FileObject, file_id)
+    if not file_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
+        )
+    if current_user:
+        if (
+            current_user.role != models.UserRole.admin
+            and file_obj.owner_id != current_user.id
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden"
+            )
+    else:
+        resolved_demo_id = _require_demo_started(demo_id)
+        if file_obj.demo_id != resolved_demo_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
+            )
+    if file_obj.state != models.FileObjectState.INITIATED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload not in INITIATED state",
+        )
+    if file_obj.upload_expires_at and file_obj.upload_expires_at < utcnow_naive():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Upload request expired"
+        )
+    return file_obj
+
+
+def _presign_parts(
+    storage: AsyncStorageBackend,
+    file_obj: models.FileObject,
+    part_numbers: list[int],
+    expires_in: int,
+) -> list[PresignedPart]:
+    return [
+        PresignedPart(
+            part_number=number,
+            url=storage.generate_presigned_upload_part(
+                file_obj.object_key,
+                file_obj.multipart_upload_id,
+                number,
+                expires=expires_in,
+            ),
+        )
+        for number in part_numbers
+    ]
+
+
+async def _complete_multipart(
+    storage: AsyncStorageBackend, file_obj: models.FileObject
+) -> None:
+    try:
+        parts = await storage.list_parts(
+            file_obj.bucket, file_obj.object_key, file_obj.multipart_upload_id
+        )
+        if not parts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Object not uploaded"
+            )
+        await storage.complete_multipart_upload(
+            file_obj.bucket,
+            file_obj.object_key,
+            file_obj.multipart_upload_id,
+            sorted(parts, key=lambda part: part["PartNumber"]),
+        )
+    except storage.not_found_exc as exc:
+        error_code = exc.response.get("Error", {}).get("Code")
+        if error_code == "NoSuchUpload":
+            # Completed by an earlier attempt (or aborted); head_object decides.
+            return
+        if error_code in _MULTIPART_INVALID_CODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid multipart upload",
+            ) from exc
+        raise
+
+
+def _init_from_duplicate(  # noqa: PLR0913
+    db: Session,
+    request: Request,
+    payload: InitRequest,
+    source: models.FileObject,
+    *,
+    owner_id: str,
+    demo_id: str | None,
+    actor_user_id: str | None,
+) -> InitResponse:
+    try:
+        QuotaService(db).increment_on_active(owner_id, source.size_bytes or 0)
+    except PermissionError as err:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="quota exceeded"
+        ) from err
+
+    file_obj = models.FileObject(
+        owner_id=owner_id,
+        bucket=source.bucket,
+        object_key=source.object_key,
+        original_filename=payload.original_filename,
+        declared_content_type=payload.content_type,
+        checksum_sha256=source.checksum_sha256,
+        demo_id=demo_id,
+        checksum_verified=True,
+        size_bytes=source.size_bytes,
+        sniffed_content_type=source.sniffed_content_type,
+        inspection=source.inspection,
+        state=models.FileObjectState.ACTIVE,
+    )
+    db.add(file_obj)
+    acquire_reference(db, source.bucket, source.object_key)
+    db.commit()
+    db.refresh(file_obj)
+
+    log_event(
+        db,
+        actor_user_id=actor_user_id,
+        action="FILE_DEDUPLICATED",
+        file_id=file_obj.id,
+        request=request,
+        metadata={"source_file_id": source.id},
+    )
+    return InitResponse(
+        file_id=file_obj.id,
+        object_key=file_obj.object_key,
+        expires_in=0,
+        headers_to_include={},
+        deduplicated=True,
+        state=file_obj.state,
+    )
+
+
 def _get_or_create_demo_user(db: Session, demo_id: str) -> models.User:
     demo_user = db.get(models.User, demo_id)
     if demo_user:
@@ -105,7 +310,7 @@ def _get_or_create_demo_user(db: Session, demo_id: str) -> models.User:
 
 
 @router.post("/init", response_model=InitResponse)
-async def init_upload(
+async def init_upload(  # noqa: PLR0912
     payload: InitRequest,
     request: Request,
     db: Session = _DB_DEP,
@@ -122,6 +327,28 @@ async def init_upload(
     actor_user_id = current_user.id if current_user else None
     file_demo_id: str | None = None
 
+    storage = get_async_storage()
+    if payload.upload_mode == "multipart" and not storage.supports_multipart:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="multipart uploads are not supported by this storage backend",
+        )
+    if payload.upload_mode == "post" and not storage.supports_post:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="POST uploads are not supported by this storage backend",
+        )
+
+    part_size = settings.multipart_part_size_bytes
+    total_parts: int | None = None
+    if payload.upload_mode == "multipart" and payload.size_bytes:
+        total_parts = math.ceil(payload.size_bytes / part_size)
+        if total_parts > S3_MAX_PARTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="upload exceeds maximum multipart part count",
+            )
+
     if current_user:
         owner_id = current_user.id
         try:
@@ -139,6 +366,43 @@ async def init_upload(
             )
         owner_id = _get_or_create_demo_user(db, file_demo_id).id
 
+    max_size = DEMO_MAX_UPLOAD_BYTES if file_demo_id else MAX_SIZE_BYTES
+    if (
+        payload.upload_mode == "post"
+        and payload.size_bytes
+        and payload.size_bytes > max_size
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="upload size exceeds limit",
+        )
+
+    if settings.upload_dedup_enabled and payload.size_bytes:
+        source = find_duplicate(
+            db,
+            owner_id=owner_id,
+            checksum_sha256=payload.checksum_sha256,
+            size_bytes=payload.size_bytes,
+            original_filename=payload.original_filename,
+            declared_content_type=payload.content_type,
+        )
+        if source is not None:
+            return _init_from_duplicate(
+                db,
+                request,
+                payload,
+                source,
+                owner_id=owner_id,
+                demo_id=file_demo_id,
+                actor_user_id=actor_user_id,
+            )
+
+    upload_id: str | None = None
+    if payload.upload_mode == "multipart":
+        upload_id = await storage.create_multipart_upload(
+            settings.minio_bucket, object_key, payload.content_type
+        )
+
     file_obj = models.FileObject(
         owner_id=owner_id,
         bucket=settings.minio_bucket,
@@ -149,18 +413,12 @@ async def init_upload(
         demo_id=file_demo_id,
         state=models.FileObjectState.INITIATED,
         upload_expires_at=expires_at,
+        multipart_upload_id=upload_id,
     )
     db.add(file_obj)
     db.commit()
     db.refresh(file_obj)
 
-    storage = StorageClient()
-    presigned = storage.generate_presigned_put(
-        key=file_obj.object_key,
-        content_type=payload.content_type,
-        expires_in=settings.upload_presign_ttl_seconds,
-    )
-
     log_event(
         db,
         actor_user_id=actor_user_id,
@@ -169,6 +427,59 @@ async def init_upload(
         request=request,
     )
 
+    if upload_id:
+        batch = min(
+            total_parts or settings.multipart_presign_batch_size,
+            settings.multipart_presign_batch_size,
+        )
+        return InitResponse(
+            file_id=file_obj.id,
+            object_key=file_obj.object_key,
+            expires_in=settings.upload_presign_ttl_seconds,
+            headers_to_include={},
+            upload_id=upload_id,
+            part_size=part_size,
+            parts=_presign_parts(
+                storage,
+                file_obj,
+                list(range(1, batch + 1)),
+                settings.upload_presign_ttl_seconds,
+            ),
+        )
+
+    if payload.upload_mode == "post":
+        # Storage enforces the size itself, so an oversized body is refused
+        # before it is stored rather than quarantined after complete.
+        post = storage.generate_presigned_post(
+            key=file_obj.object_key,
+            content_type=payload.content_type,
+            content_length_range=(
+                (payload.size_bytes, payload.size_bytes)
+                if payload.size_bytes
+                else (0, max_size)
+            ),
+            expires_in=settings.upload_presign_ttl_seconds,
+            checksum_sha256=(
+                payload.checksum_sha256 if settings.storage_native_checksums else None
+            ),
+        )
+        return InitResponse(
+            file_id=file_obj.id,
+            object_key=file_obj.object_key,
+            upload_url=post.url,
+            expires_in=settings.upload_presign_ttl_seconds,
+            headers_to_include={},
+            fields=post.fields,
+        )
+
+    presigned = storage.generate_presigned_put(
+        key=file_obj.object_key,
+        content_type=payload.content_type,
+        expires_in=settings.upload_presign_ttl_seconds,
+        checksum_sha256=(
+            payload.checksum_sha256 if settings.storage_native_checksums else None
+        ),
+    )
     return InitResponse(
         file_id=file_obj.id,
         object_key=file_obj.object_key,
@@ -178,48 +489,72 @@ async def init_upload(
     )
 
 
-@router.post("/{file_id}/complete", response_model=CompleteResponse)
-async def complete_upload(  # noqa: PLR0912, PLR0915
+@router.post("/{file_id}/parts", response_model=PartUrlsResponse)
+async def part_urls(
     file_id: str,
-    request: Request,
+    payload: PartUrlsRequest,
     db: Session = _DB_DEP,
     current_user: models.User | None = _CURRENT_USER_OPTIONAL_DEP,
     demo_id: str | None = _DEMO_ID_DEP,
-    _: None = _RL_COMPLETE_DEP,
+    _: None = _RL_PARTS_DEP,
 ):
-    file_obj: models.FileObject | None = db.get(models.FileObject, file_id)
-    if not file_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
-        )
-    actor_user_id = current_user.id if current_user else None
-    if current_user:
-        if (
-            current_user.role != models.UserRole.admin
-            and file_obj.owner_id != current_user.id
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden"
-            )
-    else:
-        resolved_demo_id = _require_demo_started(demo_id)
-        if file_obj.demo_id != resolved_demo_id:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
-            )
-    if file_obj.state != models.FileObjectState.INITIATED:
+    from app.core.config import settings  # imported lazily to avoid cycle
+
+    file_obj = _get_upload_for_actor(db, file_id, current_user, demo_id)
+    if not file_obj.multipart_upload_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Upload not in INITIATED state",
+            detail="Upload is not a multipart upload",
         )
-    if file_obj.upload_expires_at and file_obj.upload_expires_at < utcnow_naive():
+    part_numbers = sorted(set(payload.part_numbers))
+    if (
+        len(part_numbers) > settings.multipart_presign_batch_size
+        or part_numbers[0] < 1
+        or part_numbers[-1] > S3_MAX_PARTS
+    ):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Upload request expired"
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid part numbers"
         )
 
-    storage = StorageClient()
+    # Part URLs never outlive the upload window itself.
+    expires_in = settings.upload_presign_ttl_seconds
+    if file_obj.upload_expires_at:
+        remaining = (file_obj.upload_expires_at - utcnow_naive()).total_seconds()
+        expires_in = max(1, min(expires_in, int(remaining)))
+    storage = get_async_storage()
+    return PartUrlsResponse(
+        upload_id=file_obj.multipart_upload_id,
+        parts=_presign_parts(storage, file_obj, part_numbers, expires_in),
+        expires_in=expires_in,
+    )
+
+
+@router.post("/{file_id}/complete", response_model=CompleteResponse)
+async def complete_upload(  # noqa: PLR0912, PLR0915
+    file_id: str,
+    request: Request,
+    db: Session = _DB_DEP,
+    current_user: models.User | None = _CURRENT_USER_OPTIONAL_DEP,
+    demo_id: str | None = _DEMO_ID_DEP,
+    _: None = _RL_COMPLETE_DEP,
+):
+    from app.core.config import settings  # imported lazily to avoid cycle
+
+    file_obj = _get_upload_for_actor(db, file_id, current_user, demo_id)
+    actor_user_id = current_user.id if current_user else None
+
+    storage = get_async_storage()
+    if file_obj.multipart_upload_id:
+        await _complete_multipart(storage, file_obj)
+        file_obj.multipart_upload_id = None
+        db.commit()
+
     try:
-        head = storage.head_object(file_obj.bucket, file_obj.object_key)
+        head = await storage.head_object(
+            file_obj.bucket,
+            file_obj.object_key,
+            checksum=settings.storage_native_checksums,
+        )
     except storage.not_found_exc as exc:
         error_code = (
             getattr(exc, "response", {}).get("Error", {}).get("Code")
@@ -256,11 +591,46 @@ async def complete_upload(  # noqa: PLR0912, PLR0915
             state=file_obj.state, sniffed_content_type=file_obj.sniffed_content_type
         )
 
-    # Compute checksum
-    hasher = hashlib.sha256()
-    for chunk in storage.iter_object(file_obj.bucket, file_obj.object_key):
-        hasher.update(chunk)
-    computed = hasher.hexdigest()
+    if settings.scan_admission_enabled:
+        # Blocking Redis round trips: keep them off the event loop.
+        admission = await run_in_threadpool(check_admission, file_obj.size_bytes)
+        if not admission.admitted:
+            # The upload stays INITIATED; keep its window open for the retry.
+            retry_by = utcnow_naive() + dt.timedelta(seconds=2 * admission.retry_after)
+            if file_obj.upload_expires_at and file_obj.upload_expires_at < retry_by:
+                file_obj.upload_expires_at = retry_by
+            db.commit()
+            SCAN_ADMISSION_REJECTIONS.labels(admission.lane).inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Scan queue is full; retry later",
+                headers={"Retry-After": str(admission.retry_after)},
+            )
+
+    # Prefer the checksum storage verified on PUT. Otherwise make a single
+    # streaming pass that hashes, captures the sniff sample and keeps the ZIP
+    # tail, so neither this request nor the scanner reads the object again.
+    required_entries = OFFICE_REQUIRED_ZIP_ENTRIES.get(
+        Path(file_obj.original_filename).suffix.lower()
+    )
+    office_entries: bool | None = None
+    archive = None
+    computed = stored_checksum_sha256_hex(head)
+    if computed is None:
+        inspector = ObjectInspector(
+            tail_bytes=ZIP_TAIL_BYTES if required_entries else 0
+        )
+        async for chunk in storage.iter_object(file_obj.bucket, file_obj.object_key):
+            inspector.update(chunk)
+        inspected = inspector.result()
+        computed = inspected.sha256
+        sample = inspected.sample
+        if required_entries:
+            office_entries, archive = inspect_zip_tail(
+                inspected.tail, required_entries, size=inspected.size_bytes
+            )
+    else:
+        sample = None
     if computed != file_obj.checksum_sha256:
         file_obj.state = models.FileObjectState.REJECTED
         file_obj.checksum_verified = False
@@ -284,18 +654,18 @@ async def complete_upload(  # noqa: PLR0912, PLR0915
     file_obj.checksum_verified = True
 
     # Sniff content from first bytes
-    sample = storage.get_object_range(
-        file_obj.bucket, file_obj.object_key, byte_range="bytes=0-16383"
-    )
-    sniffed = None
-    if sample:
-        try:
-            import magic
-
-            sniffed = magic.from_buffer(sample, mime=True)
-        except Exception:
-            sniffed = None
+    if sample is None:
+        sample = await storage.get_object_range(
+            file_obj.bucket, file_obj.object_key, byte_range=SNIFF_RANGE
+        )
+    sniffed = sniff_mime(sample)
     file_obj.sniffed_content_type = sniffed
+    file_obj.inspection = inspection_record(
+        etag=head.get("ETag"),
+        sample=sample,
+        office_entries=office_entries,
+        archive=archive,
+    )
 
     validation = validate_upload_metadata(
         original_filename=file_obj.original_filename,
@@ -335,7 +705,7 @@ async def complete_upload(  # noqa: PLR0912, PLR0915
         request=request,
         metadata={"sniffed": sniffed, "declared": file_obj.declared_content_type},
     )
-    enqueue_scan(file_obj.id)
+    enqueue_scan(file_obj.id, file_obj.size_bytes)
     return CompleteResponse(state=file_obj.state, sniffed_content_type=sniffed)
 
 
@@ -385,23 +755,17 @@ async def get_file(
     return file_obj
 
 
-@router.post("/{file_id}/download-url", response_model=DownloadUrlResponse)
-async def download_url(
+def _get_downloadable(
+    db: Session,
     file_id: str,
-    request: Request,
-    db: Session = _DB_DEP,
-    current_user: models.User | None = _CURRENT_USER_OPTIONAL_DEP,
-    demo_id: str | None = _DEMO_ID_DEP,
-    _: None = _RL_DOWNLOAD_URL_DEP,
-):
-    from app.core.config import settings  # imported lazily to avoid cycle
-
+    current_user: models.User | None,
+    demo_id: str | None,
+) -> models.FileObject:
     file_obj = db.get(models.FileObject, file_id)
     if not file_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
         )
-    actor_user_id = current_user.id if current_user else None
     if current_user:
         if (
             current_user.role != models.UserRole.admin
@@ -423,21 +787,163 @@ async def download_url(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="File not available for download",
         )
+    return file_obj
 
-    storage = StorageClient()
-    url = storage.generate_presigned_get_download(
-        key=file_obj.object_key,
-        download_filename=file_obj.original_filename,
-        response_content_type=file_obj.declared_content_type,
-        expires=settings.download_presign_ttl_seconds,
+
+def _signed_download_url(
+    storage: AsyncStorageBackend, file_obj: models.FileObject, ttl_seconds: int
+) -> tuple[str, int]:
+    def sign(signed_at: dt.datetime | None, expires: int) -> str:
+        return storage.generate_presigned_get_download(
+            key=file_obj.object_key,
+            download_filename=file_obj.original_filename,
+            response_content_type=file_obj.declared_content_type,
+            expires=expires,
+            signed_at=signed_at,
+        )
+
+    url_cache = get_download_url_cache()
+    if file_obj.state == models.FileObjectState.ACTIVE:
+        return url_cache.get_or_sign(file_obj.id, "attachment", sign)
+    # Admin access to a non-ACTIVE file: never serve or keep cached URLs.
+    url_cache.invalidate(file_obj.id)
+    return sign(None, ttl_seconds), ttl_seconds
+
+
+@router.post("/{file_id}/download-url", response_model=DownloadUrlResponse)
+async def download_url(
+    file_id: str,
+    request: Request,
+    db: Session = _DB_DEP,
+    current_user: models.User | None = _CURRENT_USER_OPTIONAL_DEP,
+    demo_id: str | None = _DEMO_ID_DEP,
+    _: None = _RL_DOWNLOAD_URL_DEP,
+):
+    from app.core.config import settings  # imported lazily to avoid cycle
+
+    file_obj = _get_downloadable(db, file_id, current_user, demo_id)
+    url, expires_in = _signed_download_url(
+        get_async_storage(), file_obj, settings.download_presign_ttl_seconds
     )
     log_event(
         db,
-        actor_user_id=actor_user_id,
+        actor_user_id=current_user.id if current_user else None,
         action="DOWNLOAD_URL_ISSUED",
         file_id=file_obj.id,
         request=request,
     )
-    return DownloadUrlResponse(
-        download_url=url, expires_in=settings.download_presign_ttl_seconds
+    return DownloadUrlResponse(download_url=url, expires_in=expires_in)
+
+
+async def _object_info(
+    storage: AsyncStorageBackend, file_obj: models.FileObject
+) -> tuple[ObjectInfo, Path | None]:
+    local = get_storage()
+    try:
+        if isinstance(local, LocalStorageClient):
+            path, meta = await run_in_threadpool(
+                local.stat_object, file_obj.bucket, file_obj.object_key
+            )
+            return (
+                ObjectInfo(
+                    size=meta.size,
+                    etag=meta.etag,
+                    last_modified=dt.datetime.fromtimestamp(meta.last_modified, dt.UTC),
+                    content_type=file_obj.declared_content_type,
+                ),
+                path,
+            )
+        head = await storage.head_object(file_obj.bucket, file_obj.object_key)
+    except storage.not_found_exc as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
+        ) from exc
+    return (
+        ObjectInfo(
+            size=head.get("ContentLength") or 0,
+            etag=head.get("ETag"),
+            last_modified=head.get("LastModified"),
+            content_type=file_obj.declared_content_type,
+        ),
+        None,
+    )
+
+
+@router.get("/{file_id}/content")
+async def download_content(  # noqa: PLR0913
+    file_id: str,
+    request: Request,
+    db: Session = _DB_DEP,
+    current_user: models.User | None = _CURRENT_USER_OPTIONAL_DEP,
+    demo_id: str | None = _DEMO_ID_DEP,
+    _: None = _RL_CONTENT_DEP,
+):
+    """Serve the file itself: a redirect to storage, or streamed by the API.
+
+    Objects are streamed when downloads are proxied or storage is local (no
+    extra hop through the presigned route); otherwise the client follows a
+    307 to the same cached URL /download-url hands out, and storage serves
+    any Range request.
+    """
+    from app.core.config import settings  # imported lazily to avoid cycle
+
+    file_obj = _get_downloadable(db, file_id, current_user, demo_id)
+    actor_user_id = current_user.id if current_user else None
+    storage = get_async_storage()
+    if not settings.storage_proxy_downloads and settings.storage_backend != "local":
+        url, _expires_in = _signed_download_url(
+            storage, file_obj, settings.download_presign_ttl_seconds
+        )
+        log_event(
+            db,
+            actor_user_id=actor_user_id,
+            action="DOWNLOAD_URL_ISSUED",
+            file_id=file_obj.id,
+            request=request,
+        )
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+    info, path = await _object_info(storage, file_obj)
+    try:
+        bounds = requested_range(request.headers, info)
+    except RangeNotSatisfiableError:
+        return range_not_satisfiable(info)
+    disposition = download_response_params(file_obj.original_filename, None)
+    headers = object_headers(
+        info,
+        bounds,
+        {
+            "Content-Disposition": disposition["response-content-disposition"],
+            "X-Content-Type-Options": "nosniff",
+        },
+    )
+    status_code = status.HTTP_206_PARTIAL_CONTENT if bounds else status.HTTP_200_OK
+    log_event(
+        db,
+        actor_user_id=actor_user_id,
+        action="FILE_DOWNLOADED",
+        file_id=file_obj.id,
+        request=request,
+        metadata={"range": headers.get("Content-Range")},
+    )
+
+    start, end = bounds or (0, info.size - 1)
+    if path is not None:
+        return FileRangeResponse(
+            path,
+            offset=start,
+            length=end - start + 1,
+            status_code=status_code,
+            headers=headers,
+            media_type=info.content_type,
+        )
+    return StreamingResponse(
+        storage.iter_object(
+            file_obj.bucket,
+            file_obj.object_key,
+            byte_range=f"bytes={start}-{end}" if bounds else None,
+        ),
+        status_code=status_code,
+        headers=headers,
+        media_type=info.content_type,
     )
@@ -0,0 +1,99 @@
+from botocore.exceptions import ClientError
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.services.local_storage import CHECKSUM_SHA256_HEADER, LocalStorageClient
+from app.services.storage import get_storage
+
+router = APIRouter()
+_WRITE_BUFFER_BYTES = 1024 * 1024
+
+
+def _local_storage() -> LocalStorageClient:
+    storage = get_storage()
+    if not isinstance(storage, LocalStorageClient):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return storage
+
+
+def _error_response(exc: ClientError) -> Response:
+    # Same shape as S3 errors, so presigned-URL clients behave identically.
+    error = exc.response.get("Error", {})
+    body = (
+        "<?xml version='1.0' encoding='UTF-8'?>"
+        f"<Error><Code>{error.get('Code')}</Code>"
+        f"<Message>{error.get('Message')}</Message></Error>"
+    )
+    return Response(
+        content=body,
+        status_code=exc.response.get("ResponseMetadata", {}).get(
+            "HTTPStatusCode", status.HTTP_400_BAD_REQUEST
+        ),
+        media_type="application/xml",
+    )
+
+
+def _verify(
+    storage: LocalStorageClient, method: str, bucket: str, key: str, request: Request
+) -> None:
+    if bucket != storage.bucket or not storage.verify(
+        method, bucket, key, request.query_params, request.headers
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Signature mismatch"
+        )
+
+
+@router.put("/{bucket}/{key:path}")
+async def put_object(bucket: str, key: str, request: Request):
+    storage = _local_storage()
+    _verify(storage, "PUT", bucket, key, request)
+
+    writer = await run_in_threadpool(storage.open_writer, bucket, key)
+    try:
+        # Disk writes run off the event loop, batched so small request
+        # chunks don't each pay for a threadpool hop.
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= _WRITE_BUFFER_BYTES:
+                await run_in_threadpool(writer.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(writer.write, bytes(buffer))
+        meta = await run_in_threadpool(
+            writer.commit,
+            content_type=request.headers.get("content-type"),
+            checksum_sha256=request.headers.get(CHECKSUM_SHA256_HEADER),
+        )
+    except ClientError as exc:
+        await run_in_threadpool(writer.abort)
+        return _error_response(exc)
+    except BaseException:
+        # Possibly cancelled, where a further await would not run: clean up
+        # inline.
+        writer.abort()
+        raise
+    return Response(status_code=status.HTTP_200_OK, headers={"ETag": meta.etag})
+
+
+@router.get("/{bucket}/{key:path}")
+async def get_object(bucket: str, key: str, request: Request):
+    storage = _local_storage()
+    _verify(storage, "GET", bucket, key, request)
+
+    try:
+        path, meta = await run_in_threadpool(storage.stat_object, bucket, key)
+    except ClientError as exc:
+        return _error_response(exc)
+    headers = {"ETag": meta.etag}
+    if disposition := request.query_params.get("response-content-disposition"):
+        headers["Content-Disposition"] = disposition
+    return FileResponse(
+        path,
+        media_type=request.query_params.get("response-content-type")
+        or meta.content_type
+        or "application/octet-stream",
+        headers=headers,
+    )
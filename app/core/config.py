@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -16,6 +17,8 @@ class Settings(BaseSettings):
     api_port: int = 8000
 
     database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
     redis_url: str
 
     # Storage settings support both legacy MINIO_* and deploy-time S3_* names.
@@ -39,14 +42,110 @@ class Settings(BaseSettings):
     s3_region: str | None = Field(
         default=None, validation_alias=AliasChoices("S3_REGION", "MINIO_REGION")
     )
+    storage_backend: Literal["s3", "local"] = "s3"
+    # Filesystem backend: objects live under <root>/<bucket>; presigned URLs
+    # point at this app's /local-storage routes under the public base URL.
+    local_storage_root: str = "/var/lib/secure-upload/objects"
+    local_storage_public_url: str = "http://localhost:8000"
+    local_storage_secret: str | None = None
     storage_auto_create_bucket: bool = True
+    storage_max_pool_connections: int = 50
+    storage_connect_timeout_seconds: float = 5.0
+    storage_read_timeout_seconds: float = 30.0
+    storage_tcp_keepalive: bool = True
+    storage_max_attempts: int = 5
+    # Disable for S3-compatible backends without x-amz-checksum-* support.
+    storage_native_checksums: bool = True
 
     jwt_secret: str
     jwt_algorithm: str = "HS256"
     jwt_expires_seconds: int = 3600
 
     upload_presign_ttl_seconds: int = 15 * 60
+    multipart_part_size_bytes: int = 8 * 1024 * 1024
+    multipart_presign_batch_size: int = 20
     download_presign_ttl_seconds: int = 5 * 60
+    # Reuse an owner's identical ACTIVE upload at init instead of re-uploading.
+    upload_dedup_enabled: bool = True
+    # Issued download URLs are reused within a window; 0 size disables the LRU.
+    download_url_cache_window_seconds: int = 60
+    download_url_cache_size: int = 10_000
+    download_url_cache_redis: bool = False
+    # Stream GET /files/{id}/content through the API instead of redirecting to
+    # storage (for stores without a client-reachable endpoint). The local
+    # backend is always streamed.
+    storage_proxy_downloads: bool = False
+
+    # Files queued for scanning are drained by one job in batches of this
+    # size (one query, one transaction); 1 enqueues a job per file.
+    scan_batch_size: int = 50
+    # Scans are queued in small/medium/large lanes by size; workers pick the
+    # next lane at random in proportion to these weights (idle lanes are
+    # skipped), so large files can't starve small ones or vice versa.
+    scan_lane_small_max_bytes: int = 1024 * 1024
+    scan_lane_medium_max_bytes: int = 16 * 1024 * 1024
+    scan_lane_weights: dict[str, int] = {"small": 6, "medium": 3, "large": 1}
+    # Reuse PASS/QUARANTINE verdicts for identical verified bytes under the
+    # same policy (in-process LRU, shared through Redis).
+    scan_verdict_cache_enabled: bool = True
+    scan_verdict_cache_size: int = 10_000
+    scan_verdict_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    scan_verdict_cache_redis: bool = True
+    # Byte signatures every object is streamed against (unset: the bundled
+    # app/services/signatures.rules).
+    scan_signatures_enabled: bool = True
+    scan_signatures_path: str | None = None
+    # Office ZIPs are quarantined as zip bombs past these limits, read from
+    # the central directory (max_ratio only counts members of 1 MiB or more).
+    scan_zip_max_entries: int = 10_000
+    scan_zip_max_uncompressed_bytes: int = 1024 * 1024 * 1024
+    scan_zip_max_ratio: int = 200
+    scan_zip_max_nested_archives: int = 16
+    # Failed scan jobs retry with jittered exponential backoff (retry n
+    # waits 50-100% of base * 2**n, capped). Once retries are spent the file
+    # moves to SCAN_FAILED and the job stays in RQ's failed job registry:
+    # python -m app.workers.dead_letters list|replay
+    scan_retry_max: int = 3
+    scan_retry_base_seconds: int = 10
+    scan_retry_max_seconds: int = 5 * 60
+    # complete answers 503 + Retry-After while a lane's backlog (queued jobs
+    # and batch-pending files) is at its limit: SCAN_ADMISSION_MAX_BACKLOG,
+    # lowered to what the lane drained in SCAN_ADMISSION_MAX_WAIT_SECONDS at
+    # its throughput over the last SCAN_ADMISSION_WINDOW_SECONDS (but never
+    # below SCAN_ADMISSION_MIN_BACKLOG).
+    scan_admission_enabled: bool = True
+    scan_admission_max_backlog: int = 10_000
+    scan_admission_min_backlog: int = 200
+    scan_admission_max_wait_seconds: int = 10 * 60
+    scan_admission_window_seconds: int = 5 * 60
+    # Retry-After while no scans completed in the window (workers down).
+    scan_admission_retry_after_seconds: int = 30
+
+    # "threaded" runs worker_concurrency jobs at once in one process (scans
+    # mostly wait on storage); keep it within db_pool_size + db_max_overflow.
+    # "prefork" keeps worker_concurrency warm processes that run jobs inline,
+    # each recycled after worker_max_jobs jobs (0: never).
+    worker_mode: Literal["fork", "threaded", "prefork"] = "fork"
+    worker_concurrency: int = 8
+    worker_max_jobs: int = 1000
+    # Prometheus exporters on their own ports, never the public API port
+    # (0: off). Forking processes need PROMETHEUS_MULTIPROC_DIR.
+    api_metrics_port: int = 0
+    worker_metrics_port: int = 9100
+
+    # Expired INITIATED uploads are rejected and their objects deleted once
+    # the grace period (covering PUTs still in flight) has passed.
+    sweeper_interval_seconds: int = 5 * 60
+    sweeper_grace_seconds: int = 10 * 60
+    sweeper_batch_size: int = 1000
+    sweeper_max_batches: int = 100
+    # Demo users are purged once their demo cookie can no longer be valid.
+    demo_cleanup_interval_seconds: int = 15 * 60
+    demo_cleanup_batch_size: int = 100
+    demo_cleanup_max_batches: int = 50
+    # Upper bound on one sweep or cleanup run; a schedule whose run never
+    # reported back is re-booked once interval + this has passed.
+    maintenance_job_timeout_seconds: int = 30 * 60
 
     rate_limit_default: int = 100
     quota_default_bytes: int = 1_073_741_824
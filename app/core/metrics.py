@@ -0,0 +1,277 @@
+"""Prometheus metrics for the API and the workers.
+
+Processes that fork (the RQ fork worker, the prefork pool, multi-process
+uvicorn) must set PROMETHEUS_MULTIPROC_DIR so every process writes its
+samples there and the exporter aggregates them.
+"""
+
+import functools
+import inspect
+import logging
+import os
+import time
+from collections.abc import Iterable
+from functools import lru_cache
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+_SCAN_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+# Storage client methods that make network or disk round trips.
+STORAGE_OPERATIONS = (
+    "create_multipart_upload",
+    "list_parts",
+    "complete_multipart_upload",
+    "abort_multipart_upload",
+    "head_object",
+    "iter_object",
+    "get_object_range",
+    "delete_objects",
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template.",
+    ["method", "route", "status"],
+)
+STORAGE_OPERATION_SECONDS = Histogram(
+    "storage_operation_duration_seconds",
+    "Storage client call latency (streams: until fully read or closed).",
+    ["backend", "operation", "outcome"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time.",
+    ["operation"],
+    buckets=_FAST_BUCKETS,
+)
+RATE_LIMIT_SECONDS = Histogram(
+    "rate_limit_redis_duration_seconds",
+    "Redis round trips of one rate-limit check.",
+    ["scope"],
+    buckets=_FAST_BUCKETS,
+)
+SCAN_STAGE_SECONDS = Histogram(
+    "scan_stage_duration_seconds",
+    "Scan pipeline stage wall time, including the reads it triggered.",
+    ["stage"],
+    buckets=_SCAN_BUCKETS,
+)
+SCAN_OUTCOMES = Counter(
+    "scan_outcomes",
+    "Scan verdicts by result and quarantine reason.",
+    ["result", "reason"],
+)
+SCAN_QUEUE_WAIT_SECONDS = Histogram(
+    "scan_queue_wait_seconds",
+    "Time a file waited in its lane before its scan started.",
+    ["lane"],
+    buckets=_SCAN_BUCKETS,
+)
+SCAN_ADMISSION_REJECTIONS = Counter(
+    "scan_admission_rejections",
+    "Upload completions refused because the lane's backlog was at its limit.",
+    ["lane"],
+)
+UPLOAD_TO_VERDICT_SECONDS = Histogram(
+    "scan_upload_to_verdict_seconds",
+    "Time from upload init to the scan verdict.",
+    ["result"],
+    buckets=_SCAN_BUCKETS,
+)
+
+
+def _timed(function, backend: str, operation: str):
+    histogram = STORAGE_OPERATION_SECONDS
+
+    def observe(started: float, outcome: str) -> None:
+        histogram.labels(backend, operation, outcome).observe(
+            time.perf_counter() - started
+        )
+
+    if inspect.isasyncgenfunction(function):
+
+        @functools.wraps(function)
+        async def async_stream(*args, **kwargs):
+            started, outcome = time.perf_counter(), "error"
+            try:
+                async for item in function(*args, **kwargs):
+                    yield item
+                outcome = "ok"
+            except GeneratorExit:
+                outcome = "closed"
+                raise
+            finally:
+                observe(started, outcome)
+
+        return async_stream
+    if inspect.isgeneratorfunction(function):
+
+        @functools.wraps(function)
+        def stream(*args, **kwargs):
+            started, outcome = time.perf_counter(), "error"
+            try:
+                yield from function(*args, **kwargs)
+                outcome = "ok"
+            except GeneratorExit:
+                # The consumer stopped early, e.g. on a signature match.
+                outcome = "closed"
+                raise
+            finally:
+                observe(started, outcome)
+
+        return stream
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def coroutine(*args, **kwargs):
+            started, outcome = time.perf_counter(), "error"
+            try:
+                result = await function(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                observe(started, outcome)
+
+        return coroutine
+
+    @functools.wraps(function)
+    def call(*args, **kwargs):
+        started, outcome = time.perf_counter(), "error"
+        try:
+            result = function(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            observe(started, outcome)
+
+    return call
+
+
+def instrument_storage(backend: str):
+    """Class decorator timing a storage client's STORAGE_OPERATIONS."""
+
+    def decorate(cls):
+        for operation in STORAGE_OPERATIONS:
+            if operation in vars(cls):
+                setattr(
+                    cls, operation, _timed(vars(cls)[operation], backend, operation)
+                )
+        return cls
+
+    return decorate
+
+
+def instrument_engine(engine) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute", named=True)
+    def start(context, **_):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute", named=True)
+    def stop(context, statement, **_):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        if operation not in {"SELECT", "INSERT", "UPDATE", "DELETE"}:
+            operation = "OTHER"
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request, labelled with the matched route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope; raw
+            # paths would make one series per file id.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+class ScanQueueCollector(Collector):
+    """Scan backlog and admission thresholds, read from Redis at scrape time."""
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        import redis
+
+        from app.services.admission import get_admission_redis, lane_admissions
+        from app.services.scanner import queue_depths
+
+        depth = GaugeMetricFamily(
+            "scan_queue_depth",
+            "Queued scan jobs and files pending batching, per queue.",
+            labels=["queue", "kind"],
+        )
+        limit = GaugeMetricFamily(
+            "scan_admission_backlog_limit",
+            "Backlog at which upload completion is refused, per lane.",
+            labels=["lane"],
+        )
+        throughput = GaugeMetricFamily(
+            "scan_admission_throughput",
+            "Files per second scanned over the admission window, per lane.",
+            labels=["lane"],
+        )
+        try:
+            client = get_admission_redis()
+            for (queue, kind), value in queue_depths(client).items():
+                depth.add_metric([queue, kind], value)
+            for lane, admission in lane_admissions(client).items():
+                limit.add_metric([lane], admission.limit)
+                throughput.add_metric([lane], admission.throughput)
+        except redis.RedisError:
+            logger.warning("metrics: scan queue state unavailable", exc_info=True)
+            return []
+        return [depth, limit, throughput]
+
+
+@lru_cache
+def scrape_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    registry.register(ScanQueueCollector())
+    return registry
+
+
+def start_exporter(port: int) -> None:
+    """Serve this process's (or, multi-process, every process's) metrics."""
+    start_http_server(port, registry=scrape_registry())
+    logger.info("Serving metrics on :%d/metrics", port)
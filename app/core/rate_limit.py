@@ -5,21 +5,28 @@ from fastapi import HTTPException, Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_SECONDS
 
 
 def _get_redis():
     return redis.Redis.from_url(settings.redis_url)
 
 
+def _hit(redis_client, scope: str, key: str, window_seconds: int) -> int:
+    with RATE_LIMIT_SECONDS.labels(scope).time():
+        count = redis_client.incr(key)
+        ttl = redis_client.ttl(key)
+        if count == 1 or ttl < 0:
+            redis_client.expire(key, window_seconds)
+    return count
+
+
 def rate_limit_ip(route: str, limit: int, window_seconds: int):
     async def dependency(request: Request):
         redis_client = _get_redis()
         ip = request.client.host if request.client else "unknown"
         key = f"rl:ip:{ip}:{route}"
-        count = redis_client.incr(key)
-        ttl = redis_client.ttl(key)
-        if count == 1 or ttl < 0:
-            redis_client.expire(key, window_seconds)
+        count = _hit(redis_client, "ip", key, window_seconds)
         if count > limit:
             raise HTTPException(status_code=429, detail="rate limit exceeded")
 
@@ -40,10 +47,7 @@ def rate_limit_user(route: str, limit: int, window_seconds: int):
             ip = request.client.host if request.client else "unknown"
             user_id = f"ip-{ip}"
         key = f"rl:user:{user_id}:{route}"
-        count = redis_client.incr(key)
-        ttl = redis_client.ttl(key)
-        if count == 1 or ttl < 0:
-            redis_client.expire(key, window_seconds)
+        count = _hit(redis_client, "user", key, window_seconds)
         if count > limit:
             raise HTTPException(status_code=429, detail="rate limit exceeded")
 
@@ -12,7 +12,7 @@ from sqlalchemy import (
     Index,
     Integer,
     String,
-    UniqueConstraint,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, relationship
@@ -29,6 +29,7 @@ class FileObjectState(str, enum.Enum):
     INITIATED = "INITIATED"
     UPLOADED = "UPLOADED"
     SCANNING = "SCANNING"
+    SCAN_FAILED = "SCAN_FAILED"
     ACTIVE = "ACTIVE"
     QUARANTINED = "QUARANTINED"
     REJECTED = "REJECTED"
@@ -36,6 +37,13 @@ class FileObjectState(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index(
+            "ix_users_demo_created",
+            "created_at",
+            postgresql_where=text("email = 'demo-' || id || '@demo.local'"),
+        ),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     email = Column(String, unique=True, nullable=False)
@@ -49,9 +57,16 @@ class User(Base):
 class FileObject(Base):
     __tablename__ = "file_objects"
     __table_args__ = (
-        UniqueConstraint("bucket", "object_key", name="uq_file_object_bucket_key"),
+        # Deduplicated uploads share one stored object; see ObjectReference.
+        Index("ix_file_objects_bucket_key", "bucket", "object_key"),
         Index("ix_file_objects_owner_created", "owner_id", "created_at"),
+        Index("ix_file_objects_owner_checksum", "owner_id", "checksum_sha256"),
         Index("ix_file_objects_demo_id", "demo_id"),
+        Index(
+            "ix_file_objects_initiated_expires",
+            "upload_expires_at",
+            postgresql_where=text("state = 'INITIATED'"),
+        ),
     )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -69,6 +84,8 @@ class FileObject(Base):
         Enum(FileObjectState), default=FileObjectState.INITIATED, nullable=False
     )
     upload_expires_at = Column(DateTime, nullable=True)
+    multipart_upload_id = Column(String, nullable=True)
+    inspection = Column(JSONB, nullable=True)
     created_at = Column(DateTime, default=dt.datetime.utcnow, nullable=False)
     updated_at = Column(
         DateTime, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow
@@ -99,3 +116,19 @@ class UsageCounter(Base):
     updated_at = Column(
         DateTime, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow
     )
+
+
+class ObjectReference(Base):
+    """Number of FileObjects sharing a stored object.
+
+    Rows only exist for shared objects; no row means a single owner.
+    """
+
+    __tablename__ = "object_references"
+
+    bucket = Column(String, primary_key=True)
+    object_key = Column(String, primary_key=True)
+    ref_count = Column(Integer, nullable=False)
+    updated_at = Column(
+        DateTime, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow
+    )
@@ -1,19 +1,49 @@
+import logging
+from contextlib import asynccontextmanager
+
+from botocore.exceptions import BotoCoreError, ClientError
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 
-from app.api.routers import auth, demo, files, health, ui
+from app.api.routers import auth, demo, files, health, local_storage, ui
 from app.core.config import settings
 from app.core.logging import configure_logging
+from app.core.metrics import MetricsMiddleware, start_exporter
 from app.core.rate_limit import RateLimitMiddleware
+from app.services.local_storage import ROUTE_PREFIX
+from app.services.storage import close_async_storage, get_storage
 
 configure_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Warm the shared storage client so the first request doesn't pay for
+    # client construction; a storage outage must not block API startup.
+    try:
+        get_storage()
+    except (BotoCoreError, ClientError, OSError):
+        logger.warning("Storage client warm-up failed; will retry lazily")
+    # Metrics stay off the public API: they're served on their own port,
+    # which deployments keep internal.
+    if settings.api_metrics_port:
+        try:
+            start_exporter(settings.api_metrics_port)
+        except OSError:
+            # Under uvicorn --workers the first process to bind serves every
+            # worker's samples (given PROMETHEUS_MULTIPROC_DIR).
+            logger.info("Metrics port %d already bound", settings.api_metrics_port)
+    yield
+    await close_async_storage()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.app_name, debug=settings.debug)
+    app = FastAPI(title=settings.app_name, debug=settings.debug, lifespan=lifespan)
     app.state.settings = settings
 
     app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(MetricsMiddleware)
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
     app.include_router(ui.router, tags=["ui"])
@@ -21,6 +51,9 @@ def create_app() -> FastAPI:
     app.include_router(auth.router, prefix="/auth", tags=["auth"])
     app.include_router(demo.router, prefix="/demo", tags=["demo"])
     app.include_router(files.router, prefix="/files", tags=["files"])
+    app.include_router(
+        local_storage.router, prefix=ROUTE_PREFIX, tags=["local-storage"]
+    )
 
     @app.get("/_not_implemented")
     async def not_implemented():
@@ -0,0 +1,45 @@
+"""add object_references and allow shared object keys
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "object_references",
+        sa.Column("bucket", sa.String(), primary_key=True),
+        sa.Column("object_key", sa.String(), primary_key=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(), nullable=True, server_default=sa.func.now()
+        ),
+    )
+    op.drop_constraint("uq_file_object_bucket_key", "file_objects", type_="unique")
+    op.create_index(
+        "ix_file_objects_bucket_key", "file_objects", ["bucket", "object_key"]
+    )
+    op.create_index(
+        "ix_file_objects_owner_checksum",
+        "file_objects",
+        ["owner_id", "checksum_sha256"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_file_objects_owner_checksum", table_name="file_objects")
+    op.drop_index("ix_file_objects_bucket_key", table_name="file_objects")
+    op.create_unique_constraint(
+        "uq_file_object_bucket_key", "file_objects", ["bucket", "object_key"]
+    )
+    op.drop_table("object_references")
@@ -0,0 +1,28 @@
+"""add partial index on expiry of INITIATED uploads
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_file_objects_initiated_expires",
+        "file_objects",
+        ["upload_expires_at"],
+        postgresql_where=sa.text("state = 'INITIATED'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_file_objects_initiated_expires", table_name="file_objects")
@@ -0,0 +1,28 @@
+"""add partial index on creation time of demo users
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_users_demo_created",
+        "users",
+        ["created_at"],
+        postgresql_where=sa.text("email = 'demo-' || id || '@demo.local'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_demo_created", table_name="users")
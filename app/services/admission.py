@@ -0,0 +1,86 @@
+"""Backpressure for upload completion.
+
+A lane whose backlog is at its limit stops admitting new scans, so a spike
+is pushed back to clients (503 + Retry-After) instead of growing Redis and
+every other upload's scan latency. The limit shrinks with the lane's recent
+throughput: a slow lane admits only what it can drain in
+``scan_admission_max_wait_seconds``.
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+
+from redis import Redis
+
+from app.core.config import settings
+from app.services.scanner import (
+    SCAN_LANES,
+    lane_queue,
+    queue_depths,
+    scan_lane,
+    scan_throughput,
+)
+
+
+@dataclass(frozen=True)
+class Admission:
+    lane: str
+    backlog: int
+    # Files per second over the admission window.
+    throughput: float
+    limit: int
+
+    @property
+    def admitted(self) -> bool:
+        return self.backlog < self.limit
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the lane should have drained below its limit."""
+        if self.admitted:
+            return 0
+        if self.throughput <= 0:
+            return settings.scan_admission_retry_after_seconds
+        seconds = math.ceil((self.backlog - self.limit + 1) / self.throughput)
+        return min(max(seconds, 1), settings.scan_admission_max_wait_seconds)
+
+
+def backlog_limit(throughput: float) -> int:
+    limit = settings.scan_admission_max_backlog
+    if throughput > 0 and settings.scan_admission_max_wait_seconds:
+        drained = int(throughput * settings.scan_admission_max_wait_seconds)
+        limit = min(limit, max(drained, settings.scan_admission_min_backlog))
+    return limit
+
+
+def _admission(
+    redis: Redis, lane: str, depths: dict[tuple[str, str], int]
+) -> Admission:
+    queue = lane_queue(lane)
+    throughput = scan_throughput(redis, lane)
+    return Admission(
+        lane=lane,
+        backlog=depths[(queue, "jobs")] + depths[(queue, "pending")],
+        throughput=throughput,
+        limit=backlog_limit(throughput),
+    )
+
+
+@lru_cache
+def get_admission_redis() -> Redis:
+    """Process-wide client: admission runs on every upload completion."""
+    return Redis.from_url(settings.redis_url)
+
+
+def lane_admissions(connection: Redis | None = None) -> dict[str, Admission]:
+    redis = connection or get_admission_redis()
+    depths = queue_depths(redis)
+    return {lane: _admission(redis, lane, depths) for lane in SCAN_LANES}
+
+
+def check_admission(
+    size_bytes: int | None, connection: Redis | None = None
+) -> Admission:
+    redis = connection or get_admission_redis()
+    return _admission(redis, scan_lane(size_bytes), queue_depths(redis))
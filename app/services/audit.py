@@ -13,6 +13,8 @@ def log_event(  # noqa: PLR0913
     file_id: str | None = None,
     request: Request | None = None,
     metadata: dict[str, Any] | None = None,
+    *,
+    commit: bool = True,
 ) -> None:
     ip = request.client.host if request and request.client else None
     user_agent = request.headers.get("user-agent") if request else None
@@ -25,4 +27,5 @@ def log_event(  # noqa: PLR0913
         details=metadata,
     )
     db.add(event)
-    db.commit()
+    if commit:
+        db.commit()
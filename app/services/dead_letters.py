@@ -0,0 +1,193 @@
+"""Dead-lettered scans: per-file scan jobs that ran out of retries.
+
+RQ keeps them in each scan queue's failed job registry, and the scanner's
+failure callback moves their files to SCAN_FAILED. A worker killed outright
+(OOM, SIGKILL) never runs the callback, so such a file may still be
+SCANNING; replay handles both.
+
+Files can also be orphaned: SCANNING with no job, batch list or dead letter
+left to scan them (a lost enqueue, a flushed Redis). They are listed and
+replayed by file id.
+"""
+
+import datetime as dt
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from redis import Redis
+from rq import Queue
+from rq.job import Job
+from rq.registry import FailedJobRegistry, ScheduledJobRegistry, StartedJobRegistry
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.audit import log_event
+from app.services.quota import utcnow_naive
+from app.services.scanner import (
+    LANE_QUEUES,
+    SCAN_FILE_JOB,
+    SCAN_QUEUE,
+    batched_file_ids,
+    enqueue_scan,
+    lane_queue,
+    scan_lane,
+)
+
+_REPLAYABLE = {models.FileObjectState.SCAN_FAILED, models.FileObjectState.SCANNING}
+# Completing an upload marks it SCANNING just before enqueueing its scan.
+_ORPHAN_GRACE = dt.timedelta(minutes=5)
+
+
+@dataclass
+class DeadLetter:
+    # None for an orphaned file.
+    job_id: str | None
+    queue: str
+    file_id: str | None
+    failed_at: dt.datetime | None
+    error: str
+    # None once the file has been deleted.
+    file_state: str | None
+
+
+def _dead_jobs(redis: Redis) -> Iterator[tuple[FailedJobRegistry, Job]]:
+    for name in (SCAN_QUEUE, *LANE_QUEUES):
+        registry = FailedJobRegistry(name, connection=redis)
+        for job in Job.fetch_many(registry.get_job_ids(), connection=redis):
+            if job is not None and job.func_name == SCAN_FILE_JOB:
+                yield registry, job
+
+
+def _tracked_file_ids(redis: Redis) -> set[str]:
+    """Files some queued, scheduled, running or failed scan job refers to."""
+    file_ids = batched_file_ids(redis)
+    for name in (SCAN_QUEUE, *LANE_QUEUES):
+        job_ids = Queue(name, connection=redis).get_job_ids()
+        for registry in (ScheduledJobRegistry, StartedJobRegistry, FailedJobRegistry):
+            job_ids += registry(name, connection=redis).get_job_ids()
+        for job in Job.fetch_many(job_ids, connection=redis):
+            if job is not None and job.func_name == SCAN_FILE_JOB:
+                file_ids.add(job.kwargs.get("file_id"))
+    return file_ids
+
+
+def _orphans(redis: Redis, db: Session) -> list[models.FileObject]:
+    scanning = set(
+        db.scalars(
+            select(models.FileObject.id).where(
+                models.FileObject.state == models.FileObjectState.SCANNING,
+                models.FileObject.updated_at < utcnow_naive() - _ORPHAN_GRACE,
+            )
+        )
+    )
+    orphaned = scanning - _tracked_file_ids(redis) if scanning else set()
+    if not orphaned:
+        return []
+    return list(
+        db.scalars(
+            select(models.FileObject)
+            .where(models.FileObject.id.in_(orphaned))
+            .order_by(models.FileObject.updated_at)
+        )
+    )
+
+
+def _last_error(job: Job) -> str:
+    result = job.latest_result()
+    lines = (result.exc_string or "").strip().splitlines() if result else []
+    return lines[-1] if lines else ""
+
+
+def list_dead_letters(connection: Redis | None = None) -> list[DeadLetter]:
+    redis = connection or Redis.from_url(settings.redis_url)
+    jobs = list(_dead_jobs(redis))
+    file_ids = {job.kwargs.get("file_id") for _, job in jobs}
+    db: Session = SessionLocal()
+    try:
+        states = dict(
+            db.execute(
+                select(models.FileObject.id, models.FileObject.state).where(
+                    models.FileObject.id.in_(file_ids)
+                )
+            ).all()
+        )
+        orphans = _orphans(redis, db)
+    finally:
+        db.close()
+    letters = []
+    for registry, job in jobs:
+        file_id = job.kwargs.get("file_id")
+        state = states.get(file_id)
+        letters.append(
+            DeadLetter(
+                job_id=job.id,
+                queue=registry.name,
+                file_id=file_id,
+                failed_at=job.ended_at,
+                error=_last_error(job),
+                file_state=state.value if state else None,
+            )
+        )
+    letters.extend(
+        DeadLetter(
+            job_id=None,
+            queue=lane_queue(scan_lane(file_obj.size_bytes)),
+            file_id=file_obj.id,
+            failed_at=file_obj.updated_at,
+            error="no scan job queued",
+            file_state=file_obj.state.value,
+        )
+        for file_obj in orphans
+    )
+    return letters
+
+
+def _replay_file(db: Session, file_id: str | None, metadata: dict) -> str:
+    file_obj = db.get(models.FileObject, file_id) if file_id else None
+    if file_obj is None or file_obj.state not in _REPLAYABLE:
+        return "discarded"
+    file_obj.state = models.FileObjectState.SCANNING
+    # Restarts the orphan grace period, so the file isn't replayed twice.
+    file_obj.updated_at = utcnow_naive()
+    log_event(
+        db,
+        actor_user_id=None,
+        action="SCAN_REPLAYED",
+        file_id=file_obj.id,
+        metadata=metadata,
+    )
+    enqueue_scan(file_obj.id, file_obj.size_bytes)
+    return "replayed"
+
+
+def replay(
+    ids: Iterable[str] | None = None, connection: Redis | None = None
+) -> dict[str, int]:
+    """Scan dead-lettered and orphaned files again with a fresh retry budget.
+
+    ``ids`` picks dead letters by job id and orphans by file id; ``None``
+    replays all of them. Jobs whose file was deleted or has since reached a
+    verdict are discarded.
+    """
+    redis = connection or Redis.from_url(settings.redis_url)
+    wanted = set(ids) if ids is not None else None
+    results: dict[str, int] = defaultdict(int)
+    db: Session = SessionLocal()
+    try:
+        for registry, job in list(_dead_jobs(redis)):
+            if wanted is not None and job.id not in wanted:
+                continue
+            file_id = job.kwargs.get("file_id")
+            results[_replay_file(db, file_id, {"job_id": job.id})] += 1
+            # Last, so a failed enqueue leaves the dead letter to replay again.
+            registry.remove(job, delete_job=True)
+        for file_obj in _orphans(redis, db):
+            if wanted is None or file_obj.id in wanted:
+                results[_replay_file(db, file_obj.id, {"orphaned": True})] += 1
+    finally:
+        db.close()
+    return dict(results)
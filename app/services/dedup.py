@@ -0,0 +1,92 @@
+from pathlib import Path
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+# Candidates examined per lookup; owners rarely hold many copies of one digest.
+_MAX_CANDIDATES = 20
+
+
+def _base_type(content_type: str | None) -> str:
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def find_duplicate(  # noqa: PLR0913
+    db: Session,
+    *,
+    owner_id: str,
+    checksum_sha256: str,
+    size_bytes: int,
+    original_filename: str,
+    declared_content_type: str,
+) -> models.FileObject | None:
+    """An ACTIVE, verified upload of the same bytes that can be shared.
+
+    Lookups are scoped to one owner: the client only asserts a digest, so
+    matching across owners would hand out files nobody proved they have.
+    The extension and declared type must match as well, since the type
+    policy verdict depends on both.
+    """
+    candidates = db.scalars(
+        select(models.FileObject)
+        .where(
+            models.FileObject.owner_id == owner_id,
+            models.FileObject.checksum_sha256 == checksum_sha256.lower(),
+            models.FileObject.size_bytes == size_bytes,
+            models.FileObject.state == models.FileObjectState.ACTIVE,
+            models.FileObject.checksum_verified.is_(True),
+        )
+        .order_by(models.FileObject.created_at)
+        .limit(_MAX_CANDIDATES)
+    )
+    extension = Path(original_filename).suffix.lower()
+    declared = _base_type(declared_content_type)
+    for candidate in candidates:
+        if (
+            Path(candidate.original_filename).suffix.lower() == extension
+            and _base_type(candidate.declared_content_type) == declared
+        ):
+            return candidate
+    return None
+
+
+def acquire_reference(db: Session, bucket: str, object_key: str) -> None:
+    """Record one more FileObject pointing at ``object_key``."""
+    statement = pg_insert(models.ObjectReference).values(
+        bucket=bucket, object_key=object_key, ref_count=2
+    )
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["bucket", "object_key"],
+            set_={
+                "ref_count": models.ObjectReference.ref_count + 1,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+def release_reference(db: Session, bucket: str, object_key: str) -> bool:
+    """Drop one reference; True when the stored object is no longer used."""
+    remaining = db.scalar(
+        update(models.ObjectReference)
+        .where(
+            models.ObjectReference.bucket == bucket,
+            models.ObjectReference.object_key == object_key,
+        )
+        .values(ref_count=models.ObjectReference.ref_count - 1)
+        .returning(models.ObjectReference.ref_count)
+    )
+    if remaining is None:
+        return True
+    if remaining <= 1:
+        db.execute(
+            delete(models.ObjectReference).where(
+                models.ObjectReference.bucket == bucket,
+                models.ObjectReference.object_key == object_key,
+            )
+        )
+    return remaining <= 0
@@ -1,3 +1,4 @@
+import hashlib
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -112,6 +113,18 @@ ALLOWED_CONTENT_TYPES = {
 }
 
 
+def policy_fingerprint(*extra: object) -> str:
+    """Short digest of the policy tables (plus ``extra`` scan settings).
+
+    Anything cached from a validation verdict should be keyed by this, so
+    editing FILE_TYPE_POLICIES invalidates it.
+    """
+    material = repr(
+        (sorted(FILE_TYPE_POLICIES.items()), DEFAULT_MAX_SIZE_BYTES, *extra)
+    )
+    return hashlib.sha256(material.encode()).hexdigest()[:16]
+
+
 def _base_mime(value: str | None) -> str | None:
     if not value:
         return None
@@ -0,0 +1,120 @@
+import hashlib
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from app.services.zip_directory import (
+    ArchiveStats,
+    ZipDirectoryError,
+    archive_stats,
+    read_central_directory,
+)
+
+SNIFF_SAMPLE_BYTES = 16 * 1024
+SNIFF_RANGE = f"bytes=0-{SNIFF_SAMPLE_BYTES - 1}"
+# Magic prefixes in FILE_TYPE_POLICIES are at most 8 bytes; keep some slack.
+MAGIC_HEAD_BYTES = 64
+# Rolling tail kept while streaming ZIP containers so the central directory
+# can be checked without another read.
+ZIP_TAIL_BYTES = 256 * 1024
+
+
+@dataclass(frozen=True)
+class InspectionResult:
+    size_bytes: int
+    sha256: str | None
+    sample: bytes
+    tail: bytes
+
+
+class ObjectInspector:
+    """Feeds one streaming pass into hashing, sniff sampling and size/tail
+    bookkeeping, so each consumer doesn't need its own read of the object."""
+
+    def __init__(self, *, hash_content: bool = True, tail_bytes: int = 0):
+        self._hasher = hashlib.sha256() if hash_content else None
+        self._tail_bytes = tail_bytes
+        self._size = 0
+        self._sample = bytearray()
+        self._tail = bytearray()
+
+    def update(self, chunk: bytes) -> None:
+        self._size += len(chunk)
+        if self._hasher is not None:
+            self._hasher.update(chunk)
+        missing = SNIFF_SAMPLE_BYTES - len(self._sample)
+        if missing > 0:
+            self._sample += chunk[:missing]
+        if self._tail_bytes:
+            self._tail += chunk
+            del self._tail[: -self._tail_bytes]
+
+    def result(self) -> InspectionResult:
+        return InspectionResult(
+            size_bytes=self._size,
+            sha256=self._hasher.hexdigest() if self._hasher is not None else None,
+            sample=bytes(self._sample),
+            tail=bytes(self._tail),
+        )
+
+
+def sniff_mime(sample: bytes | None) -> str | None:
+    if not sample:
+        return None
+    try:
+        import magic
+
+        return magic.from_buffer(sample, mime=True)
+    except Exception:
+        return None
+
+
+class _OutsideTailError(Exception):
+    pass
+
+
+def inspect_zip_tail(
+    tail: bytes, required: tuple[str, ...], *, size: int
+) -> tuple[bool | None, ArchiveStats | None]:
+    """Check required ZIP entry names and summarize the archive using only
+    the trailing bytes.
+
+    Returns (None, None) when the central directory doesn't fit in ``tail``
+    and the answer has to come from storage instead.
+    """
+    base = size - len(tail)
+
+    def read_tail(start: int, length: int) -> bytes:
+        if start < base:
+            raise _OutsideTailError
+        return tail[start - base : start - base + length]
+
+    try:
+        directory = read_central_directory(read_tail, size)
+    except _OutsideTailError:
+        return None, None
+    except ZipDirectoryError:
+        return False, None
+    return set(required).issubset(directory.names), archive_stats(directory)
+
+
+def inspection_record(
+    *,
+    etag: str | None,
+    sample: bytes | None,
+    office_entries: bool | None,
+    archive: ArchiveStats | None = None,
+) -> dict[str, Any]:
+    """Inspection results persisted on FileObject.inspection for the scanner."""
+    return {
+        "etag": etag,
+        "magic_head": (sample or b"")[:MAGIC_HEAD_BYTES].hex(),
+        "sample_bytes": len(sample or b""),
+        "office_entries": office_entries,
+        "archive": asdict(archive) if archive is not None else None,
+    }
+
+
+def magic_head(record: dict[str, Any] | None) -> bytes | None:
+    if not record:
+        return None
+    return bytes.fromhex(record.get("magic_head") or "")
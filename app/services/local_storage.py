@@ -0,0 +1,533 @@
+"""Filesystem storage backend for single-node installs and benchmarks.
+
+Objects live under ``<root>/<bucket>/<aa>/<sha256(key)>`` next to a JSON
+sidecar holding the content type, ETag and SHA-256 checksum. Presigned URLs
+are HMAC-signed links to the app's own ``/local-storage`` routes, which verify
+the signature and stream to/from disk. Reads map the file into memory, so
+ranged reads and streaming hand out slices of the page cache without
+intermediate read buffers.
+"""
+
+import asyncio
+import base64
+import datetime as dt
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator, Iterator, Mapping
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+
+from app.core.config import settings
+from app.core.metrics import instrument_storage
+from app.services.storage import (
+    CHECKSUM_SHA256_HEADER,
+    PresignedPost,
+    PresignedUpload,
+    checksum_sha256_b64,
+    download_response_params,
+    get_storage,
+)
+from app.services.utils import parse_byte_range
+
+ROUTE_PREFIX = "/local-storage"
+SIGNATURE_PARAM = "X-Signature"
+EXPIRES_PARAM = "X-Expires"
+SIGNED_HEADERS_PARAM = "X-SignedHeaders"
+# Matches S3's single-PUT limit.
+MAX_PUT_BYTES = 5 * 1024 * 1024 * 1024
+_META_SUFFIX = ".json"
+_SECRET_LABEL = b"local-storage-url-signing"
+
+
+def _client_error(code: str, message: str, status: int, operation: str) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        },
+        operation,
+    )
+
+
+def _not_implemented(operation: str) -> ClientError:
+    return _client_error(
+        "NotImplemented", "Not supported by local storage", 501, operation
+    )
+
+
+@dataclass(frozen=True)
+class ObjectMeta:
+    size: int
+    content_type: str | None
+    etag: str
+    checksum_sha256: str
+    last_modified: float
+
+
+def _prefetch(mapped: mmap.mmap, offset: int, length: int) -> None:
+    if not hasattr(mmap, "MADV_WILLNEED") or offset >= len(mapped):
+        return
+    start = offset - offset % mmap.PAGESIZE
+    mapped.madvise(mmap.MADV_WILLNEED, start, min(length, len(mapped) - start))
+
+
+class ObjectWriter:
+    """Streams an upload to a temp file and publishes it atomically."""
+
+    def __init__(self, path: Path, meta_path: Path, *, max_bytes: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        self._file = os.fdopen(fd, "wb")
+        self._tmp = Path(tmp)
+        self._path = path
+        self._meta_path = meta_path
+        self._max_bytes = max_bytes
+        self._hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self._max_bytes:
+            raise _client_error(
+                "EntityTooLarge", "Upload exceeds maximum size", 400, "PutObject"
+            )
+        self._hasher.update(data)
+        self._file.write(data)
+
+    def commit(
+        self, *, content_type: str | None, checksum_sha256: str | None = None
+    ) -> ObjectMeta:
+        self._file.close()
+        digest = self._hasher.digest()
+        actual = base64.b64encode(digest).decode("ascii")
+        if checksum_sha256 is not None and not hmac.compare_digest(
+            checksum_sha256, actual
+        ):
+            self.abort()
+            raise _client_error(
+                "BadDigest", "Checksum does not match body", 400, "PutObject"
+            )
+        meta = ObjectMeta(
+            size=self.size,
+            content_type=content_type,
+            etag=f'"{digest.hex()}"',
+            checksum_sha256=actual,
+            last_modified=time.time(),
+        )
+        os.replace(self._tmp, self._path)
+        meta_tmp = self._meta_path.with_name(f".{self._meta_path.name}.tmp")
+        meta_tmp.write_text(json.dumps(asdict(meta)))
+        os.replace(meta_tmp, self._meta_path)
+        return meta
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+@instrument_storage("local")
+class LocalStorageClient:
+    supports_multipart = False
+    supports_post = False
+
+    def __init__(
+        self,
+        *,
+        root: str | None = None,
+        public_url: str | None = None,
+        secret: str | None = None,
+    ):
+        self.bucket = settings.minio_bucket
+        self.root = Path(root or settings.local_storage_root)
+        self.public_url = (public_url or settings.local_storage_public_url).rstrip("/")
+        secret = secret or settings.local_storage_secret
+        self._secret = (
+            secret.encode()
+            if secret
+            else hmac.new(
+                settings.jwt_secret.encode(), _SECRET_LABEL, hashlib.sha256
+            ).digest()
+        )
+        if settings.storage_auto_create_bucket:
+            (self.root / self.bucket).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def not_found_exc(self):
+        return ClientError
+
+    def object_path(self, bucket: str, key: str) -> Path:
+        # Hashing the key keeps user-supplied filenames out of the filesystem.
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.root / bucket / digest[:2] / digest
+
+    def _meta_path(self, path: Path) -> Path:
+        return path.with_name(path.name + _META_SUFFIX)
+
+    def _string_to_sign(  # noqa: PLR0913
+        self,
+        method: str,
+        bucket: str,
+        key: str,
+        params: Mapping[str, str],
+        headers: Mapping[str, str],
+    ) -> bytes:
+        canonical_query = "&".join(
+            f"{quote(name, safe='')}={quote(value, safe='')}"
+            for name, value in sorted(params.items())
+            if name != SIGNATURE_PARAM
+        )
+        names = [n for n in params.get(SIGNED_HEADERS_PARAM, "").split(";") if n]
+        canonical_headers = "\n".join(
+            f"{name}:{' '.join((headers.get(name) or '').split())}" for name in names
+        )
+        return "\n".join(
+            (method, bucket, key, canonical_query, canonical_headers)
+        ).encode()
+
+    def sign(  # noqa: PLR0913
+        self,
+        method: str,
+        bucket: str,
+        key: str,
+        *,
+        expires: int,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        signed_at: dt.datetime | None = None,
+    ) -> str:
+        issued = signed_at or dt.datetime.now(dt.UTC)
+        signed_headers = {
+            name.lower(): value for name, value in (headers or {}).items()
+        }
+        query = {
+            **(params or {}),
+            EXPIRES_PARAM: str(int(issued.timestamp()) + expires),
+            SIGNED_HEADERS_PARAM: ";".join(sorted(signed_headers)),
+        }
+        query[SIGNATURE_PARAM] = hmac.new(
+            self._secret,
+            self._string_to_sign(method, bucket, key, query, signed_headers),
+            hashlib.sha256,
+        ).hexdigest()
+        encoded = "&".join(
+            f"{quote(name, safe='')}={quote(value, safe='')}"
+            for name, value in query.items()
+        )
+        return (
+            f"{self.public_url}{ROUTE_PREFIX}/{quote(bucket, safe='')}/"
+            f"{quote(key, safe='')}?{encoded}"
+        )
+
+    def verify(  # noqa: PLR0913
+        self,
+        method: str,
+        bucket: str,
+        key: str,
+        params: Mapping[str, str],
+        headers: Mapping[str, str],
+    ) -> bool:
+        try:
+            expires_at = int(params.get(EXPIRES_PARAM, ""))
+        except ValueError:
+            return False
+        if expires_at < time.time():
+            return False
+        expected = hmac.new(
+            self._secret,
+            self._string_to_sign(method, bucket, key, params, headers),
+            hashlib.sha256,
+        ).hexdigest()
+        return hmac.compare_digest(expected, params.get(SIGNATURE_PARAM, ""))
+
+    def generate_presigned_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedUpload:
+        headers = {"Content-Type": content_type}
+        checksum_b64 = checksum_sha256_b64(checksum_sha256) if checksum_sha256 else None
+        if checksum_b64:
+            headers[CHECKSUM_SHA256_HEADER] = checksum_b64
+        url = self.sign("PUT", self.bucket, key, expires=expires_in, headers=headers)
+        return PresignedUpload(url=url, headers=headers)
+
+    def generate_presigned_get(self, key: str, expires: int = 3600) -> str:
+        return self.sign("GET", self.bucket, key, expires=expires)
+
+    def generate_presigned_get_download(  # noqa: PLR0913
+        self,
+        *,
+        key: str,
+        download_filename: str,
+        response_content_type: str | None = None,
+        expires: int = 3600,
+        signed_at: dt.datetime | None = None,
+    ) -> str:
+        return self.sign(
+            "GET",
+            self.bucket,
+            key,
+            expires=expires,
+            params=download_response_params(download_filename, response_content_type),
+            signed_at=signed_at,
+        )
+
+    def generate_presigned_post(  # noqa: PLR0913
+        self,
+        key: str,  # noqa: ARG002
+        content_type: str,  # noqa: ARG002
+        content_length_range: tuple[int, int],  # noqa: ARG002
+        expires_in: int = 3600,  # noqa: ARG002
+        checksum_sha256: str | None = None,  # noqa: ARG002
+    ) -> PresignedPost:
+        raise _not_implemented("PostObject")
+
+    def generate_presigned_upload_part(
+        self,
+        key: str,  # noqa: ARG002
+        upload_id: str,  # noqa: ARG002
+        part_number: int,  # noqa: ARG002
+        expires: int = 3600,  # noqa: ARG002
+    ) -> str:
+        raise _not_implemented("UploadPart")
+
+    def create_multipart_upload(
+        self, bucket: str, key: str, content_type: str  # noqa: ARG002
+    ) -> str:
+        raise _not_implemented("CreateMultipartUpload")
+
+    def list_parts(
+        self, bucket: str, key: str, upload_id: str  # noqa: ARG002
+    ) -> list[dict]:
+        raise _not_implemented("ListParts")
+
+    def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: list[dict]  # noqa: ARG002
+    ) -> None:
+        raise _not_implemented("CompleteMultipartUpload")
+
+    def abort_multipart_upload(
+        self, bucket: str, key: str, upload_id: str  # noqa: ARG002
+    ) -> None:
+        raise _not_implemented("AbortMultipartUpload")
+
+    def open_writer(self, bucket: str, key: str) -> ObjectWriter:
+        path = self.object_path(bucket, key)
+        return ObjectWriter(path, self._meta_path(path), max_bytes=MAX_PUT_BYTES)
+
+    def stat_object(self, bucket: str, key: str) -> tuple[Path, ObjectMeta]:
+        path = self.object_path(bucket, key)
+        try:
+            meta = ObjectMeta(**json.loads(self._meta_path(path).read_text()))
+        except FileNotFoundError as exc:
+            raise _client_error("NoSuchKey", "Not Found", 404, "HeadObject") from exc
+        return path, meta
+
+    def head_object(self, bucket: str, key: str, *, checksum: bool = False) -> dict:
+        _, meta = self.stat_object(bucket, key)
+        head: dict = {
+            "ContentLength": meta.size,
+            "ContentType": meta.content_type,
+            "ETag": meta.etag,
+            "Metadata": {},
+            "LastModified": dt.datetime.fromtimestamp(meta.last_modified, dt.UTC),
+        }
+        if checksum:
+            head["ChecksumSHA256"] = meta.checksum_sha256
+        return head
+
+    def _map(self, bucket: str, key: str) -> mmap.mmap | None:
+        path = self.object_path(bucket, key)
+        try:
+            with path.open("rb") as fh:
+                if os.fstat(fh.fileno()).st_size == 0:
+                    return None
+                # The mapping stays valid after the file is closed, and lives
+                # as long as any slice handed out from it.
+                return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError as exc:
+            raise _client_error("NoSuchKey", "Not Found", 404, "GetObject") from exc
+
+    def iter_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = 1024 * 1024,
+        *,
+        byte_range: str | None = None,
+    ) -> Iterator[memoryview]:
+        """Yield read-only zero-copy views of the object's pages.
+
+        Views stay valid for as long as they are referenced. Readahead for
+        the next chunk is requested before each one is handed out.
+        """
+        mapped = self._map(bucket, key)
+        if mapped is None:
+            return
+        start, end = 0, len(mapped) - 1
+        if byte_range:
+            bounds = parse_byte_range(byte_range, len(mapped))
+            if bounds is None:
+                raise _client_error(
+                    "InvalidRange", "Range Not Satisfiable", 416, "GetObject"
+                )
+            start, end = bounds
+        view = memoryview(mapped)
+        for offset in range(start, end + 1, chunk_size):
+            stop = min(offset + chunk_size, end + 1)
+            _prefetch(mapped, stop, chunk_size)
+            yield view[offset:stop]
+
+    def get_object_range(self, bucket: str, key: str, byte_range: str) -> bytes | None:
+        try:
+            mapped = self._map(bucket, key)
+        except ClientError:
+            return None
+        if mapped is None:
+            return None
+        with mapped:
+            bounds = parse_byte_range(byte_range, len(mapped))
+            if bounds is None:
+                return None
+            return mapped[bounds[0] : bounds[1] + 1]
+
+    def delete_objects(self, bucket: str, keys: list[str]) -> list[str]:
+        failed: list[str] = []
+        for key in keys:
+            path = self.object_path(bucket, key)
+            try:
+                self._meta_path(path).unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+            except OSError:
+                failed.append(key)
+        return failed
+
+
+class AsyncLocalStorageClient:
+    """Async facade over LocalStorageClient; disk I/O runs in worker threads."""
+
+    supports_multipart = False
+    supports_post = False
+
+    def __init__(self, sync_client: LocalStorageClient | None = None):
+        self._sync = sync_client or get_storage()
+        self.bucket = self._sync.bucket
+
+    @property
+    def not_found_exc(self):
+        return ClientError
+
+    async def aclose(self) -> None:
+        return None
+
+    def generate_presigned_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedUpload:
+        return self._sync.generate_presigned_put(
+            key, content_type, expires_in=expires_in, checksum_sha256=checksum_sha256
+        )
+
+    def generate_presigned_post(  # noqa: PLR0913
+        self,
+        key: str,
+        content_type: str,
+        content_length_range: tuple[int, int],
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedPost:
+        return self._sync.generate_presigned_post(
+            key,
+            content_type,
+            content_length_range,
+            expires_in=expires_in,
+            checksum_sha256=checksum_sha256,
+        )
+
+    def generate_presigned_get(self, key: str, expires: int = 3600) -> str:
+        return self._sync.generate_presigned_get(key, expires=expires)
+
+    def generate_presigned_get_download(  # noqa: PLR0913
+        self,
+        *,
+        key: str,
+        download_filename: str,
+        response_content_type: str | None = None,
+        expires: int = 3600,
+        signed_at: dt.datetime | None = None,
+    ) -> str:
+        return self._sync.generate_presigned_get_download(
+            key=key,
+            download_filename=download_filename,
+            response_content_type=response_content_type,
+            expires=expires,
+            signed_at=signed_at,
+        )
+
+    def generate_presigned_upload_part(
+        self, key: str, upload_id: str, part_number: int, expires: int = 3600
+    ) -> str:
+        return self._sync.generate_presigned_upload_part(
+            key, upload_id, part_number, expires=expires
+        )
+
+    async def create_multipart_upload(
+        self, bucket: str, key: str, content_type: str
+    ) -> str:
+        return self._sync.create_multipart_upload(bucket, key, content_type)
+
+    async def list_parts(self, bucket: str, key: str, upload_id: str) -> list[dict]:
+        return self._sync.list_parts(bucket, key, upload_id)
+
+    async def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: list[dict]
+    ) -> None:
+        self._sync.complete_multipart_upload(bucket, key, upload_id, parts)
+
+    async def abort_multipart_upload(
+        self, bucket: str, key: str, upload_id: str
+    ) -> None:
+        self._sync.abort_multipart_upload(bucket, key, upload_id)
+
+    async def head_object(
+        self, bucket: str, key: str, *, checksum: bool = False
+    ) -> dict:
+        return await asyncio.to_thread(
+            self._sync.head_object, bucket, key, checksum=checksum
+        )
+
+    async def iter_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = 1024 * 1024,
+        *,
+        byte_range: str | None = None,
+    ) -> AsyncIterator[memoryview]:
+        chunks = self._sync.iter_object(bucket, key, chunk_size, byte_range=byte_range)
+        while True:
+            # Opening the file and issuing readahead happen off the loop.
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def get_object_range(
+        self, bucket: str, key: str, byte_range: str
+    ) -> bytes | None:
+        return await asyncio.to_thread(
+            self._sync.get_object_range, bucket, key, byte_range
+        )
@@ -0,0 +1,345 @@
+import datetime as dt
+import logging
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+from botocore.exceptions import ClientError
+from redis import Redis
+from rq import Queue
+from sqlalchemy import delete, or_, select, text, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.api.deps import DEMO_COOKIE_MAX_AGE_SECONDS
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.audit import log_event
+from app.services.dedup import release_reference
+from app.services.scanner import SCAN_LANES, requeue_stranded
+from app.services.storage import StorageBackend, get_storage
+
+MAINTENANCE_QUEUE = "maintenance"
+_SCHEDULE_KEY_PREFIX = "maintenance:scheduled:"
+SWEEP_JOB = "app.services.maintenance.sweep_expired_uploads"
+DEMO_CLEANUP_JOB = "app.services.maintenance.cleanup_expired_demos"
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow_naive() -> dt.datetime:
+    """UTC 'now' as a naive datetime (matches our DB timestamp columns)."""
+    return dt.datetime.now(dt.UTC).replace(tzinfo=None)
+
+
+def get_maintenance_queue(connection: Redis | None = None) -> Queue:
+    redis = connection or Redis.from_url(settings.redis_url)
+    return Queue(MAINTENANCE_QUEUE, connection=redis)
+
+
+def ensure_scheduled(job: str, interval_seconds: int, connection: Redis) -> bool:
+    """Schedule ``job`` to run in ``interval_seconds`` unless already pending.
+
+    The Redis key lives as long as the pending run may (its delay plus the
+    job timeout), so any number of workers can call this at startup and on
+    every maintenance tick without stacking duplicate schedules, and a run
+    that was lost (killed worker, dropped scheduled job) is re-booked once
+    the key expires.
+    """
+    timeout = settings.maintenance_job_timeout_seconds
+    if not connection.set(
+        f"{_SCHEDULE_KEY_PREFIX}{job}", "1", nx=True, ex=interval_seconds + timeout
+    ):
+        return False
+    get_maintenance_queue(connection).enqueue_in(
+        dt.timedelta(seconds=interval_seconds), job, job_timeout=timeout
+    )
+    return True
+
+
+def ensure_maintenance_scheduled(connection: Redis) -> None:
+    ensure_scheduled(SWEEP_JOB, settings.sweeper_interval_seconds, connection)
+    ensure_scheduled(
+        DEMO_CLEANUP_JOB, settings.demo_cleanup_interval_seconds, connection
+    )
+
+
+def _reschedule(job: str, interval_seconds: int) -> None:
+    connection = Redis.from_url(settings.redis_url)
+    connection.delete(f"{_SCHEDULE_KEY_PREFIX}{job}")
+    ensure_scheduled(job, interval_seconds, connection)
+
+
+@dataclass
+class SweepStats:
+    batches: int = 0
+    rows: int = 0
+    objects_deleted: int = 0
+    delete_errors: int = 0
+    multipart_aborted: int = 0
+    scans_requeued: int = 0
+
+
+def _lock_expired_batch(
+    db: Session, cutoff: dt.datetime, batch_size: int, skip_ids: set[str]
+) -> list:
+    query = (
+        select(
+            models.FileObject.id,
+            models.FileObject.bucket,
+            models.FileObject.object_key,
+            models.FileObject.multipart_upload_id,
+        )
+        .where(
+            models.FileObject.state == models.FileObjectState.INITIATED,
+            models.FileObject.upload_expires_at < cutoff,
+        )
+        .order_by(models.FileObject.upload_expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if skip_ids:
+        query = query.where(models.FileObject.id.not_in(skip_ids))
+    return db.execute(query).all()
+
+
+def _delete_objects(storage: StorageBackend, rows: list) -> tuple[set[str], int]:
+    """Delete the rows' objects (aborting pending multipart uploads first).
+
+    Returns the ids whose object delete failed and the number of aborts.
+    """
+    aborted = 0
+    keys_by_bucket: dict[str, list[str]] = defaultdict(list)
+    for row in rows:
+        if row.multipart_upload_id:
+            try:
+                storage.abort_multipart_upload(
+                    row.bucket, row.object_key, row.multipart_upload_id
+                )
+                aborted += 1
+            except ClientError:
+                # Already completed or aborted; the object delete covers it.
+                pass
+        keys_by_bucket[row.bucket].append(row.object_key)
+
+    failed: set[tuple[str, str]] = set()
+    for bucket, keys in keys_by_bucket.items():
+        failed.update((bucket, key) for key in storage.delete_objects(bucket, keys))
+    return {row.id for row in rows if (row.bucket, row.object_key) in failed}, aborted
+
+
+def sweep_expired_uploads() -> dict:
+    """Reject INITIATED uploads past their expiry and delete their objects.
+
+    Rows are locked in batches through the partial index on INITIATED
+    expiries (SKIP LOCKED, so concurrent sweepers split the work). Objects
+    that were never uploaded simply don't exist; DeleteObjects ignores them.
+    Files stranded by dead batch scans are requeued on the way out.
+    """
+    stats = SweepStats()
+    db: Session = SessionLocal()
+    try:
+        storage = get_storage()
+        cutoff = utcnow_naive() - dt.timedelta(seconds=settings.sweeper_grace_seconds)
+        # Rows whose object could not be deleted stay INITIATED for the next run.
+        failed_ids: set[str] = set()
+        while stats.batches < settings.sweeper_max_batches:
+            rows = _lock_expired_batch(
+                db, cutoff, settings.sweeper_batch_size, failed_ids
+            )
+            if not rows:
+                break
+            # Objects go first while the rows stay locked: if storage fails,
+            # closing the session rolls back and the rows are retried later,
+            # never left REJECTED with an orphaned object.
+            failed, aborted = _delete_objects(storage, rows)
+            stats.multipart_aborted += aborted
+            stats.objects_deleted += len(rows) - len(failed)
+            stats.delete_errors += len(failed)
+            swept = [row.id for row in rows if row.id not in failed]
+            db.execute(
+                update(models.FileObject)
+                .where(models.FileObject.id.in_(swept))
+                .values(
+                    state=models.FileObjectState.REJECTED, updated_at=utcnow_naive()
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            failed_ids |= failed
+            stats.batches += 1
+            stats.rows += len(swept)
+            if failed:
+                logger.warning("sweeper: %d object deletes failed", len(failed))
+            logger.info(
+                "sweeper: batch %d rejected %d uploads (%d total, %d objects deleted)",
+                stats.batches,
+                len(swept),
+                stats.rows,
+                stats.objects_deleted,
+            )
+            if len(rows) < settings.sweeper_batch_size:
+                break
+        # Batch scans that died mid-run wait here if no later batch starts.
+        connection = Redis.from_url(settings.redis_url)
+        stats.scans_requeued = sum(
+            requeue_stranded(connection, lane) for lane in (None, *SCAN_LANES)
+        )
+        if stats.rows:
+            log_event(
+                db,
+                actor_user_id=None,
+                action="EXPIRED_UPLOADS_SWEPT",
+                metadata=asdict(stats),
+            )
+        return asdict(stats)
+    finally:
+        db.close()
+        _reschedule(SWEEP_JOB, settings.sweeper_interval_seconds)
+
+
+@dataclass
+class DemoCleanupStats:
+    batches: int = 0
+    users: int = 0
+    files: int = 0
+    objects_deleted: int = 0
+    delete_errors: int = 0
+
+
+def _demo_user_filter():
+    # Demo users are created with id == demo_id and this synthetic email;
+    # matching both keeps registered accounts out of reach.
+    # Spelled like the ix_users_demo_created predicate so the planner uses it.
+    return text("users.email = 'demo-' || users.id || '@demo.local'")
+
+
+def _lock_expired_demo_users(
+    db: Session, cutoff: dt.datetime, batch_size: int, skip_ids: set[str]
+) -> list[str]:
+    query = (
+        select(models.User.id)
+        .where(_demo_user_filter(), models.User.created_at < cutoff)
+        .order_by(models.User.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if skip_ids:
+        query = query.where(models.User.id.not_in(skip_ids))
+    return list(db.scalars(query))
+
+
+def _purge_demo_users(
+    db: Session, storage: StorageBackend, user_ids: list[str], stats: DemoCleanupStats
+) -> set[str]:
+    """Delete the users' objects, then their rows; returns users to retry."""
+    files = db.execute(
+        select(
+            models.FileObject.id,
+            models.FileObject.owner_id,
+            models.FileObject.bucket,
+            models.FileObject.object_key,
+            models.FileObject.multipart_upload_id,
+        ).where(models.FileObject.owner_id.in_(user_ids))
+    ).all()
+
+    # Objects shared with files outside this batch (deduplicated uploads)
+    # stay in storage.
+    keys = {(row.bucket, row.object_key) for row in files}
+    shared = set()
+    if keys:
+        shared = set(
+            db.execute(
+                select(models.FileObject.bucket, models.FileObject.object_key)
+                .where(
+                    tuple_(models.FileObject.bucket, models.FileObject.object_key).in_(
+                        list(keys)
+                    ),
+                    models.FileObject.owner_id.not_in(user_ids),
+                )
+                .distinct()
+            ).all()
+        )
+    unshared: dict[tuple[str, str], object] = {}
+    for row in files:
+        if (row.bucket, row.object_key) not in shared:
+            unshared.setdefault((row.bucket, row.object_key), row)
+    failed_files, _ = _delete_objects(storage, list(unshared.values()))
+    retry_users = {row.owner_id for row in files if row.id in failed_files}
+    stats.objects_deleted += len(unshared) - len(failed_files)
+    stats.delete_errors += len(failed_files)
+
+    purged_users = [user_id for user_id in user_ids if user_id not in retry_users]
+    purged_files = [row.id for row in files if row.owner_id not in retry_users]
+    for row in files:
+        if row.owner_id not in retry_users and (row.bucket, row.object_key) in shared:
+            release_reference(db, row.bucket, row.object_key)
+    released = [key for key, row in unshared.items() if row.owner_id not in retry_users]
+    if released:
+        db.execute(
+            delete(models.ObjectReference).where(
+                tuple_(
+                    models.ObjectReference.bucket, models.ObjectReference.object_key
+                ).in_(released)
+            )
+        )
+    db.execute(
+        delete(models.AuditEvent).where(
+            or_(
+                models.AuditEvent.file_id.in_(purged_files),
+                models.AuditEvent.actor_user_id.in_(purged_users),
+            )
+        )
+    )
+    db.execute(delete(models.FileObject).where(models.FileObject.id.in_(purged_files)))
+    db.execute(
+        delete(models.UsageCounter).where(models.UsageCounter.user_id.in_(purged_users))
+    )
+    db.execute(delete(models.User).where(models.User.id.in_(purged_users)))
+    db.commit()
+
+    stats.users += len(purged_users)
+    stats.files += len(purged_files)
+    return retry_users
+
+
+def cleanup_expired_demos() -> dict:
+    """Purge demo users whose demo cookie can no longer be valid.
+
+    Demo users are created on their first upload, after the cookie was
+    issued, so ``created_at + DEMO_COOKIE_MAX_AGE_SECONDS`` is a safe bound.
+    Each batch is its own transaction, and objects are deleted before the
+    rows, so an interrupted run simply resumes on the next schedule.
+    """
+    stats = DemoCleanupStats()
+    db: Session = SessionLocal()
+    try:
+        storage = get_storage()
+        cutoff = utcnow_naive() - dt.timedelta(seconds=DEMO_COOKIE_MAX_AGE_SECONDS)
+        retry_users: set[str] = set()
+        while stats.batches < settings.demo_cleanup_max_batches:
+            user_ids = _lock_expired_demo_users(
+                db, cutoff, settings.demo_cleanup_batch_size, retry_users
+            )
+            if not user_ids:
+                break
+            retry_users |= _purge_demo_users(db, storage, user_ids, stats)
+            stats.batches += 1
+            logger.info(
+                "demo cleanup: batch %d purged %d users (%d files so far)",
+                stats.batches,
+                stats.users,
+                stats.files,
+            )
+            if len(user_ids) < settings.demo_cleanup_batch_size:
+                break
+        if stats.users:
+            log_event(
+                db,
+                actor_user_id=None,
+                action="DEMO_SESSIONS_PURGED",
+                metadata=asdict(stats),
+            )
+        return asdict(stats)
+    finally:
+        db.close()
+        _reschedule(DEMO_CLEANUP_JOB, settings.demo_cleanup_interval_seconds)
@@ -17,7 +17,7 @@ class QuotaService:
     def __init__(self, db: Session):
         self.db = db
 
-    def _get_counter(self, user_id: str) -> models.UsageCounter:
+    def _get_counter(self, user_id: str, *, commit: bool = True) -> models.UsageCounter:
         counter = self.db.get(models.UsageCounter, user_id)
         if not counter:
             counter = models.UsageCounter(
@@ -27,6 +27,9 @@ class QuotaService:
                 updated_at=utcnow_naive(),
             )
             self.db.add(counter)
+            if not commit:
+                self.db.flush()
+                return counter
             self.db.commit()
             self.db.refresh(counter)
         return counter
@@ -37,8 +40,12 @@ class QuotaService:
             raise PermissionError("quota exceeded")
         # bytes enforcement deferred until file is active
 
-    def increment_on_active(self, user_id: str, file_size: int | None) -> None:
-        counter = self._get_counter(user_id)
+    def increment_on_active(
+        self, user_id: str, file_size: int | None, *, commit: bool = True
+    ) -> None:
+        """Count an ACTIVE file; ``commit=False`` leaves it to the caller's
+        transaction (batched scans)."""
+        counter = self._get_counter(user_id, commit=commit)
         new_files = counter.files_count + 1
         new_bytes = counter.bytes_stored + (file_size or 0)
         if new_files > MAX_FILES or new_bytes > MAX_BYTES:
@@ -46,7 +53,8 @@ class QuotaService:
         counter.files_count = new_files
         counter.bytes_stored = new_bytes
         counter.updated_at = utcnow_naive()
-        self.db.commit()
+        if commit:
+            self.db.commit()
 
     def decrement_on_delete(self, user_id: str, file_size: int | None) -> None:
         counter = self._get_counter(user_id)
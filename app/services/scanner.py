@@ -1,158 +1,660 @@
-import io
-import zipfile
+import datetime as dt
+import logging
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
 from redis import Redis
-from rq import Queue
-from rq.job import Retry
+from rq import Queue, get_current_job
+from rq.exceptions import NoSuchJobError
+from rq.job import Callback, Job, JobStatus, Retry
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.metrics import (
+    SCAN_OUTCOMES,
+    SCAN_QUEUE_WAIT_SECONDS,
+    SCAN_STAGE_SECONDS,
+    UPLOAD_TO_VERDICT_SECONDS,
+)
 from app.db import models
 from app.db.session import SessionLocal
 from app.services.audit import log_event
-from app.services.file_type_policy import validate_upload_metadata
-from app.services.quota import QuotaService
-from app.services.storage import StorageClient
+from app.services.file_type_policy import policy_fingerprint, validate_upload_metadata
+from app.services.inspection import SNIFF_RANGE, magic_head, sniff_mime
+from app.services.quota import QuotaService, utcnow_naive
+from app.services.signatures import (
+    get_signature_engine,
+    rules_digest,
+    rules_path,
+    scan_chunks,
+)
+from app.services.storage import StorageBackend, get_storage
+from app.services.verdict_cache import Verdict, get_verdict_cache
+from app.services.zip_directory import (
+    ZipDirectory,
+    ZipDirectoryError,
+    archive_stats,
+    read_central_directory,
+)
 
 SCAN_QUEUE = "scan"
+# Size lanes, smallest first: small files aren't stuck behind large scans.
+SCAN_LANES = ("small", "medium", "large")
+SCAN_FILE_JOB = "app.services.scanner.scan_file"
+SCAN_BATCH_JOB = "app.services.scanner.scan_batch"
+_PENDING_KEY = "scan:pending"
+_BATCH_SCHEDULED_KEY = "scan:batch:scheduled"
+# Ids a batch has claimed stay in a list of its own until its commit, so a
+# batch that dies mid-scan leaves them to be recovered.
+_PROCESSING_KEY = "scan:processing"
+# Lets a lost batch job be rescheduled by the next upload.
+_BATCH_SCHEDULED_TTL = 10 * 60
+# Completed scans per lane, counted in short buckets for admission control.
+_SCANNED_KEY = "scan:done"
+_SCANNED_BUCKET_SECONDS = 10
 MAX_SIZE_BYTES = 50 * 1024 * 1024
 OFFICE_REQUIRED_ZIP_ENTRIES: dict[str, tuple[str, ...]] = {
     ".docx": ("[Content_Types].xml", "word/document.xml"),
     ".xlsx": ("[Content_Types].xml", "xl/workbook.xml"),
     ".pptx": ("[Content_Types].xml", "ppt/presentation.xml"),
 }
+logger = logging.getLogger(__name__)
 
 
-def _has_required_office_entries(
-    storage: StorageClient, bucket: str, key: str, extension: str
-) -> bool:
-    required = OFFICE_REQUIRED_ZIP_ENTRIES.get(extension)
-    if not required:
-        return True
+def lane_queue(lane: str) -> str:
+    return f"{SCAN_QUEUE}-{lane}"
 
-    payload = io.BytesIO()
-    for chunk in storage.iter_object(bucket, key):
-        payload.write(chunk)
-        if payload.tell() > MAX_SIZE_BYTES:
-            return False
-    payload.seek(0)
 
-    try:
-        with zipfile.ZipFile(payload) as archive:
-            names = set(archive.namelist())
-            return set(required).issubset(names)
-    except zipfile.BadZipFile:
-        return False
+LANE_QUEUES = [lane_queue(lane) for lane in SCAN_LANES]
 
 
-def get_queue() -> Queue:
-    redis = Redis.from_url(settings.redis_url)
-    return Queue(SCAN_QUEUE, connection=redis)
+def scan_lane(size_bytes: int | None) -> str:
+    if size_bytes is None:
+        return "medium"
+    if size_bytes <= settings.scan_lane_small_max_bytes:
+        return "small"
+    if size_bytes <= settings.scan_lane_medium_max_bytes:
+        return "medium"
+    return "large"
+
+
+def weighted_lane_order(
+    weights: Mapping[str, int], rand: Callable[[], float] = random.random
+) -> list[str]:
+    """Lanes in a random order where each leads with probability ~ its weight.
+
+    Workers poll queues in order, so re-drawing this after every job splits
+    busy workers' attention by weight while idle lanes cost nothing. Lanes
+    with no weight come last, so they're only drained when the rest are empty.
+    """
+    keyed = [
+        (rand() ** (1 / weights[lane]) if weights.get(lane, 0) > 0 else -1.0, lane)
+        for lane in SCAN_LANES
+    ]
+    return [lane for _, lane in sorted(keyed, reverse=True)]
+
+
+def queue_depths(connection: Redis | None = None) -> dict[tuple[str, str], int]:
+    """Queued jobs and batch-pending files per scan queue, in one round trip."""
+    redis = connection or Redis.from_url(settings.redis_url)
+    keys = {(SCAN_QUEUE, "jobs"): Queue(SCAN_QUEUE, connection=redis).key}
+    keys[(SCAN_QUEUE, "pending")] = _pending_key(None)
+    for lane in SCAN_LANES:
+        keys[(lane_queue(lane), "jobs")] = Queue(lane_queue(lane), connection=redis).key
+        keys[(lane_queue(lane), "pending")] = _pending_key(lane)
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys.values():
+        pipeline.llen(key)
+    return dict(zip(keys, pipeline.execute(), strict=True))
+
+
+def record_scanned(redis: Redis, lane: str, count: int = 1) -> None:
+    bucket = int(time.time()) // _SCANNED_BUCKET_SECONDS
+    key = f"{_SCANNED_KEY}:{lane}:{bucket}"
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.incrby(key, count)
+    pipeline.expire(
+        key, settings.scan_admission_window_seconds + _SCANNED_BUCKET_SECONDS
+    )
+    pipeline.execute()
+
 
+def scan_throughput(redis: Redis, lane: str) -> float:
+    """Files per second a lane completed over the admission window."""
+    now = time.time()
+    current = int(now) // _SCANNED_BUCKET_SECONDS
+    buckets = max(settings.scan_admission_window_seconds // _SCANNED_BUCKET_SECONDS, 1)
+    counts = redis.mget(
+        [
+            f"{_SCANNED_KEY}:{lane}:{bucket}"
+            for bucket in range(current - buckets, current + 1)
+        ]
+    )
+    # The current bucket is only partly elapsed.
+    elapsed = (
+        buckets * _SCANNED_BUCKET_SECONDS + now - current * _SCANNED_BUCKET_SECONDS
+    )
+    return sum(int(count) for count in counts if count) / elapsed
+
+
+def get_queue(connection: Redis | None = None, lane: str | None = None) -> Queue:
+    redis = connection or Redis.from_url(settings.redis_url)
+    return Queue(lane_queue(lane) if lane else SCAN_QUEUE, connection=redis)
+
+
+def enqueue_scan(file_id: str, size_bytes: int | None = None):
+    lane = scan_lane(size_bytes)
+    if settings.scan_batch_size > 1:
+        _enqueue_batched(file_id, lane)
+        return
+    _enqueue_single(get_queue(lane=lane), file_id)
 
-def enqueue_scan(file_id: str):
-    queue = get_queue()
+
+def retry_intervals(rand: Callable[[], float] = random.random) -> list[int]:
+    """Exponential backoff with equal jitter, drawn once per job.
+
+    Retry n waits between half and all of ``base * 2**n`` (capped), so jobs
+    that failed together during a storage outage don't retry together.
+    """
+    intervals = []
+    for attempt in range(settings.scan_retry_max):
+        ceiling = min(
+            settings.scan_retry_base_seconds * 2**attempt,
+            settings.scan_retry_max_seconds,
+        )
+        intervals.append(round(ceiling / 2 + rand() * ceiling / 2))
+    return intervals
+
+
+def _enqueue_single(queue: Queue, file_id: str) -> None:
     queue.enqueue(
-        "app.services.scanner.scan_file",
+        SCAN_FILE_JOB,
         file_id=file_id,
-        retry=Retry(max=3, interval=[10, 30, 60]),
+        retry=(
+            Retry(max=settings.scan_retry_max, interval=retry_intervals())
+            if settings.scan_retry_max
+            else None
+        ),
+        on_failure=Callback(on_scan_failure),
     )
 
 
-def scan_file(file_id: str) -> str:  # noqa: PLR0911, PLR0912
+def on_scan_failure(job: Job, _connection, _exc_type, exc_value, _traceback) -> None:
+    """RQ failure callback: dead-letter the file once its retries are spent.
+
+    The job itself stays in its queue's failed job registry, the dead-letter
+    queue that ``python -m app.workers.dead_letters`` lists and replays.
+    """
+    if job.retries_left:
+        return
+    dead_letter(job.kwargs["file_id"], error=str(exc_value), job_id=job.id)
+
+
+def dead_letter(file_id: str, *, error: str, job_id: str | None = None) -> bool:
+    """Move a file stuck in SCANNING to SCAN_FAILED; False if it wasn't."""
     db: Session = SessionLocal()
     try:
-        file_obj: models.FileObject | None = db.get(models.FileObject, file_id)
-        if not file_obj:
-            return "missing"
-        if file_obj.state != models.FileObjectState.SCANNING:
-            return "skip"
+        moved = db.execute(
+            update(models.FileObject)
+            .where(
+                models.FileObject.id == file_id,
+                models.FileObject.state == models.FileObjectState.SCANNING,
+            )
+            .values(state=models.FileObjectState.SCAN_FAILED, updated_at=utcnow_naive())
+        ).rowcount
+        if not moved:
+            db.rollback()
+            return False
+        log_event(
+            db,
+            actor_user_id=None,
+            action="SCAN_DEAD_LETTERED",
+            file_id=file_id,
+            metadata={"error": error, "job_id": job_id},
+        )
+    finally:
+        db.close()
+    SCAN_OUTCOMES.labels("scan_failed", "retries_exhausted").inc()
+    logger.warning("scan of %s dead-lettered: %s", file_id, error)
+    return True
+
+
+def _pending_key(lane: str | None) -> str:
+    # No lane: the single list used before lanes existed, drained by any
+    # batch job still queued from then.
+    return f"{_PENDING_KEY}:{lane}" if lane else _PENDING_KEY
+
+
+def _enqueue_batched(file_id: str, lane: str, connection: Redis | None = None) -> None:
+    redis = connection or Redis.from_url(settings.redis_url)
+    # The enqueue time rides along so the batch can report queue wait.
+    redis.rpush(_pending_key(lane), f"{file_id}|{time.time():.3f}")
+    _ensure_batch_job(redis, lane)
+
+
+def _ensure_batch_job(redis: Redis, lane: str | None) -> None:
+    # One batch job pending per lane; it clears the flag before draining,
+    # so ids pushed while it runs schedule the next one.
+    flag = f"{_BATCH_SCHEDULED_KEY}:{lane}" if lane else _BATCH_SCHEDULED_KEY
+    if redis.set(flag, "1", nx=True, ex=_BATCH_SCHEDULED_TTL):
+        get_queue(redis, lane).enqueue(SCAN_BATCH_JOB, lane=lane)
+
+
+@dataclass
+class ScanOutcome:
+    result: str
+    action: str
+    metadata: dict
 
-        storage = StorageClient()
-        head = storage.head_object(file_obj.bucket, file_obj.object_key)
-        file_obj.size_bytes = head.get("ContentLength")
 
-        sample = storage.get_object_range(
-            file_obj.bucket, file_obj.object_key, byte_range="bytes=0-16383"
+def _quarantine(file_obj: models.FileObject, metadata: dict) -> ScanOutcome:
+    file_obj.state = models.FileObjectState.QUARANTINED
+    return ScanOutcome("quarantined", "SCAN_QUARANTINED", metadata)
+
+
+# Byte sources a stage can ask for; each is read at most once per scan.
+NEED_HEAD = "head"
+NEED_SAMPLE = "sample"
+NEED_ZIP_DIRECTORY = "zip_directory"
+
+
+@dataclass
+class ScanContext:
+    """One file's scan state, shared by the stages.
+
+    Reads happen through ``load`` when a stage first declares it needs
+    them, so later stages reuse what earlier ones fetched.
+    """
+
+    db: Session
+    storage: StorageBackend
+    file_obj: models.FileObject
+    inspection: dict
+    head: dict | None = None
+    sample: bytes | None = None
+    sniffed: str | None = None
+    zip_directory: ZipDirectory | None = None
+    # Cleared when a storage read fails: the verdict then isn't cached.
+    reads_ok: bool = True
+    timings: dict[str, float] = field(default_factory=dict)
+    _loaded: set[str] = field(default_factory=set)
+
+    @property
+    def extension(self) -> str:
+        return Path(self.file_obj.original_filename).suffix.lower()
+
+    def load(self, needs: Iterable[str]) -> None:
+        loaders = {
+            NEED_HEAD: self._load_head,
+            NEED_SAMPLE: self._load_sample,
+            NEED_ZIP_DIRECTORY: self._load_zip_directory,
+        }
+        for need in needs:
+            if need not in self._loaded:
+                self._loaded.add(need)
+                loaders[need]()
+
+    def _load_head(self) -> None:
+        self.head = self.storage.head_object(
+            self.file_obj.bucket, self.file_obj.object_key
         )
-        sniffed = file_obj.sniffed_content_type
-        if sample:
-            try:
-                import magic
 
-                sniffed = magic.from_buffer(sample, mime=True)
-            except Exception:
-                pass
-        file_obj.sniffed_content_type = sniffed
+    def _load_sample(self) -> None:
+        # complete_upload kept the first bytes it streamed.
+        self.sniffed = self.file_obj.sniffed_content_type
+        self.sample = magic_head(self.inspection)
+        if self.sample is None:
+            self.sample = self.storage.get_object_range(
+                self.file_obj.bucket, self.file_obj.object_key, byte_range=SNIFF_RANGE
+            )
+            self.reads_ok &= self.sample is not None
+            self.sniffed = sniff_mime(self.sample) or self.sniffed
+
+    def _load_zip_directory(self) -> None:
+        failed_reads = 0
+
+        def read_range(start: int, length: int) -> bytes | None:
+            nonlocal failed_reads
+            data = self.storage.get_object_range(
+                self.file_obj.bucket,
+                self.file_obj.object_key,
+                byte_range=f"bytes={start}-{start + length - 1}",
+            )
+            failed_reads += data is None
+            return data
+
+        # Only the end records and central directory are fetched, not the members.
+        try:
+            self.zip_directory = read_central_directory(
+                read_range, self.file_obj.size_bytes or 0
+            )
+        except ZipDirectoryError:
+            self.reads_ok &= not failed_reads
+
+
+@dataclass(frozen=True)
+class StageFailure:
+    metadata: dict
+    # Content failures that don't depend only on the bytes (or that name
+    # the uploader's file) opt out of the verdict cache.
+    cacheable: bool = True
+
+
+class ScanStage(ABC):
+    """One check of the scan pipeline.
+
+    "object" stages run on every scan before the content verdict; "content"
+    stages decide the verdict, which is cached by digest; "account" stages
+    run on every scan once the content passed. The first failure quarantines
+    the file.
+    """
+
+    name: str
+    phase: str = "content"
+    # Part of SCAN_POLICY_VERSION for content stages: changes whenever the
+    # stage's own configuration would change its verdicts.
+    version: str = ""
+
+    def needs(self, ctx: ScanContext) -> set[str]:  # noqa: ARG002
+        return set()
+
+    @abstractmethod
+    def run(self, ctx: ScanContext) -> StageFailure | None: ...
+
+
+class SizeStage(ScanStage):
+    name = "size"
+    phase = "object"
+
+    def needs(self, ctx: ScanContext) -> set[str]:  # noqa: ARG002
+        return {NEED_HEAD}
 
+    def run(self, ctx: ScanContext) -> StageFailure | None:
+        ctx.file_obj.size_bytes = ctx.head.get("ContentLength")
+        # complete_upload already inspected the bytes; reuse its results as
+        # long as the object hasn't been replaced since (the presigned PUT
+        # stays valid until it expires).
+        etag = ctx.inspection.get("etag")
+        if etag and ctx.head.get("ETag") != etag:
+            return StageFailure({"reason": "object_changed"})
+        size = ctx.file_obj.size_bytes
+        if size is not None and size > MAX_SIZE_BYTES:
+            return StageFailure(
+                {"reason": "too_large", "size": size, "max": MAX_SIZE_BYTES}
+            )
+        return None
+
+
+class MagicStage(ScanStage):
+    name = "magic"
+
+    def needs(self, ctx: ScanContext) -> set[str]:  # noqa: ARG002
+        return {NEED_SAMPLE}
+
+    def run(self, ctx: ScanContext) -> StageFailure | None:
+        file_obj = ctx.file_obj
         validation = validate_upload_metadata(
             original_filename=file_obj.original_filename,
             declared_content_type=file_obj.declared_content_type,
-            sniffed_content_type=sniffed,
+            sniffed_content_type=ctx.sniffed,
             size_bytes=file_obj.size_bytes,
-            sample_bytes=sample,
+            sample_bytes=ctx.sample,
             max_size_bytes=MAX_SIZE_BYTES,
         )
         if validation.ok:
-            extension = Path(file_obj.original_filename).suffix.lower()
-            if not _has_required_office_entries(
-                storage, file_obj.bucket, file_obj.object_key, extension
-            ):
-                file_obj.state = models.FileObjectState.QUARANTINED
-                db.commit()
-                log_event(
-                    db,
-                    actor_user_id=file_obj.owner_id,
-                    action="SCAN_QUARANTINED",
-                    file_id=file_obj.id,
-                    metadata={"reason": "office_zip_invalid", "ext": extension},
-                )
-                return "quarantined"
+            return None
+        return StageFailure(
+            {
+                "reason": validation.reason,
+                "sniffed": ctx.sniffed,
+                "declared": file_obj.declared_content_type,
+                **(validation.details or {}),
+            },
+            # Extension rejections are instant and name the uploader's file.
+            cacheable=validation.reason != "disallowed_extension",
+        )
 
-            file_obj.state = models.FileObjectState.ACTIVE
-            try:
-                QuotaService(db).increment_on_active(
-                    file_obj.owner_id, file_obj.size_bytes or 0
-                )
-                db.commit()
-                log_event(
-                    db,
-                    actor_user_id=file_obj.owner_id,
-                    action="SCAN_PASS",
-                    file_id=file_obj.id,
-                    metadata={"sniffed": sniffed},
-                )
-                return "active"
-            except PermissionError:
-                file_obj.state = models.FileObjectState.QUARANTINED
-                db.commit()
-                log_event(
-                    db,
-                    actor_user_id=file_obj.owner_id,
-                    action="SCAN_QUARANTINED",
-                    file_id=file_obj.id,
-                    metadata={"reason": "quota_exceeded"},
-                )
-                return "quarantined"
 
-        file_obj.state = models.FileObjectState.QUARANTINED
+def _archive_limit_exceeded(archive: dict) -> str | None:
+    limits = (
+        ("entries", settings.scan_zip_max_entries),
+        ("total_uncompressed", settings.scan_zip_max_uncompressed_bytes),
+        ("max_ratio", settings.scan_zip_max_ratio),
+        ("nested_archives", settings.scan_zip_max_nested_archives),
+        ("overlapping_entries", 0),
+    )
+    return next((field for field, limit in limits if archive[field] > limit), None)
+
+
+class StructureStage(ScanStage):
+    """Office ZIP checks: required entries, macros and zip-bomb limits.
+
+    Both come from the central directory alone; no member is inflated.
+    """
+
+    name = "structure"
+
+    @property
+    def version(self) -> str:
+        return (
+            f"{settings.scan_zip_max_entries}:{settings.scan_zip_max_uncompressed_bytes}"
+            f":{settings.scan_zip_max_ratio}:{settings.scan_zip_max_nested_archives}"
+            ":macros"
+        )
+
+    def needs(self, ctx: ScanContext) -> set[str]:
+        # complete_upload answers this from the tail it streamed when the
+        # central directory fit in it (False: it was malformed). Records
+        # from before macro counting are re-read.
+        archive = ctx.inspection.get("archive")
+        if (
+            ctx.extension in OFFICE_REQUIRED_ZIP_ENTRIES
+            and ctx.inspection.get("office_entries") is not False
+            and (archive is None or "vba_projects" not in archive)
+        ):
+            return {NEED_ZIP_DIRECTORY}
+        return set()
+
+    def run(self, ctx: ScanContext) -> StageFailure | None:
+        required = OFFICE_REQUIRED_ZIP_ENTRIES.get(ctx.extension)
+        if not required:
+            return None
+        office_entries = ctx.inspection.get("office_entries")
+        archive = ctx.inspection.get("archive")
+        if ctx.zip_directory is not None:
+            office_entries = set(required).issubset(ctx.zip_directory.names)
+            archive = asdict(archive_stats(ctx.zip_directory))
+        if not office_entries or archive is None:
+            return StageFailure({"reason": "office_zip_invalid", "ext": ctx.extension})
+        if archive.get("vba_projects"):
+            return StageFailure({"reason": "office_macros", "ext": ctx.extension})
+        limit = _archive_limit_exceeded(archive)
+        if limit is not None:
+            return StageFailure(
+                {"reason": "zip_bomb", "limit": limit, "ext": ctx.extension, **archive}
+            )
+        return None
+
+
+class SignatureStage(ScanStage):
+    """Streams the whole object through the signature automaton.
+
+    The stream isn't a context source: keeping it would defeat the bounded
+    memory, and no other stage needs the full bytes.
+    """
+
+    name = "signatures"
+
+    @property
+    def version(self) -> str:
+        return rules_digest(rules_path()) if settings.scan_signatures_enabled else ""
+
+    def run(self, ctx: ScanContext) -> StageFailure | None:
+        if not settings.scan_signatures_enabled:
+            return None
+        match = scan_chunks(
+            get_signature_engine(),
+            ctx.storage.iter_object(ctx.file_obj.bucket, ctx.file_obj.object_key),
+        )
+        if match is None:
+            return None
+        return StageFailure({"reason": "signature_match", "signature": match.name})
+
+
+class QuotaStage(ScanStage):
+    name = "quota"
+    phase = "account"
+
+    def run(self, ctx: ScanContext) -> StageFailure | None:
+        # Quota depends on the owner, not the bytes: never cached.
+        try:
+            QuotaService(ctx.db).increment_on_active(
+                ctx.file_obj.owner_id, ctx.file_obj.size_bytes or 0, commit=False
+            )
+        except PermissionError:
+            return StageFailure({"reason": "quota_exceeded"})
+        return None
+
+
+SCAN_STAGES: list[ScanStage] = [
+    SizeStage(),
+    MagicStage(),
+    StructureStage(),
+    SignatureStage(),
+    QuotaStage(),
+]
+# Everything besides the bytes that decides a verdict.
+SCAN_POLICY_VERSION = policy_fingerprint(
+    MAX_SIZE_BYTES,
+    sorted(OFFICE_REQUIRED_ZIP_ENTRIES.items()),
+    [(stage.name, stage.version) for stage in SCAN_STAGES if stage.phase == "content"],
+)
+
+
+def _run_stages(ctx: ScanContext, phase: str) -> StageFailure | None:
+    for stage in SCAN_STAGES:
+        if stage.phase != phase:
+            continue
+        started = time.perf_counter()
+        try:
+            ctx.load(stage.needs(ctx))
+            failure = stage.run(ctx)
+        finally:
+            # Includes the reads the stage was the first to need.
+            elapsed = time.perf_counter() - started
+            ctx.timings[stage.name] = round(elapsed * 1000, 1)
+            SCAN_STAGE_SECONDS.labels(stage.name).observe(elapsed)
+        if failure is not None:
+            return failure
+    return None
+
+
+def _content_verdict(ctx: ScanContext) -> tuple[Verdict, bool]:
+    """Run the content stages; returns the verdict and whether to cache it."""
+    failure = _run_stages(ctx, "content")
+    if failure is None:
+        return Verdict(ok=True, sniffed_content_type=ctx.sniffed), ctx.reads_ok
+    return (
+        Verdict(ok=False, sniffed_content_type=ctx.sniffed, metadata=failure.metadata),
+        ctx.reads_ok and failure.cacheable,
+    )
+
+
+def _verdict_cache_key(file_obj: models.FileObject) -> str:
+    return get_verdict_cache().key(
+        sha256=file_obj.checksum_sha256,
+        size=file_obj.size_bytes or 0,
+        extension=Path(file_obj.original_filename).suffix.lower(),
+        declared_content_type=file_obj.declared_content_type,
+        policy_version=SCAN_POLICY_VERSION,
+    )
+
+
+def _run_pipeline(ctx: ScanContext) -> ScanOutcome:
+    file_obj = ctx.file_obj
+    failure = _run_stages(ctx, "object")
+    if failure is not None:
+        return _quarantine(file_obj, failure.metadata)
+
+    # The digest only describes the stored bytes if complete verified it and
+    # the ETag shows the object is still the one it verified.
+    cache_key = None
+    verdict = None
+    if (
+        settings.scan_verdict_cache_enabled
+        and file_obj.checksum_verified
+        and ctx.inspection.get("etag")
+    ):
+        cache_key = _verdict_cache_key(file_obj)
+        verdict = get_verdict_cache().get(cache_key)
+    cached = verdict is not None
+    if verdict is None:
+        verdict, cacheable = _content_verdict(ctx)
+        if cache_key is not None and cacheable:
+            get_verdict_cache().set(cache_key, verdict)
+    file_obj.sniffed_content_type = verdict.sniffed_content_type
+
+    # Copied: the cached verdict keeps its own metadata.
+    metadata = {**verdict.metadata, "cached": True} if cached else {**verdict.metadata}
+    if not verdict.ok:
+        return _quarantine(file_obj, metadata)
+
+    failure = _run_stages(ctx, "account")
+    if failure is not None:
+        return _quarantine(file_obj, failure.metadata)
+    file_obj.state = models.FileObjectState.ACTIVE
+    metadata["sniffed"] = verdict.sniffed_content_type
+    return ScanOutcome("active", "SCAN_PASS", metadata)
+
+
+def _scan_object(
+    db: Session, storage: StorageBackend, file_obj: models.FileObject
+) -> ScanOutcome:
+    """Decide a SCANNING file's fate; changes are left for the caller to commit."""
+    ctx = ScanContext(
+        db=db, storage=storage, file_obj=file_obj, inspection=file_obj.inspection or {}
+    )
+    outcome = _run_pipeline(ctx)
+    # Per-stage wall time in ms; stages a cached verdict skipped are absent.
+    outcome.metadata["stages_ms"] = ctx.timings
+    return outcome
+
+
+def scan_file(file_id: str) -> str:
+    db: Session = SessionLocal()
+    try:
+        file_obj: models.FileObject | None = db.get(models.FileObject, file_id)
+        if not file_obj:
+            return "missing"
+        if file_obj.state != models.FileObjectState.SCANNING:
+            return "skip"
+
+        outcome = _scan_object(db, get_storage(), file_obj)
+        created_at = file_obj.created_at
         db.commit()
+        lane_metadata = _job_lane_metadata()
+        outcome.metadata.update(lane_metadata)
         log_event(
             db,
             actor_user_id=file_obj.owner_id,
-            action="SCAN_QUARANTINED",
+            action=outcome.action,
             file_id=file_obj.id,
-            metadata={
-                "reason": validation.reason,
-                "sniffed": sniffed,
-                "declared": file_obj.declared_content_type,
-                **(validation.details or {}),
-            },
+            metadata=outcome.metadata,
         )
-        return "quarantined"
+        _observe_outcome(outcome, created_at)
+        if "lane" in lane_metadata:
+            record_scanned(get_current_job().connection, lane_metadata["lane"])
+        return outcome.result
 
     except Exception as exc:  # noqa: BLE001
+        db.rollback()
         log_event(
             db,
             actor_user_id=None,
@@ -163,3 +665,223 @@ def scan_file(file_id: str) -> str:  # noqa: PLR0911, PLR0912
         raise
     finally:
         db.close()
+
+
+def _observe_outcome(outcome: ScanOutcome, created_at: dt.datetime | None) -> None:
+    SCAN_OUTCOMES.labels(outcome.result, outcome.metadata.get("reason", "")).inc()
+    if "queue_wait_ms" in outcome.metadata:
+        SCAN_QUEUE_WAIT_SECONDS.labels(outcome.metadata.get("lane", "")).observe(
+            outcome.metadata["queue_wait_ms"] / 1000
+        )
+    if created_at is not None:
+        # created_at is naive UTC, like every timestamp column.
+        elapsed = dt.datetime.now(dt.UTC).replace(tzinfo=None) - created_at
+        UPLOAD_TO_VERDICT_SECONDS.labels(outcome.result).observe(
+            max(elapsed.total_seconds(), 0)
+        )
+
+
+def _job_lane_metadata() -> dict:
+    """Lane and queue wait of the running per-file job, for the audit event."""
+    job = get_current_job()
+    if job is None or not job.origin.startswith(f"{SCAN_QUEUE}-"):
+        return {}
+    metadata: dict = {"lane": job.origin.removeprefix(f"{SCAN_QUEUE}-")}
+    if job.enqueued_at and job.started_at:
+        wait = job.started_at - job.enqueued_at
+        metadata["queue_wait_ms"] = max(round(wait.total_seconds() * 1000), 0)
+    return metadata
+
+
+def _processing_keys(lane: str | None) -> tuple[str, str]:
+    """The lane's set of batches in flight and its processing list prefix."""
+    owners = f"{_PROCESSING_KEY}:{lane}" if lane else _PROCESSING_KEY
+    return owners, f"{owners}:"
+
+
+def _parse_entries(entries: Iterable[bytes]) -> dict[str, float | None]:
+    """Pending entries as file id -> enqueue time (if recorded)."""
+    pending: dict[str, float | None] = {}
+    for entry in entries:
+        file_id, _, enqueued_at = entry.decode().partition("|")
+        pending[file_id] = float(enqueued_at) if enqueued_at else None
+    return pending
+
+
+def batched_file_ids(connection: Redis | None = None) -> set[str]:
+    """Files waiting in a batch pending list or claimed by a batch."""
+    redis = connection or Redis.from_url(settings.redis_url)
+    lanes = (None, *SCAN_LANES)
+    owners = {lane: redis.smembers(_processing_keys(lane)[0]) for lane in lanes}
+    pipeline = redis.pipeline(transaction=False)
+    for lane in lanes:
+        pipeline.lrange(_pending_key(lane), 0, -1)
+        prefix = _processing_keys(lane)[1]
+        for owner in owners[lane]:
+            pipeline.lrange(f"{prefix}{owner.decode()}", 0, -1)
+    return {
+        file_id for entries in pipeline.execute() for file_id in _parse_entries(entries)
+    }
+
+
+def _batch_owner() -> str:
+    # Outside a worker (tests, a shell) the claim has no job, so recovery
+    # would treat it as stranded; only workers run batches concurrently.
+    job = get_current_job()
+    return job.id if job else uuid.uuid4().hex
+
+
+def _claim_pending(
+    redis: Redis, lane: str | None, owner: str, count: int
+) -> dict[str, float | None]:
+    """Move up to ``count`` pending entries to ``owner``'s processing list."""
+    owners, prefix = _processing_keys(lane)
+    pipeline = redis.pipeline()
+    pipeline.sadd(owners, owner)
+    for _ in range(count):
+        pipeline.lmove(_pending_key(lane), f"{prefix}{owner}", "LEFT", "RIGHT")
+    return _parse_entries(entry for entry in pipeline.execute()[1:] if entry)
+
+
+def _release_claim(redis: Redis, lane: str | None, owner: str) -> None:
+    owners, prefix = _processing_keys(lane)
+    pipeline = redis.pipeline()
+    pipeline.delete(f"{prefix}{owner}")
+    pipeline.srem(owners, owner)
+    pipeline.execute()
+
+
+def _hand_off(redis: Redis, lane: str | None, owner: str, file_ids: list[str]) -> None:
+    """Send files to per-file jobs, then drop the batch's claim on them."""
+    queue = get_queue(redis, lane)
+    for file_id in file_ids:
+        _enqueue_single(queue, file_id)
+    _release_claim(redis, lane, owner)
+
+
+def requeue_stranded(connection: Redis | None = None, lane: str | None = None) -> int:
+    """Hand ids claimed by batches that are no longer running to per-file jobs.
+
+    A batch whose work horse was killed never commits or releases its
+    claim. Its files go to single-file jobs rather than back to the pending
+    list, so a file that keeps killing workers runs out of retries and is
+    dead-lettered instead of taking every batch down with it.
+    """
+    redis = connection or Redis.from_url(settings.redis_url)
+    owners, prefix = _processing_keys(lane)
+    queue = get_queue(redis, lane)
+    requeued = 0
+    for owner in (member.decode() for member in redis.smembers(owners)):
+        try:
+            if Job.fetch(owner, connection=redis).get_status() == JobStatus.STARTED:
+                continue
+        except NoSuchJobError:
+            pass
+        pipeline = redis.pipeline()
+        pipeline.lrange(f"{prefix}{owner}", 0, -1)
+        pipeline.delete(f"{prefix}{owner}")
+        pipeline.srem(owners, owner)
+        for file_id in _parse_entries(pipeline.execute()[0]):
+            _enqueue_single(queue, file_id)
+            requeued += 1
+    if requeued:
+        logger.warning(
+            "requeued %d scans stranded by dead batches [%s]",
+            requeued,
+            lane or "default",
+        )
+    return requeued
+
+
+def scan_batch(lane: str | None = None) -> dict:  # noqa: PLR0912
+    """Scan up to ``scan_batch_size`` queued files of a lane in one transaction.
+
+    The rows are loaded with one query and scanned with the process-wide
+    storage client; each file runs in a savepoint so a storage error only
+    sends that file back to a per-file job (with the usual retries). If the
+    whole batch fails, every file goes to a per-file job.
+    """
+    redis = Redis.from_url(settings.redis_url)
+    pending_key = _pending_key(lane)
+    redis.delete(f"{_BATCH_SCHEDULED_KEY}:{lane}" if lane else _BATCH_SCHEDULED_KEY)
+    requeue_stranded(redis, lane)
+    owner = _batch_owner()
+    pending = _claim_pending(redis, lane, owner, settings.scan_batch_size)
+    file_ids = list(pending)
+    results: dict[str, int] = defaultdict(int)
+    if not file_ids:
+        _release_claim(redis, lane, owner)
+        return dict(results)
+    started_at = time.time()
+
+    db: Session = SessionLocal()
+    retry: list[str] = []
+    scanned: list[tuple[ScanOutcome, dt.datetime | None]] = []
+    try:
+        storage = get_storage()
+        rows = db.scalars(
+            select(models.FileObject)
+            .where(
+                models.FileObject.id.in_(file_ids),
+                models.FileObject.state == models.FileObjectState.SCANNING,
+            )
+            .with_for_update(skip_locked=True)
+        ).all()
+        results["skip"] = len(file_ids) - len(rows)
+        for file_obj in rows:
+            try:
+                with db.begin_nested():
+                    outcome = _scan_object(db, storage, file_obj)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("batch scan of %s failed", file_obj.id, exc_info=True)
+                retry.append(file_obj.id)
+                results["retry"] += 1
+                log_event(
+                    db,
+                    actor_user_id=None,
+                    action="SCAN_FAIL",
+                    file_id=file_obj.id,
+                    metadata={"error": str(exc), "batch": True},
+                    commit=False,
+                )
+                continue
+            results[outcome.result] += 1
+            scanned.append((outcome, file_obj.created_at))
+            if lane:
+                outcome.metadata["lane"] = lane
+            if pending[file_obj.id] is not None:
+                outcome.metadata["queue_wait_ms"] = max(
+                    round((started_at - pending[file_obj.id]) * 1000), 0
+                )
+            log_event(
+                db,
+                actor_user_id=file_obj.owner_id,
+                action=outcome.action,
+                file_id=file_obj.id,
+                metadata=outcome.metadata,
+                commit=False,
+            )
+        db.commit()
+    except BaseException:
+        # Nothing was committed. Retrying the batch as a whole would spin on
+        # a file that breaks it; per-file jobs back off and dead-letter.
+        _hand_off(redis, lane, owner, file_ids)
+        raise
+    finally:
+        db.close()
+
+    for outcome, created_at in scanned:
+        _observe_outcome(outcome, created_at)
+    if lane and scanned:
+        record_scanned(redis, lane, len(scanned))
+    _hand_off(redis, lane, owner, retry)
+    if redis.llen(pending_key):
+        _ensure_batch_job(redis, lane)
+    waits = [started_at - at for at in pending.values() if at is not None]
+    logger.info(
+        "batch scan [%s]: %s (max queue wait %.1fs)",
+        lane or "default",
+        dict(results),
+        max(waits, default=0.0),
+    )
+    return dict(results)
@@ -0,0 +1,241 @@
+"""Streaming multi-pattern byte signature matching (Aho-Corasick).
+
+The automaton is built once from a rules file. Scanning keeps only the
+current automaton state between chunks, so matches that straddle chunk
+boundaries are found while memory stays bounded by the automaton, not the
+object.
+
+Benign data rarely contains any signature, so whole blocks are first
+checked at C speed: every occurrence of a pattern of at least 7 bytes
+contains a 4-byte gram starting at a stream offset divisible by 4, and a
+block whose aligned grams are disjoint from the patterns' grams needs no
+automaton walk (beyond finishing a match already under way).
+
+Rules file: one signature per line, ``<name> <pattern>``, where the pattern
+is ``hex:<hex bytes>`` or ``text:<literal ASCII, to the end of the line>``.
+Blank lines and lines starting with ``#`` are ignored.
+"""
+
+import hashlib
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("signatures.rules")
+_GRAM_SIZE = 4
+_MIN_PREFILTER_LENGTH = 2 * _GRAM_SIZE - 1
+# Multiple of _GRAM_SIZE, so blocks start on aligned stream offsets.
+_BLOCK_SIZE = 64 * 1024
+
+
+class SignatureRulesError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Signature:
+    name: str
+    pattern: bytes
+
+
+def parse_rules(text: str) -> list[Signature]:
+    signatures = []
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, _, spec = line.partition(" ")
+        kind, _, value = spec.strip().partition(":")
+        try:
+            if kind == "hex":
+                pattern = bytes.fromhex(value)
+            elif kind == "text":
+                pattern = value.encode("ascii")
+            else:
+                raise SignatureRulesError(f"unknown pattern kind {kind!r}")
+        except (ValueError, UnicodeEncodeError) as exc:
+            raise SignatureRulesError(f"line {lineno}: {exc}") from exc
+        if not pattern:
+            raise SignatureRulesError(f"line {lineno}: empty pattern")
+        signatures.append(Signature(name, pattern))
+    return signatures
+
+
+class SignatureEngine:
+    """Aho-Corasick automaton compiled to a DFA.
+
+    State 0 is the root and its transitions are a dense 256-entry list.
+    Every other state keeps only the transitions that differ from the
+    root's, and states are numbered so that the accepting ones come last:
+    the inner loop is one dict lookup and one comparison per byte.
+    """
+
+    def __init__(self, signatures: Iterable[Signature], *, prefilter: bool = True):
+        self.signatures = tuple(signatures)
+        self.max_length = max((len(sig.pattern) for sig in self.signatures), default=0)
+        # Grams at each of the first four offsets: one of them is aligned in
+        # any occurrence. Shorter patterns could hide between grams.
+        self._grams: frozenset[int] | None = None
+        if prefilter and all(
+            len(sig.pattern) >= _MIN_PREFILTER_LENGTH for sig in self.signatures
+        ):
+            self._grams = frozenset(
+                memoryview(sig.pattern[offset : offset + _GRAM_SIZE]).cast("I")[0]
+                for sig in self.signatures
+                for offset in range(_GRAM_SIZE)
+            )
+        goto: list[dict[int, int]] = [{}]
+        outputs: list[list[int]] = [[]]
+        for index, signature in enumerate(self.signatures):
+            state = 0
+            for byte in signature.pattern:
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][byte] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        root = [goto[0].get(byte, 0) for byte in range(256)]
+        rows: list[dict[int, int]] = [{} for _ in goto]
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            # BFS order: the failure state's row and outputs are final.
+            rows[state] = {**rows[fail[state]], **goto[state]}
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for byte, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and byte not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(byte, 0)
+                queue.append(child)
+
+        order = sorted(range(len(goto)), key=lambda state: bool(outputs[state]))
+        renumber = {old: new for new, old in enumerate(order)}
+        self._root = [renumber[state] for state in root]
+        self._rows = [
+            {byte: renumber[target] for byte, target in rows[old].items()}
+            for old in order
+        ]
+        self._outputs = [tuple(outputs[old]) for old in order]
+        self._first_accepting = next(
+            (new for new, old in enumerate(order) if outputs[old]), len(order)
+        )
+        self.fingerprint = hashlib.sha256(
+            b"\0".join(
+                signature.name.encode() + b"\1" + signature.pattern
+                for signature in self.signatures
+            )
+        ).hexdigest()[:16]
+
+    @property
+    def state_count(self) -> int:
+        return len(self._rows)
+
+    def scanner(self) -> "SignatureScanner":
+        return SignatureScanner(self)
+
+
+class SignatureScanner:
+    """Matches one stream, chunk by chunk.
+
+    Memory is bounded by one block plus the chunk being fed. Call
+    ``finish`` after the last chunk.
+    """
+
+    def __init__(self, engine: SignatureEngine):
+        self._engine = engine
+        self._state = 0
+        # False after a skipped block: the state no longer reflects the
+        # stream, so the next walk restarts from the root over ``_tail``.
+        self._synced = True
+        self._tail = b""
+        self._pending = bytearray()
+        self.bytes_scanned = 0
+
+    def feed(self, chunk: bytes) -> Signature | None:
+        """Scan the next chunk; returns the first signature found so far."""
+        self.bytes_scanned += len(chunk)
+        if self._engine._grams is None:
+            return self._walk(chunk)
+        self._pending += chunk
+        usable = len(self._pending) - len(self._pending) % _BLOCK_SIZE
+        for start in range(0, usable, _BLOCK_SIZE):
+            match = self._block(bytes(self._pending[start : start + _BLOCK_SIZE]))
+            if match is not None:
+                return match
+        del self._pending[:usable]
+        return None
+
+    def finish(self) -> Signature | None:
+        remainder = bytes(self._pending)
+        self._pending.clear()
+        return self._resync() or self._walk(remainder)
+
+    def _block(self, block: bytes) -> Signature | None:
+        lookback = self._engine.max_length - 1
+        if self._engine._grams.isdisjoint(memoryview(block).cast("I")):
+            # Only an occurrence that began in an earlier block can end here.
+            match = self._walk(block[:lookback]) if self._synced else None
+            self._synced = False
+        else:
+            match = self._resync() or self._walk(block)
+        self._tail = block[-lookback:] if lookback else b""
+        return match
+
+    def _resync(self) -> Signature | None:
+        if self._synced:
+            return None
+        self._state = 0
+        self._synced = True
+        return self._walk(self._tail)
+
+    def _walk(self, data: bytes) -> Signature | None:
+        engine = self._engine
+        rows, root, first_accepting = (
+            engine._rows,
+            engine._root,
+            engine._first_accepting,
+        )
+        state = self._state
+        for byte in data:
+            state = rows[state].get(byte) or root[byte]
+            if state >= first_accepting:
+                self._state = state
+                return engine.signatures[engine._outputs[state][0]]
+        self._state = state
+        return None
+
+
+def scan_chunks(engine: SignatureEngine, chunks: Iterable[bytes]) -> Signature | None:
+    scanner = engine.scanner()
+    for chunk in chunks:
+        match = scanner.feed(chunk)
+        if match is not None:
+            return match
+    return scanner.finish()
+
+
+def load_engine(path: Path) -> SignatureEngine:
+    return SignatureEngine(parse_rules(path.read_text(encoding="utf-8")))
+
+
+def rules_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+
+
+def rules_path() -> Path:
+    from app.core.config import settings
+
+    return Path(settings.scan_signatures_path or DEFAULT_RULES_PATH)
+
+
+@lru_cache
+def get_signature_engine() -> SignatureEngine:
+    return load_engine(rules_path())
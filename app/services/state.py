@@ -5,6 +5,7 @@ class FileState(str, Enum):
     INITIATED = "INITIATED"
     UPLOADED = "UPLOADED"
     SCANNING = "SCANNING"
+    SCAN_FAILED = "SCAN_FAILED"
     ACTIVE = "ACTIVE"
     QUARANTINED = "QUARANTINED"
     REJECTED = "REJECTED"
@@ -17,7 +18,13 @@ ALLOWED_TRANSITIONS: dict[FileState, set[FileState]] = {
         FileState.QUARANTINED,
     },
     FileState.UPLOADED: {FileState.SCANNING, FileState.ACTIVE, FileState.QUARANTINED},
-    FileState.SCANNING: {FileState.ACTIVE, FileState.QUARANTINED},
+    FileState.SCANNING: {
+        FileState.ACTIVE,
+        FileState.QUARANTINED,
+        FileState.SCAN_FAILED,
+    },
+    # Retries exhausted; a dead-letter replay scans it again.
+    FileState.SCAN_FAILED: {FileState.SCANNING},
     FileState.ACTIVE: set(),
     FileState.QUARANTINED: {FileState.REJECTED},
     FileState.REJECTED: set(),
@@ -1,14 +1,42 @@
-from contextlib import suppress
+import asyncio
+import base64
+import binascii
+import datetime as dt
+import hashlib
+import hmac
+import json
+import os
+import threading
+import weakref
+from collections.abc import AsyncIterator, Iterator
+from contextlib import closing, suppress
 from dataclasses import dataclass
-from urllib.parse import quote
+from email.utils import parsedate_to_datetime
+from typing import Protocol
+from urllib.parse import quote, urlencode, urlsplit
+from xml.etree import ElementTree
 
 import boto3
+import httpx
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config
+from botocore.credentials import Credentials
 from botocore.exceptions import ClientError
 
 from app.core.config import settings
+from app.core.metrics import instrument_storage
 
 _ASCII_PRINTABLE_START = 32
 _ASCII_PRINTABLE_END = 127
+_DEFAULT_REGION = "us-east-1"
+_HTTP_ERROR_MIN = 300
+_SIGV4_ALGORITHM = "AWS4-HMAC-SHA256"
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_LIST_PARTS_PAGE_SIZE = 1000
+DELETE_OBJECTS_MAX_KEYS = 1000
+CHECKSUM_SHA256_HEADER = "x-amz-checksum-sha256"
+_SHA256_DIGEST_SIZE = 32
 
 
 @dataclass
@@ -17,7 +45,400 @@ class PresignedUpload:
     headers: dict[str, str]
 
 
+@dataclass
+class PresignedPost:
+    url: str
+    fields: dict[str, str]
+
+
+class StorageBackend(Protocol):
+    """Blocking storage operations; implemented by StorageClient (S3) and
+    LocalStorageClient (filesystem). Errors are raised as botocore
+    ClientErrors so callers handle every backend alike."""
+
+    bucket: str
+    supports_multipart: bool
+    supports_post: bool
+
+    @property
+    def not_found_exc(self) -> type[Exception]: ...
+
+    def generate_presigned_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedUpload: ...
+
+    def generate_presigned_post(  # noqa: PLR0913
+        self,
+        key: str,
+        content_type: str,
+        content_length_range: tuple[int, int],
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedPost: ...
+
+    def generate_presigned_get(self, key: str, expires: int = 3600) -> str: ...
+
+    def generate_presigned_get_download(  # noqa: PLR0913
+        self,
+        *,
+        key: str,
+        download_filename: str,
+        response_content_type: str | None = None,
+        expires: int = 3600,
+        signed_at: dt.datetime | None = None,
+    ) -> str: ...
+
+    def generate_presigned_upload_part(
+        self, key: str, upload_id: str, part_number: int, expires: int = 3600
+    ) -> str: ...
+
+    def create_multipart_upload(
+        self, bucket: str, key: str, content_type: str
+    ) -> str: ...
+
+    def list_parts(self, bucket: str, key: str, upload_id: str) -> list[dict]: ...
+
+    def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: list[dict]
+    ) -> None: ...
+
+    def abort_multipart_upload(self, bucket: str, key: str, upload_id: str) -> None: ...
+
+    def head_object(self, bucket: str, key: str, *, checksum: bool = False) -> dict: ...
+
+    def iter_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = 1024 * 1024,
+        *,
+        byte_range: str | None = None,
+    ) -> Iterator[bytes]: ...
+
+    def get_object_range(
+        self, bucket: str, key: str, byte_range: str
+    ) -> bytes | None: ...
+
+    def delete_objects(self, bucket: str, keys: list[str]) -> list[str]: ...
+
+
+class AsyncStorageBackend(Protocol):
+    """Non-blocking counterpart of StorageBackend for the async route handlers."""
+
+    bucket: str
+    supports_multipart: bool
+    supports_post: bool
+
+    @property
+    def not_found_exc(self) -> type[Exception]: ...
+
+    async def aclose(self) -> None: ...
+
+    def generate_presigned_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedUpload: ...
+
+    def generate_presigned_post(  # noqa: PLR0913
+        self,
+        key: str,
+        content_type: str,
+        content_length_range: tuple[int, int],
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedPost: ...
+
+    def generate_presigned_get(self, key: str, expires: int = 3600) -> str: ...
+
+    def generate_presigned_get_download(  # noqa: PLR0913
+        self,
+        *,
+        key: str,
+        download_filename: str,
+        response_content_type: str | None = None,
+        expires: int = 3600,
+        signed_at: dt.datetime | None = None,
+    ) -> str: ...
+
+    def generate_presigned_upload_part(
+        self, key: str, upload_id: str, part_number: int, expires: int = 3600
+    ) -> str: ...
+
+    async def create_multipart_upload(
+        self, bucket: str, key: str, content_type: str
+    ) -> str: ...
+
+    async def list_parts(self, bucket: str, key: str, upload_id: str) -> list[dict]: ...
+
+    async def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: list[dict]
+    ) -> None: ...
+
+    async def abort_multipart_upload(
+        self, bucket: str, key: str, upload_id: str
+    ) -> None: ...
+
+    async def head_object(
+        self, bucket: str, key: str, *, checksum: bool = False
+    ) -> dict: ...
+
+    def iter_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = 1024 * 1024,
+        *,
+        byte_range: str | None = None,
+    ) -> AsyncIterator[bytes]: ...
+
+    async def get_object_range(
+        self, bucket: str, key: str, byte_range: str
+    ) -> bytes | None: ...
+
+
+def checksum_sha256_b64(hex_digest: str) -> str | None:
+    """Convert a hex SHA-256 into the base64 form S3 checksum headers use."""
+    try:
+        raw = bytes.fromhex(hex_digest)
+    except ValueError:
+        return None
+    if len(raw) != _SHA256_DIGEST_SIZE:
+        return None
+    return base64.b64encode(raw).decode("ascii")
+
+
+def stored_checksum_sha256_hex(head: dict) -> str | None:
+    """Full-object SHA-256 recorded by storage, if the backend reports one.
+
+    Multipart objects carry a composite checksum-of-checksums ("<b64>-<n>"),
+    which cannot be compared with a whole-file digest.
+    """
+    value = head.get("ChecksumSHA256")
+    if not value or "-" in value:
+        return None
+    try:
+        return base64.b64decode(value, validate=True).hex()
+    except (binascii.Error, ValueError):
+        return None
+
+
+def download_response_params(
+    download_filename: str, response_content_type: str | None
+) -> dict[str, str]:
+    """Query parameters that make storage serve the object as an attachment."""
+    # Prevent header injection and path tricks; storage returns this via the
+    # `response-content-disposition` query param, not from our API response.
+    safe = (download_filename or "download").replace("\r", "").replace("\n", "")
+    safe = safe.split("/")[-1].split("\\")[-1]
+    safe_ascii = "".join(
+        (
+            ch
+            if _ASCII_PRINTABLE_START <= ord(ch) < _ASCII_PRINTABLE_END
+            and ch not in {'"', "\\"}
+            else "_"
+        )
+        for ch in safe
+    )
+    encoded = quote(safe, safe="")
+    params = {
+        "response-content-disposition": (
+            f"attachment; filename=\"{safe_ascii}\"; filename*=UTF-8''{encoded}"
+        )
+    }
+    if response_content_type:
+        params["response-content-type"] = response_content_type.split(";", 1)[0]
+    return params
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+class SigV4Presigner:
+    """Builds SigV4 query-string presigned S3 URLs without botocore.
+
+    The derived signing key only changes per (date, region), so it is cached
+    and each presign costs two HMACs and one SHA-256 over a short string.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        access_key: str,
+        secret_key: str,
+        region: str,
+        endpoint_url: str,
+        path_style: bool,
+        service: str = "s3",
+    ):
+        self.access_key = access_key
+        self._secret_key = secret_key
+        self.region = region
+        self.service = service
+        parts = urlsplit(endpoint_url)
+        self._scheme = parts.scheme or "https"
+        self._netloc = parts.netloc
+        # Gateways mounted under a path (https://host/s3) sign the full path.
+        self._prefix = parts.path.rstrip("/")
+        self._path_style = path_style
+        self._key_cache: tuple[str, bytes] | None = None
+
+    def signing_key(self, date_stamp: str) -> bytes:
+        cached = self._key_cache
+        if cached is not None and cached[0] == date_stamp:
+            return cached[1]
+        key = f"AWS4{self._secret_key}".encode()
+        for part in (date_stamp, self.region, self.service, "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        self._key_cache = (date_stamp, key)
+        return key
+
+    def _host_and_path(self, bucket: str, key: str) -> tuple[str, str]:
+        path = _uri_encode(key, safe="/-_.~")
+        if self._path_style:
+            return self._netloc, f"{self._prefix}/{bucket}/{path}"
+        return f"{bucket}.{self._netloc}", f"{self._prefix}/{path}"
+
+    def presign(  # noqa: PLR0913
+        self,
+        method: str,
+        bucket: str,
+        key: str,
+        *,
+        expires: int,
+        query: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        signed_at: dt.datetime | None = None,
+    ) -> str:
+        now = signed_at or dt.datetime.now(dt.UTC)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/{self.region}/{self.service}/aws4_request"
+        host, path = self._host_and_path(bucket, key)
+
+        signed = {"host": host}
+        for name, value in (headers or {}).items():
+            signed[name.lower()] = " ".join(value.split())
+        signed_names = ";".join(sorted(signed))
+
+        params = {
+            "X-Amz-Algorithm": _SIGV4_ALGORITHM,
+            "X-Amz-Credential": f"{self.access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires),
+            "X-Amz-SignedHeaders": signed_names,
+            **(query or {}),
+        }
+        canonical_query = "&".join(
+            f"{name}={value}"
+            for name, value in sorted(
+                (_uri_encode(k), _uri_encode(v)) for k, v in params.items()
+            )
+        )
+        canonical_headers = "".join(
+            f"{name}:{signed[name]}\n" for name in sorted(signed)
+        )
+        canonical_request = "\n".join(
+            (
+                method,
+                path,
+                canonical_query,
+                canonical_headers,
+                signed_names,
+                _UNSIGNED_PAYLOAD,
+            )
+        )
+        string_to_sign = "\n".join(
+            (
+                _SIGV4_ALGORITHM,
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            )
+        )
+        signature = hmac.new(
+            self.signing_key(date_stamp), string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+        return (
+            f"{self._scheme}://{host}{path}?{canonical_query}"
+            f"&X-Amz-Signature={signature}"
+        )
+
+    def presign_post(  # noqa: PLR0913
+        self,
+        bucket: str,
+        key: str,
+        *,
+        expires: int,
+        conditions: list,
+        fields: dict[str, str] | None = None,
+        signed_at: dt.datetime | None = None,
+    ) -> PresignedPost:
+        """Sign a browser-style POST policy for uploading exactly ``key``.
+
+        ``fields`` are sent as form fields and pinned by exact-match
+        conditions; ``conditions`` adds any others (e.g. content-length-range).
+        """
+        now = signed_at or dt.datetime.now(dt.UTC)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/{self.region}/{self.service}/aws4_request"
+        form = {
+            "key": key,
+            **(fields or {}),
+            "x-amz-algorithm": _SIGV4_ALGORITHM,
+            "x-amz-credential": f"{self.access_key}/{scope}",
+            "x-amz-date": amz_date,
+        }
+        policy = {
+            "expiration": (now + dt.timedelta(seconds=expires)).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "conditions": [
+                {"bucket": bucket},
+                *({name: value} for name, value in form.items()),
+                *conditions,
+            ],
+        }
+        encoded = base64.b64encode(
+            json.dumps(policy, separators=(",", ":")).encode()
+        ).decode("ascii")
+        form["policy"] = encoded
+        form["x-amz-signature"] = hmac.new(
+            self.signing_key(date_stamp), encoded.encode(), hashlib.sha256
+        ).hexdigest()
+        if self._path_style:
+            url = f"{self._scheme}://{self._netloc}{self._prefix}/{bucket}"
+        else:
+            url = f"{self._scheme}://{bucket}.{self._netloc}{self._prefix}/"
+        return PresignedPost(url=url, fields=form)
+
+
+def _client_config() -> Config:
+    return Config(
+        max_pool_connections=settings.storage_max_pool_connections,
+        connect_timeout=settings.storage_connect_timeout_seconds,
+        read_timeout=settings.storage_read_timeout_seconds,
+        tcp_keepalive=settings.storage_tcp_keepalive,
+        retries={
+            "mode": "adaptive",
+            "total_max_attempts": settings.storage_max_attempts,
+        },
+    )
+
+
+@instrument_storage("s3")
 class StorageClient:
+    supports_multipart = True
+    supports_post = True
+
     def __init__(self):
         self.bucket = settings.minio_bucket
         internal_endpoint = settings.minio_endpoint
@@ -25,19 +446,30 @@ class StorageClient:
         common = {
             "aws_access_key_id": settings.minio_access_key,
             "aws_secret_access_key": settings.minio_secret_key,
+            "config": _client_config(),
         }
         if settings.s3_region:
             common["region_name"] = settings.s3_region
 
+        # boto3 clients are thread-safe once built, but the default session is
+        # not safe to build clients from concurrently; use a private one.
+        session = boto3.session.Session()
+
         internal_kwargs = common.copy()
         if internal_endpoint:
             internal_kwargs["endpoint_url"] = internal_endpoint
-        self.client_internal = boto3.client("s3", **internal_kwargs)
+        self.client_internal = session.client("s3", **internal_kwargs)
 
-        public_kwargs = common.copy()
-        if public_endpoint:
-            public_kwargs["endpoint_url"] = public_endpoint
-        self.client_public = boto3.client("s3", **public_kwargs)
+        region = settings.s3_region or _DEFAULT_REGION
+        self.presigner = SigV4Presigner(
+            access_key=settings.minio_access_key,
+            secret_key=settings.minio_secret_key,
+            region=region,
+            endpoint_url=public_endpoint or f"https://s3.{region}.amazonaws.com",
+            # Custom (MinIO/S3-compatible) endpoints are addressed path-style,
+            # matching botocore's default for an explicit endpoint_url.
+            path_style=bool(public_endpoint),
+        )
 
         if settings.storage_auto_create_bucket:
             self._ensure_bucket()
@@ -59,77 +491,123 @@ class StorageClient:
         key: str,
         content_type: str,
         expires_in: int = 3600,
+        checksum_sha256: str | None = None,
     ) -> PresignedUpload:
-        url = self.client_public.generate_presigned_url(
-            "put_object",
-            Params={
-                "Bucket": self.bucket,
-                "Key": key,
-                "ContentType": content_type,
-            },
-            ExpiresIn=expires_in,
-        )
         headers = {"Content-Type": content_type}
+        # Signing the checksum header makes storage verify the body on PUT.
+        checksum_b64 = checksum_sha256_b64(checksum_sha256) if checksum_sha256 else None
+        if checksum_b64:
+            headers[CHECKSUM_SHA256_HEADER] = checksum_b64
+        url = self.presigner.presign(
+            "PUT", self.bucket, key, expires=expires_in, headers=headers
+        )
         return PresignedUpload(url=url, headers=headers)
 
-    def generate_presigned_get(self, key: str, expires: int = 3600) -> str:
-        return self.client_public.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": self.bucket, "Key": key},
-            ExpiresIn=expires,
+    def generate_presigned_post(  # noqa: PLR0913
+        self,
+        key: str,
+        content_type: str,
+        content_length_range: tuple[int, int],
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedPost:
+        """Presign a POST upload that storage rejects outside the size range."""
+        fields = {"Content-Type": content_type}
+        checksum_b64 = checksum_sha256_b64(checksum_sha256) if checksum_sha256 else None
+        if checksum_b64:
+            fields[CHECKSUM_SHA256_HEADER] = checksum_b64
+        return self.presigner.presign_post(
+            self.bucket,
+            key,
+            expires=expires_in,
+            conditions=[["content-length-range", *content_length_range]],
+            fields=fields,
         )
 
-    def generate_presigned_get_download(
+    def generate_presigned_get(self, key: str, expires: int = 3600) -> str:
+        return self.presigner.presign("GET", self.bucket, key, expires=expires)
+
+    def generate_presigned_get_download(  # noqa: PLR0913
         self,
         *,
         key: str,
         download_filename: str,
         response_content_type: str | None = None,
         expires: int = 3600,
+        signed_at: dt.datetime | None = None,
     ) -> str:
-        # Prevent header injection and path tricks; S3 will return this via
-        # `response-content-disposition` query param, not from our API response.
-        safe = (download_filename or "download").replace("\r", "").replace("\n", "")
-        safe = safe.split("/")[-1].split("\\")[-1]
-        safe_ascii = "".join(
-            (
-                ch
-                if _ASCII_PRINTABLE_START <= ord(ch) < _ASCII_PRINTABLE_END
-                and ch not in {'"', "\\"}
-                else "_"
-            )
-            for ch in safe
+        query = download_response_params(download_filename, response_content_type)
+        return self.presigner.presign(
+            "GET", self.bucket, key, expires=expires, query=query, signed_at=signed_at
         )
-        encoded = quote(safe, safe="")
-        disposition = (
-            f"attachment; filename=\"{safe_ascii}\"; filename*=UTF-8''{encoded}"
+
+    def generate_presigned_upload_part(
+        self, key: str, upload_id: str, part_number: int, expires: int = 3600
+    ) -> str:
+        return self.presigner.presign(
+            "PUT",
+            self.bucket,
+            key,
+            expires=expires,
+            query={"partNumber": str(part_number), "uploadId": upload_id},
         )
 
-        params: dict[str, str] = {
-            "Bucket": self.bucket,
-            "Key": key,
-            "ResponseContentDisposition": disposition,
-        }
-        if response_content_type:
-            params["ResponseContentType"] = response_content_type.split(";", 1)[0]
+    def create_multipart_upload(self, bucket: str, key: str, content_type: str) -> str:
+        response = self.client_internal.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type
+        )
+        return response["UploadId"]
 
-        return self.client_public.generate_presigned_url(
-            "get_object",
-            Params=params,
-            ExpiresIn=expires,
+    def list_parts(self, bucket: str, key: str, upload_id: str) -> list[dict]:
+        paginator = self.client_internal.get_paginator("list_parts")
+        parts: list[dict] = []
+        for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+            parts.extend(
+                {"PartNumber": part["PartNumber"], "ETag": part["ETag"]}
+                for part in page.get("Parts", [])
+            )
+        return parts
+
+    def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: list[dict]
+    ) -> None:
+        self.client_internal.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    def abort_multipart_upload(self, bucket: str, key: str, upload_id: str) -> None:
+        self.client_internal.abort_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id
         )
 
-    def head_object(self, bucket: str, key: str):
+    def head_object(self, bucket: str, key: str, *, checksum: bool = False):
+        if checksum:
+            return self.client_internal.head_object(
+                Bucket=bucket, Key=key, ChecksumMode="ENABLED"
+            )
         return self.client_internal.head_object(Bucket=bucket, Key=key)
 
-    def iter_object(self, bucket: str, key: str, chunk_size: int = 1024 * 1024):
-        obj = self.client_internal.get_object(Bucket=bucket, Key=key)
+    def iter_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = 1024 * 1024,
+        *,
+        byte_range: str | None = None,
+    ):
+        extra = {"Range": byte_range} if byte_range else {}
+        obj = self.client_internal.get_object(Bucket=bucket, Key=key, **extra)
         body = obj["Body"]
-        while True:
-            chunk = body.read(chunk_size)
-            if not chunk:
-                break
-            yield chunk
+        # Closed even when the consumer stops early (e.g. on a match).
+        with closing(body):
+            while True:
+                chunk = body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
 
     def get_object_range(self, bucket: str, key: str, byte_range: str) -> bytes | None:
         try:
@@ -139,3 +617,412 @@ class StorageClient:
             return obj["Body"].read()
         except ClientError:
             return None
+
+    def delete_objects(self, bucket: str, keys: list[str]) -> list[str]:
+        """Delete keys with batched DeleteObjects calls; returns failed keys."""
+        failed: list[str] = []
+        for start in range(0, len(keys), DELETE_OBJECTS_MAX_KEYS):
+            batch = keys[start : start + DELETE_OBJECTS_MAX_KEYS]
+            response = self.client_internal.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
+
+def _xml_children(root: ElementTree.Element, tag: str) -> list[ElementTree.Element]:
+    # S3 responses are namespaced; match on the local tag name only.
+    return [el for el in root if el.tag.rsplit("}", 1)[-1] == tag]
+
+
+def _xml_text(root: ElementTree.Element, tag: str) -> str | None:
+    children = _xml_children(root, tag)
+    return children[0].text if children else None
+
+
+def _client_error(response: httpx.Response, operation: str) -> ClientError:
+    # Mirror botocore's error shape so callers can handle both clients alike.
+    code = str(response.status_code)
+    message = response.reason_phrase
+    if response.content:
+        with suppress(ElementTree.ParseError):
+            root = ElementTree.fromstring(response.content)
+            code = _xml_text(root, "Code") or code
+            message = _xml_text(root, "Message") or message
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": response.status_code},
+        },
+        operation,
+    )
+
+
+@instrument_storage("s3")
+class AsyncStorageClient:
+    """Non-blocking counterpart of StorageClient for the async route handlers.
+
+    Object reads go over a pooled httpx.AsyncClient with SigV4-signed headers;
+    presigning needs no I/O and is delegated to the shared StorageClient.
+    """
+
+    supports_multipart = True
+    supports_post = True
+
+    def __init__(self, sync_client: StorageClient | None = None):
+        self._sync = sync_client or get_storage()
+        self.bucket = settings.minio_bucket
+        self._region = settings.s3_region or _DEFAULT_REGION
+        self._credentials = Credentials(
+            settings.minio_access_key, settings.minio_secret_key
+        )
+        if settings.minio_endpoint:
+            self._endpoint = settings.minio_endpoint.rstrip("/")
+            self._path_style = True
+        else:
+            self._endpoint = f"https://s3.{self._region}.amazonaws.com"
+            self._path_style = False
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.storage_read_timeout_seconds,
+                connect=settings.storage_connect_timeout_seconds,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.storage_max_pool_connections,
+                max_keepalive_connections=settings.storage_max_pool_connections,
+            ),
+            transport=httpx.AsyncHTTPTransport(
+                retries=max(settings.storage_max_attempts - 1, 0)
+            ),
+        )
+
+    @property
+    def not_found_exc(self):
+        return ClientError
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    def _url(self, bucket: str, key: str, params: dict[str, str] | None) -> str:
+        path = quote(key, safe="/~")
+        if self._path_style:
+            url = f"{self._endpoint}/{bucket}/{path}"
+        else:
+            scheme, host = self._endpoint.split("://", 1)
+            url = f"{scheme}://{bucket}.{host}/{path}"
+        if params:
+            url = f"{url}?{urlencode(params, quote_via=quote)}"
+        return url
+
+    def _build_request(  # noqa: PLR0913
+        self,
+        method: str,
+        bucket: str,
+        key: str,
+        headers: dict[str, str] | None,
+        *,
+        params: dict[str, str] | None = None,
+        content: bytes | None = None,
+    ) -> httpx.Request:
+        url = self._url(bucket, key, params)
+        signing = AWSRequest(
+            method=method, url=url, headers=headers or {}, data=content
+        )
+        S3SigV4Auth(self._credentials, "s3", self._region).add_auth(signing)
+        return self._http.build_request(
+            method, url, headers=dict(signing.headers.items()), content=content
+        )
+
+    async def _send(  # noqa: PLR0913
+        self,
+        operation: str,
+        method: str,
+        bucket: str,
+        key: str,
+        *,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        content: bytes | None = None,
+    ) -> ElementTree.Element | None:
+        response = await self._http.send(
+            self._build_request(
+                method, bucket, key, headers, params=params, content=content
+            )
+        )
+        if response.status_code >= _HTTP_ERROR_MIN:
+            raise _client_error(response, operation)
+        if not response.content:
+            return None
+        root = ElementTree.fromstring(response.content)
+        # CompleteMultipartUpload can report failure inside a 200 response.
+        if root.tag.rsplit("}", 1)[-1] == "Error":
+            raise _client_error(response, operation)
+        return root
+
+    def generate_presigned_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedUpload:
+        return self._sync.generate_presigned_put(
+            key=key,
+            content_type=content_type,
+            expires_in=expires_in,
+            checksum_sha256=checksum_sha256,
+        )
+
+    def generate_presigned_post(  # noqa: PLR0913
+        self,
+        key: str,
+        content_type: str,
+        content_length_range: tuple[int, int],
+        expires_in: int = 3600,
+        checksum_sha256: str | None = None,
+    ) -> PresignedPost:
+        return self._sync.generate_presigned_post(
+            key,
+            content_type,
+            content_length_range,
+            expires_in=expires_in,
+            checksum_sha256=checksum_sha256,
+        )
+
+    def generate_presigned_get(self, key: str, expires: int = 3600) -> str:
+        return self._sync.generate_presigned_get(key, expires=expires)
+
+    def generate_presigned_get_download(  # noqa: PLR0913
+        self,
+        *,
+        key: str,
+        download_filename: str,
+        response_content_type: str | None = None,
+        expires: int = 3600,
+        signed_at: dt.datetime | None = None,
+    ) -> str:
+        return self._sync.generate_presigned_get_download(
+            key=key,
+            download_filename=download_filename,
+            response_content_type=response_content_type,
+            expires=expires,
+            signed_at=signed_at,
+        )
+
+    def generate_presigned_upload_part(
+        self, key: str, upload_id: str, part_number: int, expires: int = 3600
+    ) -> str:
+        return self._sync.generate_presigned_upload_part(
+            key, upload_id, part_number, expires=expires
+        )
+
+    async def create_multipart_upload(
+        self, bucket: str, key: str, content_type: str
+    ) -> str:
+        root = await self._send(
+            "CreateMultipartUpload",
+            "POST",
+            bucket,
+            key,
+            params={"uploads": ""},
+            headers={"Content-Type": content_type},
+        )
+        upload_id = _xml_text(root, "UploadId") if root is not None else None
+        if not upload_id:
+            raise ClientError(
+                {"Error": {"Code": "MissingUploadId", "Message": "No UploadId"}},
+                "CreateMultipartUpload",
+            )
+        return upload_id
+
+    async def list_parts(self, bucket: str, key: str, upload_id: str) -> list[dict]:
+        parts: list[dict] = []
+        params = {"uploadId": upload_id, "max-parts": str(_LIST_PARTS_PAGE_SIZE)}
+        while True:
+            root = await self._send("ListParts", "GET", bucket, key, params=params)
+            if root is None:
+                return parts
+            parts.extend(
+                {
+                    "PartNumber": int(_xml_text(part, "PartNumber") or 0),
+                    "ETag": _xml_text(part, "ETag"),
+                }
+                for part in _xml_children(root, "Part")
+            )
+            if _xml_text(root, "IsTruncated") != "true":
+                return parts
+            params = {
+                **params,
+                "part-number-marker": _xml_text(root, "NextPartNumberMarker") or "",
+            }
+
+    async def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: list[dict]
+    ) -> None:
+        body = ElementTree.Element("CompleteMultipartUpload")
+        for part in parts:
+            entry = ElementTree.SubElement(body, "Part")
+            ElementTree.SubElement(entry, "PartNumber").text = str(part["PartNumber"])
+            ElementTree.SubElement(entry, "ETag").text = part["ETag"]
+        await self._send(
+            "CompleteMultipartUpload",
+            "POST",
+            bucket,
+            key,
+            params={"uploadId": upload_id},
+            content=ElementTree.tostring(body),
+        )
+
+    async def abort_multipart_upload(
+        self, bucket: str, key: str, upload_id: str
+    ) -> None:
+        await self._send(
+            "AbortMultipartUpload",
+            "DELETE",
+            bucket,
+            key,
+            params={"uploadId": upload_id},
+        )
+
+    async def head_object(
+        self, bucket: str, key: str, *, checksum: bool = False
+    ) -> dict:
+        headers = {"x-amz-checksum-mode": "ENABLED"} if checksum else None
+        response = await self._http.send(
+            self._build_request("HEAD", bucket, key, headers)
+        )
+        if response.status_code >= _HTTP_ERROR_MIN:
+            raise _client_error(response, "HeadObject")
+        head: dict = {
+            "ContentLength": int(response.headers.get("content-length", 0)),
+            "ContentType": response.headers.get("content-type"),
+            "ETag": response.headers.get("etag"),
+            "Metadata": {
+                name[len("x-amz-meta-") :]: value
+                for name, value in response.headers.items()
+                if name.startswith("x-amz-meta-")
+            },
+        }
+        if last_modified := response.headers.get("last-modified"):
+            head["LastModified"] = parsedate_to_datetime(last_modified)
+        if stored_checksum := response.headers.get(CHECKSUM_SHA256_HEADER):
+            head["ChecksumSHA256"] = stored_checksum
+        return head
+
+    async def iter_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = 1024 * 1024,
+        *,
+        byte_range: str | None = None,
+    ) -> AsyncIterator[bytes]:
+        headers = {"Range": byte_range} if byte_range else None
+        request = self._build_request("GET", bucket, key, headers)
+        response = await self._http.send(request, stream=True)
+        try:
+            if response.status_code >= _HTTP_ERROR_MIN:
+                await response.aread()
+                raise _client_error(response, "GetObject")
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def get_object_range(
+        self, bucket: str, key: str, byte_range: str
+    ) -> bytes | None:
+        response = await self._http.send(
+            self._build_request("GET", bucket, key, {"Range": byte_range})
+        )
+        if response.status_code >= _HTTP_ERROR_MIN:
+            return None
+        return response.content
+
+
+def _build_storage() -> StorageBackend:
+    if settings.storage_backend == "local":
+        from app.services.local_storage import LocalStorageClient
+
+        return LocalStorageClient()
+    return StorageClient()
+
+
+def _build_async_storage() -> AsyncStorageBackend:
+    if settings.storage_backend == "local":
+        from app.services.local_storage import AsyncLocalStorageClient
+
+        return AsyncLocalStorageClient()
+    return AsyncStorageClient()
+
+
+class _StorageRegistry:
+    """Holds the process-wide storage client so connection pools are reused."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client: StorageBackend | None = None
+
+    def get(self) -> StorageBackend:
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = _build_storage()
+                client = self._client
+        return client
+
+    def reset(self) -> None:
+        # Pooled sockets must not be shared between a parent and forked child.
+        self._lock = threading.Lock()
+        self._client = None
+
+
+_registry = _StorageRegistry()
+os.register_at_fork(after_in_child=_registry.reset)
+
+
+def get_storage() -> StorageBackend:
+    return _registry.get()
+
+
+def reset_storage() -> None:
+    _registry.reset()
+
+
+class _AsyncStorageRegistry:
+    """One async storage client per event loop; httpx pools are loop-bound."""
+
+    def __init__(self):
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncStorageBackend
+        ] = weakref.WeakKeyDictionary()
+
+    def get(self) -> AsyncStorageBackend:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = _build_async_storage()
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def reset(self) -> None:
+        self._clients = weakref.WeakKeyDictionary()
+
+
+_async_registry = _AsyncStorageRegistry()
+os.register_at_fork(after_in_child=_async_registry.reset)
+
+
+def get_async_storage() -> AsyncStorageBackend:
+    return _async_registry.get()
+
+
+async def close_async_storage() -> None:
+    await _async_registry.aclose()
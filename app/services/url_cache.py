@@ -0,0 +1,174 @@
+"""Cache of issued download URLs.
+
+URLs are signed at the start of a fixed time window, so every process that
+signs the same (file, variant) inside one window produces byte-identical URLs.
+That keeps them stable for browser/CDN caches, and lets the in-process LRU
+(and the optional Redis tier) hand out a URL for as long as it still has at
+least ``ttl - window`` seconds of lifetime left.
+"""
+
+import datetime as dt
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+_REDIS_PREFIX = "dlurl:"
+
+
+@dataclass(frozen=True)
+class CachedUrl:
+    url: str
+    window_start: int
+    expires_at: int
+
+    def expires_in(self, now: float) -> int:
+        return max(0, int(self.expires_at - now))
+
+
+class LRUCache:
+    """Thread-safe LRU of file_id -> {variant: CachedUrl}.
+
+    Grouping by file keeps invalidation O(1) regardless of how many variants
+    were issued for it.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, dict[str, CachedUrl]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_id: str, variant: str) -> CachedUrl | None:
+        with self._lock:
+            entries = self._data.get(file_id)
+            if entries is None:
+                return None
+            self._data.move_to_end(file_id)
+            return entries.get(variant)
+
+    def set(self, file_id: str, variant: str, value: CachedUrl) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            entries = self._data.setdefault(file_id, {})
+            entries[variant] = value
+            self._data.move_to_end(file_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, file_id: str) -> None:
+        with self._lock:
+            self._data.pop(file_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class DownloadUrlCache:
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        ttl_seconds: int,
+        window_seconds: int,
+        maxsize: int,
+        redis_client: redis.Redis | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl_seconds = ttl_seconds
+        # A window as long as the TTL would hand out URLs that are about to
+        # expire; cap it so at least half of the lifetime always remains.
+        self.window_seconds = max(1, min(window_seconds, ttl_seconds // 2))
+        self._local = LRUCache(maxsize)
+        self._redis = redis_client
+        self._clock = clock
+
+    def _window_start(self, now: float) -> int:
+        return int(now // self.window_seconds) * self.window_seconds
+
+    def _redis_get(self, file_id: str, variant: str) -> CachedUrl | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.hget(f"{_REDIS_PREFIX}{file_id}", variant)
+        except redis.RedisError:
+            logger.warning("download url cache: redis get failed", exc_info=True)
+            return None
+        if not raw:
+            return None
+        window, _, url = raw.decode().partition("|")
+        start = int(window)
+        return CachedUrl(
+            url=url, window_start=start, expires_at=start + self.ttl_seconds
+        )
+
+    def _redis_set(self, file_id: str, variant: str, value: CachedUrl) -> None:
+        if self._redis is None:
+            return
+        key = f"{_REDIS_PREFIX}{file_id}"
+        try:
+            pipe = self._redis.pipeline()
+            pipe.hset(key, variant, f"{value.window_start}|{value.url}")
+            pipe.expireat(key, value.expires_at)
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("download url cache: redis set failed", exc_info=True)
+
+    def get_or_sign(
+        self,
+        file_id: str,
+        variant: str,
+        sign: Callable[[dt.datetime, int], str],
+    ) -> tuple[str, int]:
+        """Return (url, expires_in) for the current window.
+
+        ``sign(signed_at, expires)`` is only called on a miss.
+        """
+        now = self._clock()
+        window_start = self._window_start(now)
+
+        cached = self._local.get(file_id, variant)
+        if cached is None or cached.window_start != window_start:
+            cached = self._redis_get(file_id, variant)
+            if cached is None or cached.window_start != window_start:
+                signed_at = dt.datetime.fromtimestamp(window_start, dt.UTC)
+                cached = CachedUrl(
+                    url=sign(signed_at, self.ttl_seconds),
+                    window_start=window_start,
+                    expires_at=window_start + self.ttl_seconds,
+                )
+                self._redis_set(file_id, variant, cached)
+            self._local.set(file_id, variant, cached)
+        return cached.url, cached.expires_in(now)
+
+    def invalidate(self, file_id: str) -> None:
+        self._local.pop(file_id)
+        if self._redis is None:
+            return
+        try:
+            self._redis.delete(f"{_REDIS_PREFIX}{file_id}")
+        except redis.RedisError:
+            logger.warning("download url cache: redis delete failed", exc_info=True)
+
+
+@lru_cache
+def get_download_url_cache() -> DownloadUrlCache:
+    from app.core.config import settings
+
+    return DownloadUrlCache(
+        ttl_seconds=settings.download_presign_ttl_seconds,
+        window_seconds=settings.download_url_cache_window_seconds,
+        maxsize=settings.download_url_cache_size,
+        redis_client=(
+            redis.Redis.from_url(settings.redis_url)
+            if settings.download_url_cache_redis
+            else None
+        ),
+    )
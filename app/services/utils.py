@@ -1 +1,40 @@
-# Placeholder for shared helpers
+"""Helpers shared by the API and the storage backends."""
+
+import re
+
+# Range units are case-insensitive (RFC 9110).
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$", re.IGNORECASE)
+
+
+def parse_range_spec(header: str) -> tuple[int | None, int | None] | None:
+    """First and last position of a single ``bytes=`` range, or None if the
+    header is not a valid one (RFC 9110 says to ignore it then)."""
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = (int(value) if value else None for value in match.groups())
+    if first is not None and last is not None and last < first:
+        return None
+    return first, last
+
+
+def resolve_range(
+    spec: tuple[int | None, int | None], size: int
+) -> tuple[int, int] | None:
+    """Inclusive offsets of a parsed range, or None if it cannot be satisfied."""
+    first, last = spec
+    if first is None:
+        start, end = max(size - last, 0), size - 1
+    else:
+        start = first
+        end = min(last, size - 1) if last is not None else size - 1
+    if start >= size or end < start:
+        return None
+    return start, end
+
+
+def parse_byte_range(byte_range: str, size: int) -> tuple[int, int] | None:
+    """Resolve an HTTP ``bytes=`` range to inclusive offsets, or None if it
+    is invalid or cannot be satisfied."""
+    spec = parse_range_spec(byte_range)
+    return resolve_range(spec, size) if spec is not None else None
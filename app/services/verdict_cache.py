@@ -0,0 +1,115 @@
+"""Cache of scan verdicts by content.
+
+A verdict depends only on the object's bytes and the scan policy, so it is
+keyed by (sha256, size, extension, declared type, policy version). The
+policy version is a fingerprint of the policy tables: changing them changes
+every key, and entries from older policies simply age out of Redis.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+_REDIS_PREFIX = "scanverdict:"
+
+
+@dataclass(frozen=True)
+class Verdict:
+    ok: bool
+    sniffed_content_type: str | None
+    # Audit metadata of the original SCAN_QUARANTINED event.
+    metadata: dict = field(default_factory=dict)
+
+
+class VerdictCache:
+    def __init__(
+        self,
+        *,
+        maxsize: int,
+        ttl_seconds: int,
+        redis_client: redis.Redis | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._local: OrderedDict[str, Verdict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = redis_client
+
+    @staticmethod
+    def key(  # noqa: PLR0913
+        *,
+        sha256: str,
+        size: int,
+        extension: str,
+        declared_content_type: str,
+        policy_version: str,
+    ) -> str:
+        declared = declared_content_type.split(";", 1)[0].strip().lower()
+        return f"{policy_version}:{sha256.lower()}:{size}:{extension}:{declared}"
+
+    def _remember(self, key: str, verdict: Verdict) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._local[key] = verdict
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def get(self, key: str) -> Verdict | None:
+        with self._lock:
+            verdict = self._local.get(key)
+            if verdict is not None:
+                self._local.move_to_end(key)
+                return verdict
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(f"{_REDIS_PREFIX}{key}")
+        except redis.RedisError:
+            logger.warning("verdict cache: redis get failed", exc_info=True)
+            return None
+        if not raw:
+            return None
+        verdict = Verdict(**json.loads(raw))
+        self._remember(key, verdict)
+        return verdict
+
+    def set(self, key: str, verdict: Verdict) -> None:
+        self._remember(key, verdict)
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(
+                f"{_REDIS_PREFIX}{key}",
+                json.dumps(asdict(verdict)),
+                ex=self.ttl_seconds,
+            )
+        except redis.RedisError:
+            logger.warning("verdict cache: redis set failed", exc_info=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+
+@lru_cache
+def get_verdict_cache() -> VerdictCache:
+    from app.core.config import settings
+
+    return VerdictCache(
+        maxsize=settings.scan_verdict_cache_size,
+        ttl_seconds=settings.scan_verdict_cache_ttl_seconds,
+        redis_client=(
+            redis.Redis.from_url(settings.redis_url)
+            if settings.scan_verdict_cache_redis
+            else None
+        ),
+    )
@@ -0,0 +1,259 @@
+"""Read a ZIP central directory with a handful of ranged reads.
+
+Only the end-of-central-directory records and the central directory itself
+are fetched, so listing an archive costs a few KB of I/O regardless of how
+large its members are. ZIP64 archives are supported. ``archive_stats``
+summarizes the directory for zip-bomb checks without inflating anything.
+"""
+
+import struct
+from collections.abc import Callable
+from dataclasses import dataclass
+
+# (start, length) -> exactly `length` bytes at absolute offset `start`.
+RangeReader = Callable[[int, int], bytes]
+
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+_ZIP64_EXTRA_ID = 0x0001
+_EXTRA_HEADER = struct.Struct("<HH")
+_MAX_COMMENT = 0xFFFF
+_MAX_UINT16 = 0xFFFF
+_MAX_UINT32 = 0xFFFFFFFF
+_UTF8_FLAG = 0x800
+
+DEFAULT_MAX_DIRECTORY_BYTES = 16 * 1024 * 1024
+# Fixed part of a local file header; the member's data starts after it.
+_LOCAL_HEADER_SIZE = 30
+# Ratios of smaller members say nothing about bombs.
+RATIO_MIN_UNCOMPRESSED_BYTES = 1024 * 1024
+NESTED_ARCHIVE_SUFFIXES = (
+    ".zip",
+    ".jar",
+    ".gz",
+    ".tgz",
+    ".bz2",
+    ".xz",
+    ".7z",
+    ".rar",
+    ".tar",
+    ".docx",
+    ".docm",
+    ".xlsx",
+    ".xlsm",
+    ".pptx",
+    ".pptm",
+)
+
+
+class ZipDirectoryError(ValueError):
+    """The archive's directory records are missing, truncated or malformed."""
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    compressed_size: int
+    uncompressed_size: int
+    compress_type: int
+    flag_bits: int
+    header_offset: int
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+
+@dataclass(frozen=True)
+class ZipDirectory:
+    entries: tuple[ZipEntry, ...]
+    directory_size: int
+    zip64: bool
+
+    @property
+    def names(self) -> set[str]:
+        return {entry.name for entry in self.entries}
+
+
+def _read(read_range: RangeReader, start: int, length: int) -> bytes:
+    data = read_range(start, length)
+    if data is None or len(data) != length:
+        raise ZipDirectoryError("short read")
+    return data
+
+
+def _find_eocd(tail: bytes) -> int:
+    pos = tail.rfind(_EOCD_SIGNATURE)
+    while pos >= 0:
+        if pos + _EOCD.size <= len(tail):
+            comment_len = _EOCD.unpack_from(tail, pos)[-1]
+            if pos + _EOCD.size + comment_len <= len(tail):
+                return pos
+        pos = tail.rfind(_EOCD_SIGNATURE, 0, pos)
+    raise ZipDirectoryError("end of central directory not found")
+
+
+def _zip64_sizes(extra: bytes, sizes: list[int]) -> list[int]:
+    """Replace 0xFFFFFFFF placeholders from the ZIP64 extra field, in order."""
+    offset = 0
+    while offset + _EXTRA_HEADER.size <= len(extra):
+        header_id, length = _EXTRA_HEADER.unpack_from(extra, offset)
+        offset += _EXTRA_HEADER.size
+        if header_id == _ZIP64_EXTRA_ID:
+            data = extra[offset : offset + length]
+            cursor = 0
+            resolved = []
+            for value in sizes:
+                if value != _MAX_UINT32:
+                    resolved.append(value)
+                    continue
+                if cursor + 8 > len(data):
+                    raise ZipDirectoryError("truncated ZIP64 extra field")
+                resolved.append(struct.unpack_from("<Q", data, cursor)[0])
+                cursor += 8
+            return resolved
+        offset += length
+    if _MAX_UINT32 in sizes:
+        raise ZipDirectoryError("missing ZIP64 extra field")
+    return sizes
+
+
+def _parse_entries(directory: bytes, expected: int) -> tuple[ZipEntry, ...]:
+    entries = []
+    offset = 0
+    while offset < len(directory):
+        if offset + _CENTRAL_HEADER.size > len(directory):
+            raise ZipDirectoryError("truncated central directory header")
+        fields = _CENTRAL_HEADER.unpack_from(directory, offset)
+        if fields[0] != _CENTRAL_HEADER_SIGNATURE:
+            raise ZipDirectoryError("bad central directory signature")
+        flag_bits, compress_type = fields[5], fields[6]
+        compressed, uncompressed = fields[10], fields[11]
+        name_len, extra_len, comment_len = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+
+        start = offset + _CENTRAL_HEADER.size
+        end = start + name_len + extra_len + comment_len
+        if end > len(directory):
+            raise ZipDirectoryError("truncated central directory entry")
+        raw_name = directory[start : start + name_len]
+        extra = directory[start + name_len : start + name_len + extra_len]
+        uncompressed, compressed, header_offset = _zip64_sizes(
+            extra, [uncompressed, compressed, header_offset]
+        )
+        encoding = "utf-8" if flag_bits & _UTF8_FLAG else "cp437"
+        entries.append(
+            ZipEntry(
+                name=raw_name.decode(encoding, errors="replace"),
+                compressed_size=compressed,
+                uncompressed_size=uncompressed,
+                compress_type=compress_type,
+                flag_bits=flag_bits,
+                header_offset=header_offset,
+            )
+        )
+        offset = end
+    if len(entries) != expected:
+        raise ZipDirectoryError("central directory entry count mismatch")
+    return tuple(entries)
+
+
+def read_central_directory(
+    read_range: RangeReader,
+    size: int,
+    *,
+    max_directory_bytes: int = DEFAULT_MAX_DIRECTORY_BYTES,
+) -> ZipDirectory:
+    if size < _EOCD.size:
+        raise ZipDirectoryError("too small to be a ZIP archive")
+
+    tail_len = min(size, _EOCD.size + _MAX_COMMENT + _ZIP64_LOCATOR.size)
+    tail_start = size - tail_len
+    tail = _read(read_range, tail_start, tail_len)
+    eocd_pos = _find_eocd(tail)
+    (_, _, _, _, total_entries, cd_size, _, _) = _EOCD.unpack_from(tail, eocd_pos)
+    directory_end = tail_start + eocd_pos
+
+    locator_pos = eocd_pos - _ZIP64_LOCATOR.size
+    zip64 = (
+        locator_pos >= 0
+        and tail[locator_pos : locator_pos + 4] == _ZIP64_LOCATOR_SIGNATURE
+    )
+    if zip64:
+        eocd64_offset = _ZIP64_LOCATOR.unpack_from(tail, locator_pos)[2]
+        record = _read(read_range, eocd64_offset, _ZIP64_EOCD.size)
+        fields = _ZIP64_EOCD.unpack(record)
+        if fields[0] != _ZIP64_EOCD_SIGNATURE:
+            raise ZipDirectoryError("bad ZIP64 end of central directory")
+        total_entries, cd_size = fields[7], fields[8]
+        directory_end = eocd64_offset
+    elif total_entries == _MAX_UINT16 or cd_size == _MAX_UINT32:
+        raise ZipDirectoryError("ZIP64 values without a ZIP64 locator")
+
+    if cd_size > max_directory_bytes:
+        raise ZipDirectoryError("central directory exceeds size limit")
+    # Resolve from the end rather than the stored offset so archives with
+    # prepended data (e.g. self-extractors) are handled like zipfile does.
+    cd_start = directory_end - cd_size
+    if cd_start < 0:
+        raise ZipDirectoryError("bad central directory offset")
+
+    if cd_start >= tail_start:
+        directory = tail[cd_start - tail_start : directory_end - tail_start]
+    else:
+        directory = _read(read_range, cd_start, cd_size)
+    return ZipDirectory(
+        entries=_parse_entries(directory, total_entries),
+        directory_size=cd_size,
+        zip64=zip64,
+    )
+
+
+@dataclass(frozen=True)
+class ArchiveStats:
+    entries: int
+    total_uncompressed: int
+    max_ratio: float
+    nested_archives: int
+    # Members whose data runs into the next member's header: the
+    # overlapping-file construction that reuses one compressed kernel.
+    overlapping_entries: int
+    # VBA macro storage: the allowed OOXML types are the macro-free ones.
+    vba_projects: int = 0
+
+
+def archive_stats(directory: ZipDirectory) -> ArchiveStats:
+    """Declared totals of an archive, from its central directory alone."""
+    files = [entry for entry in directory.entries if not entry.is_dir]
+    max_ratio = max(
+        (
+            entry.uncompressed_size / max(entry.compressed_size, 1)
+            for entry in files
+            if entry.uncompressed_size >= RATIO_MIN_UNCOMPRESSED_BYTES
+        ),
+        default=0.0,
+    )
+    by_offset = sorted(directory.entries, key=lambda entry: entry.header_offset)
+    overlapping = sum(
+        following.header_offset
+        < entry.header_offset + _LOCAL_HEADER_SIZE + entry.compressed_size
+        for entry, following in zip(by_offset, by_offset[1:], strict=False)
+    )
+    return ArchiveStats(
+        entries=len(directory.entries),
+        total_uncompressed=sum(entry.uncompressed_size for entry in files),
+        max_ratio=round(max_ratio, 1),
+        nested_archives=sum(
+            entry.name.lower().endswith(NESTED_ARCHIVE_SUFFIXES) for entry in files
+        ),
+        overlapping_entries=overlapping,
+        vba_projects=sum(
+            entry.name.rsplit("/", 1)[-1].lower() == "vbaproject.bin" for entry in files
+        ),
+    )
@@ -0,0 +1,45 @@
+"""Inspect and replay dead-lettered scans.
+
+    python -m app.workers.dead_letters list
+    python -m app.workers.dead_letters replay ID [ID ...]
+    python -m app.workers.dead_letters replay --all
+
+Dead letters are replayed by job id, orphaned files (listed without a job)
+by file id.
+"""
+
+import argparse
+
+from app.services.dead_letters import list_dead_letters, replay
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Dead-lettered scan jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "list", help="show scan jobs that ran out of retries and orphaned files"
+    )
+    replay_parser = commands.add_parser(
+        "replay", help="scan the files again and drop the dead jobs"
+    )
+    replay_parser.add_argument("ids", nargs="*", help="job ids, or orphans' file ids")
+    replay_parser.add_argument("--all", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for letter in list_dead_letters():
+            failed_at = (
+                f"{letter.failed_at:%Y-%m-%d %H:%M:%S}" if letter.failed_at else "-"
+            )
+            print(
+                f"{letter.job_id or '-':<36}  {letter.queue:<12} {failed_at:<19}  "
+                f"{letter.file_id}  {letter.file_state or 'deleted':<11}  {letter.error}"
+            )
+        return
+    if args.all == bool(args.ids):
+        replay_parser.error("pass ids or --all")
+    print(replay(None if args.all else args.ids))
+
+
+if __name__ == "__main__":
+    main()
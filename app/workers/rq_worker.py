@@ -1,19 +1,282 @@
+# Workers
+import argparse
+import gc
 import logging
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import suppress
 
+from botocore.exceptions import BotoCoreError, ClientError
 from redis import Redis
-from rq import Worker
+from rq import SimpleWorker, Worker
+from rq.timeouts import TimerDeathPenalty
 
 from app.core.config import settings
-from app.services.scanner import SCAN_QUEUE
+from app.core.metrics import start_exporter
+from app.db.session import engine
+from app.services.inspection import sniff_mime
+from app.services.maintenance import MAINTENANCE_QUEUE, ensure_maintenance_scheduled
+from app.services.scanner import (
+    LANE_QUEUES,
+    SCAN_QUEUE,
+    lane_queue,
+    weighted_lane_order,
+)
+from app.services.signatures import get_signature_engine
+from app.services.storage import get_storage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The unlaned queue still holds jobs enqueued before lanes existed.
+QUEUES = [SCAN_QUEUE, *LANE_QUEUES, MAINTENANCE_QUEUE]
+# Idle threads wake this often to notice a shutdown request.
+_THREAD_WORKER_TTL = 30
+# Pause before replacing a pool child that crashed, so a broken child
+# can't fork-loop.
+_RESPAWN_BACKOFF_SECONDS = 1.0
+_FORWARDED_SIGNALS = {signal.SIGINT, signal.SIGTERM}
+
+
+class LaneOrderMixin:
+    """Polls the scan lanes in a weighted random order, re-drawn per job.
+
+    Queues outside the lanes keep their place: the unlaned scan queue
+    first, maintenance last.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reorder_queues(None)
+
+    def reorder_queues(self, reference_queue):  # noqa: ARG002
+        by_name = {queue.name: queue for queue in self.queues}
+        lanes = [
+            by_name[name]
+            for name in map(lane_queue, weighted_lane_order(settings.scan_lane_weights))
+            if name in by_name
+        ]
+        lane_names = set(LANE_QUEUES)
+        head = [queue for queue in self.queues if queue.name == SCAN_QUEUE]
+        tail = [
+            queue
+            for queue in self.queues
+            if queue.name != SCAN_QUEUE and queue.name not in lane_names
+        ]
+        self._ordered_queues = head + lanes + tail
+
+
+class MaintenanceScheduleMixin:
+    """Re-books lost maintenance runs on RQ's periodic maintenance tick.
+
+    Runs reschedule themselves when they finish, so without this a run that
+    never finished would end the schedule until the next worker restart.
+    """
+
+    def run_maintenance_tasks(self):
+        super().run_maintenance_tasks()
+        ensure_maintenance_scheduled(self.connection)
+
+
+class LaneWorker(MaintenanceScheduleMixin, LaneOrderMixin, Worker):
+    pass
+
+
+class PoolWorker(MaintenanceScheduleMixin, LaneOrderMixin, SimpleWorker):
+    pass
+
+
+class ThreadWorker(MaintenanceScheduleMixin, LaneOrderMixin, SimpleWorker):
+    """Runs jobs inline on its own thread.
+
+    SIGALRM timeouts and signal handlers only work on the main thread, so
+    jobs are timed out with a timer instead and the main thread owns
+    shutdown (see run_threaded).
+    """
+
+    death_penalty_class = TimerDeathPenalty
+
+    def _install_signal_handlers(self):
+        pass
+
+
+def _warm_storage() -> None:
+    """Build the process's storage client before its first job.
+
+    Only worth it where jobs share the process: fork mode's per-job work
+    horses reset the registry and build their own client. A storage outage
+    must not stop the worker from starting.
+    """
+    try:
+        get_storage()
+    except (BotoCoreError, ClientError, OSError):
+        logger.warning("Storage client warm-up failed; will retry lazily")
+
+
+def run_threaded(concurrency: int) -> None:
+    """Run ``concurrency`` workers in one process.
+
+    Scans mostly wait on storage round trips, so threads overlap that
+    latency; boto3, the SQLAlchemy engine and the Redis pool are shared.
+    """
+    _warm_storage()
+    # Separate clients so each worker's CLIENT SETNAME and blocking dequeue
+    # use their own connection.
+    workers = [
+        ThreadWorker(
+            QUEUES,
+            connection=Redis.from_url(settings.redis_url),
+            default_worker_ttl=_THREAD_WORKER_TTL,
+        )
+        for _ in range(concurrency)
+    ]
+    threads = [
+        threading.Thread(
+            target=worker.work,
+            # A single scheduler per process is enough.
+            kwargs={"with_scheduler": index == 0},
+            name=f"rq-worker-{index}",
+            daemon=True,
+        )
+        for index, worker in enumerate(workers)
+    ]
+
+    def request_stop(signum, frame):  # noqa: ARG001
+        logger.info("Warm shutdown requested; finishing running jobs")
+        for worker in workers:
+            worker._stop_requested = True
+        signal.signal(signal.SIGINT, force_stop)
+        signal.signal(signal.SIGTERM, force_stop)
+
+    def force_stop(signum, frame):  # noqa: ARG001
+        logger.warning("Cold shutdown; abandoning running jobs")
+        sys.exit(1)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(timeout=1)
+
+
+def _warm_process() -> None:
+    """Load what every job needs once, before the pool forks.
+
+    Modules (scanner, boto3, SQLAlchemy, the DB driver) are imported at the
+    top of this module; libmagic's database and the signature automaton
+    load on first use. Freezing the GC afterwards keeps collections in the
+    children from touching, and so copying, those inherited pages.
+    """
+    sniff_mime(b"%PDF-1.7")
+    get_signature_engine()
+    gc.collect()
+    gc.freeze()
+
+
+def _run_pool_child(slot: int, max_jobs: int | None) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, _FORWARDED_SIGNALS)
+    # Pooled DB connections belong to the parent; start a fresh pool without
+    # closing theirs. The storage client registry resets itself at fork.
+    engine.dispose(close=False)
+    _warm_storage()
+    worker = PoolWorker(QUEUES, connection=Redis.from_url(settings.redis_url))
+    # Children run jobs inline (no fork per job), reusing their DB, storage
+    # and Redis connections until they exit after ``max_jobs``.
+    worker.work(with_scheduler=slot == 0, max_jobs=max_jobs)
+
+
+def run_prefork(concurrency: int, max_jobs: int | None) -> None:
+    """Supervise ``concurrency`` long-lived worker processes.
+
+    Children that exit (recycled after ``max_jobs`` or crashed) are
+    replaced; SIGINT/SIGTERM are forwarded so children shut down warm, and
+    a second signal forces them down.
+    """
+    _warm_process()
+    children: dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        # Signals stay blocked until the child has dropped the parent's
+        # handlers, so it can never forward them to its siblings.
+        signal.pthread_sigmask(signal.SIG_BLOCK, _FORWARDED_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_pool_child(slot, max_jobs)
+            except Exception:
+                logger.exception("Pool worker %d crashed", slot)
+                code = 1
+            finally:
+                os._exit(code)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, _FORWARDED_SIGNALS)
+        children[pid] = slot
+
+    def forward(signum, frame):  # noqa: ARG001
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            with suppress(ProcessLookupError):
+                os.kill(pid, signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for slot in range(concurrency):
+        spawn(slot)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        if os.waitstatus_to_exitcode(status) != 0:
+            logger.warning("Pool worker %d exited abnormally; respawning", slot)
+            time.sleep(_RESPAWN_BACKOFF_SECONDS)
+        spawn(slot)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Scan and maintenance worker")
+    parser.add_argument(
+        "--mode",
+        choices=["fork", "threaded", "prefork"],
+        default=settings.worker_mode,
+    )
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency)
+    args = parser.parse_args(argv)
 
-def main() -> None:
     conn = Redis.from_url(settings.redis_url)
-    worker = Worker([SCAN_QUEUE], connection=conn)
-    logger.info("Starting RQ worker for queue %s", SCAN_QUEUE)
+    if settings.worker_metrics_port:
+        start_exporter(settings.worker_metrics_port)
+    ensure_maintenance_scheduled(conn)
+    if args.mode == "threaded":
+        logger.info(
+            "Starting %d threaded RQ workers for queues %s",
+            args.concurrency,
+            ", ".join(QUEUES),
+        )
+        run_threaded(max(args.concurrency, 1))
+        return
+    if args.mode == "prefork":
+        logger.info(
+            "Starting %d pre-forked RQ workers for queues %s",
+            args.concurrency,
+            ", ".join(QUEUES),
+        )
+        run_prefork(max(args.concurrency, 1), settings.worker_max_jobs or None)
+        return
+    worker = LaneWorker(QUEUES, connection=conn)
+    logger.info("Starting RQ worker for queues %s", ", ".join(QUEUES))
     worker.work(with_scheduler=True)
 
 
@@ -0,0 +1,105 @@
+"""Presign throughput: SigV4Presigner vs boto3's generate_presigned_url.
+
+Run from the repo root with a populated .env:
+
+    python -m benchmarks.presign --iterations 20000
+"""
+
+import argparse
+import time
+
+import boto3
+from app.services.storage import SigV4Presigner
+from botocore.config import Config
+
+ENDPOINT = "http://localhost:9000"
+BUCKET = "uploads"
+KEY = "3f1c2a9e-5a0b-4c1e-9a51-3f5d2c7b8e10_quarterly_report.pdf"
+DISPOSITION = 'attachment; filename="quarterly_report.pdf"'
+
+
+def _rate(label: str, iterations: int, fn) -> None:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<28} {iterations / elapsed:>12,.0f} presigns/s "
+        f"({elapsed / iterations * 1e6:,.1f} us each)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    presigner = SigV4Presigner(
+        access_key="bench",
+        secret_key="bench-secret",
+        region="us-east-1",
+        endpoint_url=ENDPOINT,
+        path_style=True,
+    )
+    client = boto3.client(
+        "s3",
+        endpoint_url=ENDPOINT,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench-secret",
+        region_name="us-east-1",
+        config=Config(signature_version="s3v4"),
+    )
+
+    _rate(
+        "boto3 PUT",
+        args.iterations,
+        lambda: client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": BUCKET, "Key": KEY, "ContentType": "application/pdf"},
+            ExpiresIn=900,
+        ),
+    )
+    _rate(
+        "SigV4Presigner PUT",
+        args.iterations,
+        lambda: presigner.presign(
+            "PUT",
+            BUCKET,
+            KEY,
+            expires=900,
+            headers={"Content-Type": "application/pdf"},
+        ),
+    )
+    _rate(
+        "boto3 GET (download)",
+        args.iterations,
+        lambda: client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": BUCKET,
+                "Key": KEY,
+                "ResponseContentDisposition": DISPOSITION,
+                "ResponseContentType": "application/pdf",
+            },
+            ExpiresIn=300,
+        ),
+    )
+    _rate(
+        "SigV4Presigner GET (download)",
+        args.iterations,
+        lambda: presigner.presign(
+            "GET",
+            BUCKET,
+            KEY,
+            expires=300,
+            query={
+                "response-content-disposition": DISPOSITION,
+                "response-content-type": "application/pdf",
+            },
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
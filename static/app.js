@@ -1,6 +1,7 @@
 function statusInfo(state) {
   if (state === "ACTIVE") return { label: "CLEAN", cls: "badge-clean", canDownload: true };
   if (state === "QUARANTINED" || state === "REJECTED") return { label: "QUARANTINED", cls: "badge-quarantined", canDownload: false };
+  if (state === "SCAN_FAILED") return { label: "SCAN FAILED", cls: "badge-quarantined", canDownload: false };
   return { label: "PENDING", cls: "badge-pending", canDownload: false };
 }
 
@@ -225,6 +226,8 @@ function renderFilesTable(files, tbody, message) {
       actionTd.appendChild(btn);
     } else if (f.state === "QUARANTINED" || f.state === "REJECTED") {
       actionTd.textContent = "Quarantined";
+    } else if (f.state === "SCAN_FAILED") {
+      actionTd.textContent = "Scan failed; contact support";
     } else {
       actionTd.textContent = "Download disabled until scan completes";
     }
@@ -1,21 +1,40 @@
+import datetime as dt
 import hashlib
 import io
 import zipfile
+from unittest.mock import patch
 from urllib.parse import urlparse, urlunparse
 
 import httpx
 import pytest
+import redis
+from app.core.config import settings
 from app.db import models
 from app.db.session import SessionLocal
 from app.main import app
-from app.services.scanner import scan_file
+from app.services import scanner
+from app.services.dead_letters import list_dead_letters, replay
+from app.services.maintenance import cleanup_expired_demos, sweep_expired_uploads
+from app.services.scanner import (
+    MAX_SIZE_BYTES,
+    SCAN_FILE_JOB,
+    lane_queue,
+    scan_batch,
+    scan_file,
+)
+from app.services.storage import get_storage
+from rq import Queue, SimpleWorker
 
 HTTP_200_OK = 200
 HTTP_204_NO_CONTENT = 204
+HTTP_206_PARTIAL_CONTENT = 206
+HTTP_307_TEMPORARY_REDIRECT = 307
 HTTP_400_BAD_REQUEST = 400
 HTTP_403_FORBIDDEN = 403
 HTTP_404_NOT_FOUND = 404
 HTTP_429_TOO_MANY_REQUESTS = 429
+EXPECTED_SHARED_REFS = 2
+BATCH_FILES = 3
 
 
 async def register_and_get_token(
@@ -41,7 +60,7 @@ def build_ooxml_zip(*entries: tuple[str, bytes]) -> bytes:
     return payload.getvalue()
 
 
-async def upload_via_presigned(url: str, headers: dict[str, str], content: bytes):
+def reachable_url(url: str) -> str:
     # When tests run inside Docker, "localhost" in a presigned URL refers to the
     # container itself, not the MinIO service. Rewrite to the docker network host.
     parsed = urlparse(url)
@@ -56,10 +75,43 @@ async def upload_via_presigned(url: str, headers: dict[str, str], content: bytes
             netloc = f"{auth}@{netloc}"
         parsed = parsed._replace(netloc=netloc)
         url = urlunparse(parsed)
+    return url
 
+
+async def upload_via_presigned(
+    url: str,
+    headers: dict[str, str],
+    content: bytes,
+    expected_statuses: frozenset[int] = frozenset({HTTP_200_OK, HTTP_204_NO_CONTENT}),
+):
     async with httpx.AsyncClient() as http_client:
-        res = await http_client.put(url, content=content, headers=headers)
-        assert res.status_code in {HTTP_200_OK, HTTP_204_NO_CONTENT}
+        res = await http_client.put(
+            reachable_url(url), content=content, headers=headers
+        )
+        assert res.status_code in expected_statuses
+
+
+async def upload_and_complete(client, token: str, filename: str) -> str:
+    content = f"contents of {filename}".encode()
+    body = (
+        await client.post(
+            "/files/init",
+            headers=auth_headers(token),
+            json={
+                "original_filename": filename,
+                "content_type": "text/plain",
+                "checksum_sha256": hashlib.sha256(content).hexdigest(),
+            },
+        )
+    ).json()
+    await upload_via_presigned(body["upload_url"], body["headers_to_include"], content)
+    await client.post(f"/files/{body['file_id']}/complete", headers=auth_headers(token))
+    return body["file_id"]
+
+
+def queued_scans(connection: redis.Redis, lane: str) -> list[str]:
+    jobs = Queue(lane_queue(lane), connection=connection).get_jobs()
+    return [job.kwargs["file_id"] for job in jobs if job.func_name == SCAN_FILE_JOB]
 
 
 @pytest.mark.asyncio
@@ -93,6 +145,63 @@ async def test_init_returns_presigned_and_row(client):
     db.close()
 
 
+@pytest.mark.asyncio
+async def test_post_upload_enforces_declared_size(client):
+    token = await register_and_get_token(client)
+    content = b"hello post"
+    init_resp = await client.post(
+        "/files/init",
+        headers=auth_headers(token),
+        json={
+            "original_filename": "post.txt",
+            "content_type": "text/plain",
+            "checksum_sha256": hashlib.sha256(content).hexdigest(),
+            "size_bytes": len(content),
+            "upload_mode": "post",
+        },
+    )
+    assert init_resp.status_code == HTTP_200_OK
+    body = init_resp.json()
+    assert body["fields"]["key"] == body["object_key"]
+
+    async with httpx.AsyncClient() as http_client:
+        oversized = await http_client.post(
+            reachable_url(body["upload_url"]),
+            data=body["fields"],
+            files={"file": ("post.txt", content * 2, "text/plain")},
+        )
+        assert oversized.status_code == HTTP_400_BAD_REQUEST
+        uploaded = await http_client.post(
+            reachable_url(body["upload_url"]),
+            data=body["fields"],
+            files={"file": ("post.txt", content, "text/plain")},
+        )
+        assert uploaded.status_code == HTTP_204_NO_CONTENT
+
+    complete = await client.post(
+        f"/files/{body['file_id']}/complete", headers=auth_headers(token)
+    )
+    assert complete.status_code == HTTP_200_OK
+    assert complete.json()["state"] == models.FileObjectState.SCANNING.value
+
+
+@pytest.mark.asyncio
+async def test_post_upload_rejects_declared_size_over_limit(client):
+    token = await register_and_get_token(client)
+    init_resp = await client.post(
+        "/files/init",
+        headers=auth_headers(token),
+        json={
+            "original_filename": "big.txt",
+            "content_type": "text/plain",
+            "checksum_sha256": hashlib.sha256(b"big").hexdigest(),
+            "size_bytes": MAX_SIZE_BYTES + 1,
+            "upload_mode": "post",
+        },
+    )
+    assert init_resp.status_code == HTTP_400_BAD_REQUEST
+
+
 @pytest.mark.asyncio
 async def test_complete_fails_if_object_not_uploaded(client):
     token = await register_and_get_token(client)
@@ -113,8 +222,43 @@ async def test_complete_fails_if_object_not_uploaded(client):
     assert complete.status_code == HTTP_400_BAD_REQUEST
 
 
+@pytest.mark.asyncio
+async def test_storage_refuses_put_with_checksum_mismatch(client):
+    token = await register_and_get_token(client, email="edge-mismatch@example.com")
+    expected_checksum = hashlib.sha256(b"expected").hexdigest()
+    init_resp = await client.post(
+        "/files/init",
+        headers=auth_headers(token),
+        json={
+            "original_filename": "mismatch.txt",
+            "content_type": "text/plain",
+            "checksum_sha256": expected_checksum,
+        },
+    )
+    body = init_resp.json()
+    assert "x-amz-checksum-sha256" in body["headers_to_include"]
+    await upload_via_presigned(
+        body["upload_url"],
+        body["headers_to_include"],
+        b"wrong-content",
+        expected_statuses=frozenset({HTTP_400_BAD_REQUEST}),
+    )
+
+    complete = await client.post(
+        f"/files/{body['file_id']}/complete", headers=auth_headers(token)
+    )
+    assert complete.status_code == HTTP_400_BAD_REQUEST
+
+    download = await client.post(
+        f"/files/{body['file_id']}/download-url", headers=auth_headers(token)
+    )
+    assert download.status_code == HTTP_403_FORBIDDEN
+
+
 @pytest.mark.asyncio
 async def test_complete_rejects_checksum_mismatch(client):
+    # Multipart objects have no full-object storage checksum, so complete
+    # falls back to streaming the object and rejects the mismatch itself.
     token = await register_and_get_token(client, email="mismatch@example.com")
     expected_checksum = hashlib.sha256(b"expected").hexdigest()
     init_resp = await client.post(
@@ -124,11 +268,12 @@ async def test_complete_rejects_checksum_mismatch(client):
             "original_filename": "mismatch.txt",
             "content_type": "text/plain",
             "checksum_sha256": expected_checksum,
+            "upload_mode": "multipart",
         },
     )
     body = init_resp.json()
     await upload_via_presigned(
-        body["upload_url"], body["headers_to_include"], b"wrong-content"
+        body["parts"][0]["url"], body["headers_to_include"], b"wrong-content"
     )
 
     complete = await client.post(
@@ -217,6 +362,329 @@ async def test_happy_path_scan_and_download(client):
     assert "download_url" in download.json()
 
 
+@pytest.mark.asyncio
+async def test_content_redirects_owner_to_presigned_download(client):
+    token = await register_and_get_token(client, email="content@example.com")
+    other = await register_and_get_token(client, email="content-other@example.com")
+    content = b"content route body"
+    init_resp = await client.post(
+        "/files/init",
+        headers=auth_headers(token),
+        json={
+            "original_filename": "content.txt",
+            "content_type": "text/plain",
+            "checksum_sha256": hashlib.sha256(content).hexdigest(),
+        },
+    )
+    body = init_resp.json()
+    await upload_via_presigned(body["upload_url"], body["headers_to_include"], content)
+    await client.post(f"/files/{body['file_id']}/complete", headers=auth_headers(token))
+    scan_file(body["file_id"])
+
+    forbidden = await client.get(
+        f"/files/{body['file_id']}/content", headers=auth_headers(other)
+    )
+    assert forbidden.status_code == HTTP_403_FORBIDDEN
+
+    resp = await client.get(
+        f"/files/{body['file_id']}/content", headers=auth_headers(token)
+    )
+    assert resp.status_code == HTTP_307_TEMPORARY_REDIRECT
+    async with httpx.AsyncClient() as http_client:
+        ranged = await http_client.get(
+            reachable_url(resp.headers["location"]), headers={"Range": "bytes=0-6"}
+        )
+    assert ranged.status_code == HTTP_206_PARTIAL_CONTENT
+    assert ranged.content == content[:7]
+
+
+@pytest.mark.asyncio
+async def test_scan_batch_scans_queued_files_together(client):
+    token = await register_and_get_token(client, email="batch@example.com")
+    file_ids = []
+    for index in range(BATCH_FILES):
+        content = f"batch file {index}".encode()
+        init_resp = await client.post(
+            "/files/init",
+            headers=auth_headers(token),
+            json={
+                "original_filename": f"batch-{index}.txt",
+                "content_type": "text/plain",
+                "checksum_sha256": hashlib.sha256(content).hexdigest(),
+            },
+        )
+        body = init_resp.json()
+        await upload_via_presigned(
+            body["upload_url"], body["headers_to_include"], content
+        )
+        await client.post(
+            f"/files/{body['file_id']}/complete", headers=auth_headers(token)
+        )
+        file_ids.append(body["file_id"])
+
+    results = scan_batch("small")
+    assert results["active"] >= BATCH_FILES
+
+    db = SessionLocal()
+    for file_id in file_ids:
+        assert db.get(models.FileObject, file_id).state == models.FileObjectState.ACTIVE
+    counter = db.get(
+        models.UsageCounter, db.get(models.FileObject, file_ids[0]).owner_id
+    )
+    assert counter.files_count == BATCH_FILES
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_dead_letters_files_for_replay(client):
+    # The default configuration: completed uploads wait for a batch job.
+    assert settings.scan_batch_size > 1
+    token = await register_and_get_token(client, email="dead@example.com")
+    file_ids = [
+        await upload_and_complete(client, token, f"dead-{index}.txt")
+        for index in range(BATCH_FILES)
+    ]
+    connection = redis.Redis.from_url(settings.redis_url)
+
+    with (
+        patch.object(settings, "scan_retry_max", 0),
+        patch.object(scanner, "get_storage", side_effect=RuntimeError("no storage")),
+    ):
+        with pytest.raises(RuntimeError):
+            scan_batch("small")
+        assert sorted(queued_scans(connection, "small")) == sorted(file_ids)
+        SimpleWorker([lane_queue("small")], connection=connection).work(burst=True)
+
+    db = SessionLocal()
+    for file_id in file_ids:
+        state = db.get(models.FileObject, file_id).state
+        assert state == models.FileObjectState.SCAN_FAILED
+    letters = list_dead_letters(connection)
+    assert sorted(letter.file_id for letter in letters) == sorted(file_ids)
+    assert all(letter.error.endswith("no storage") for letter in letters)
+
+    assert replay(connection=connection) == {"replayed": BATCH_FILES}
+    assert list_dead_letters(connection) == []
+    assert scan_batch("small")["active"] == BATCH_FILES
+    db.expire_all()
+    for file_id in file_ids:
+        assert db.get(models.FileObject, file_id).state == models.FileObjectState.ACTIVE
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_finds_scanning_files_nothing_will_scan(client):
+    token = await register_and_get_token(client, email="orphan@example.com")
+    file_id = await upload_and_complete(client, token, "orphan.txt")
+    connection = redis.Redis.from_url(settings.redis_url)
+    # The pending entry is lost, and the upload is past the orphan grace period.
+    connection.delete(*connection.keys("scan:pending*"))
+    db = SessionLocal()
+    file_obj = db.get(models.FileObject, file_id)
+    file_obj.updated_at = dt.datetime.now(dt.UTC).replace(tzinfo=None) - dt.timedelta(
+        hours=1
+    )
+    db.commit()
+
+    (letter,) = list_dead_letters(connection)
+    assert (letter.job_id, letter.file_id) == (None, file_id)
+    assert replay([file_id], connection) == {"replayed": 1}
+    assert list_dead_letters(connection) == []
+    assert scan_batch("small")["active"] == 1
+    db.refresh(file_obj)
+    assert file_obj.state == models.FileObjectState.ACTIVE
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_scan_batch_requeues_files_of_a_killed_batch(client):
+    token = await register_and_get_token(client, email="killed@example.com")
+    file_id = await upload_and_complete(client, token, "killed.txt")
+    connection = redis.Redis.from_url(settings.redis_url)
+    # A batch that claimed the file and died before committing.
+    scanner._claim_pending(
+        connection, "small", "killed-batch", settings.scan_batch_size
+    )
+
+    assert scan_batch("small") == {}
+    assert queued_scans(connection, "small") == [file_id]
+    assert scan_file(file_id) == "active"
+
+
+@pytest.mark.asyncio
+async def test_scan_reuses_verdict_for_identical_content(client):
+    content = b"verdict cache body"
+    file_ids = []
+    for email in ("verdict-a@example.com", "verdict-b@example.com"):
+        token = await register_and_get_token(client, email=email)
+        init_resp = await client.post(
+            "/files/init",
+            headers=auth_headers(token),
+            json={
+                "original_filename": "verdict.txt",
+                "content_type": "text/plain",
+                "checksum_sha256": hashlib.sha256(content).hexdigest(),
+            },
+        )
+        body = init_resp.json()
+        await upload_via_presigned(
+            body["upload_url"], body["headers_to_include"], content
+        )
+        await client.post(
+            f"/files/{body['file_id']}/complete", headers=auth_headers(token)
+        )
+        assert scan_file(body["file_id"]) == "active"
+        file_ids.append(body["file_id"])
+
+    db = SessionLocal()
+    events = {
+        event.file_id: event.details
+        for event in db.query(models.AuditEvent).filter(
+            models.AuditEvent.file_id.in_(file_ids),
+            models.AuditEvent.action == "SCAN_PASS",
+        )
+    }
+    db.close()
+    assert events[file_ids[1]].get("cached") is True
+
+
+@pytest.mark.asyncio
+async def test_init_reuses_identical_active_upload_for_same_owner(client):
+    token = await register_and_get_token(client, email="dedup@example.com")
+    content = b"repeat upload"
+    payload = {
+        "original_filename": "repeat.txt",
+        "content_type": "text/plain",
+        "checksum_sha256": hashlib.sha256(content).hexdigest(),
+        "size_bytes": len(content),
+    }
+    first = (
+        await client.post("/files/init", headers=auth_headers(token), json=payload)
+    ).json()
+    await upload_via_presigned(
+        first["upload_url"], first["headers_to_include"], content
+    )
+    await client.post(
+        f"/files/{first['file_id']}/complete", headers=auth_headers(token)
+    )
+    scan_file(first["file_id"])
+
+    second = await client.post(
+        "/files/init",
+        headers=auth_headers(token),
+        json={**payload, "original_filename": "copy.txt"},
+    )
+    other_token = await register_and_get_token(client, email="dedup-other@example.com")
+    other = await client.post(
+        "/files/init", headers=auth_headers(other_token), json=payload
+    )
+
+    assert second.status_code == HTTP_200_OK
+    body = second.json()
+    assert body["deduplicated"] is True
+    assert body["state"] == models.FileObjectState.ACTIVE.value
+    assert body["upload_url"] is None
+    assert body["object_key"] == first["object_key"]
+    # Deduplication never crosses owners.
+    assert other.json()["deduplicated"] is False
+
+    db = SessionLocal()
+    original = db.get(models.FileObject, first["file_id"])
+    reference = db.get(models.ObjectReference, (original.bucket, original.object_key))
+    counter = db.get(models.UsageCounter, original.owner_id)
+    assert reference.ref_count == EXPECTED_SHARED_REFS
+    assert counter.files_count == EXPECTED_SHARED_REFS
+    db.close()
+
+    download = await client.post(
+        f"/files/{body['file_id']}/download-url", headers=auth_headers(token)
+    )
+    assert download.status_code == HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_sweeper_rejects_expired_uploads_and_deletes_objects(client):
+    token = await register_and_get_token(client, email="sweep@example.com")
+    content = b"never completed"
+    init_body = (
+        await client.post(
+            "/files/init",
+            headers=auth_headers(token),
+            json={
+                "original_filename": "stale.txt",
+                "content_type": "text/plain",
+                "checksum_sha256": hashlib.sha256(content).hexdigest(),
+            },
+        )
+    ).json()
+    await upload_via_presigned(
+        init_body["upload_url"], init_body["headers_to_include"], content
+    )
+
+    db = SessionLocal()
+    file_obj = db.get(models.FileObject, init_body["file_id"])
+    file_obj.upload_expires_at = dt.datetime.now(dt.UTC).replace(
+        tzinfo=None
+    ) - dt.timedelta(days=1)
+    db.commit()
+
+    stats = sweep_expired_uploads()
+
+    db.refresh(file_obj)
+    assert file_obj.state == models.FileObjectState.REJECTED
+    assert stats["rows"] >= 1
+    storage = get_storage()
+    with pytest.raises(storage.not_found_exc):
+        storage.head_object(file_obj.bucket, file_obj.object_key)
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_completes_and_scans(client):
+    token = await register_and_get_token(client, email="multipart@example.com")
+    content = b"multipart plain text"
+    checksum = hashlib.sha256(content).hexdigest()
+    init_resp = await client.post(
+        "/files/init",
+        headers=auth_headers(token),
+        json={
+            "original_filename": "parts.txt",
+            "content_type": "text/plain",
+            "checksum_sha256": checksum,
+            "size_bytes": len(content),
+            "upload_mode": "multipart",
+        },
+    )
+    assert init_resp.status_code == HTTP_200_OK
+    init_body = init_resp.json()
+    assert init_body["upload_url"] is None
+    assert init_body["upload_id"]
+    assert [part["part_number"] for part in init_body["parts"]] == [1]
+
+    more = await client.post(
+        f"/files/{init_body['file_id']}/parts",
+        headers=auth_headers(token),
+        json={"part_numbers": [1]},
+    )
+    assert more.status_code == HTTP_200_OK
+    part_url = more.json()["parts"][0]["url"]
+    await upload_via_presigned(part_url, init_body["headers_to_include"], content)
+
+    complete = await client.post(
+        f"/files/{init_body['file_id']}/complete", headers=auth_headers(token)
+    )
+    assert complete.status_code == HTTP_200_OK
+    assert complete.json()["state"] == models.FileObjectState.SCANNING.value
+
+    scan_file(init_body["file_id"])
+
+    db = SessionLocal()
+    refreshed = db.get(models.FileObject, init_body["file_id"])
+    assert refreshed.state == models.FileObjectState.ACTIVE
+    assert refreshed.multipart_upload_id is None
+    db.close()
+
+
 @pytest.mark.asyncio
 async def test_docx_octet_stream_is_accepted_and_activated(client):
     token = await register_and_get_token(client, email="docx-ok@example.com")
@@ -390,3 +858,47 @@ async def test_demo_can_upload_list_and_download_isolated(client):
         await other.post("/demo/start")
         hidden = await other.post(f"/files/{init_body['file_id']}/download-url")
         assert hidden.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_demo_cleanup_purges_expired_demo_users(client):
+    await client.post("/demo/start")
+    content = b"short-lived demo file"
+    init_body = (
+        await client.post(
+            "/files/init",
+            json={
+                "original_filename": "demo-cleanup.txt",
+                "content_type": "text/plain",
+                "checksum_sha256": hashlib.sha256(content).hexdigest(),
+                "size_bytes": len(content),
+            },
+        )
+    ).json()
+    await upload_via_presigned(
+        init_body["upload_url"], init_body["headers_to_include"], content
+    )
+    await client.post(f"/files/{init_body['file_id']}/complete")
+    scan_file(init_body["file_id"])
+
+    db = SessionLocal()
+    file_obj = db.get(models.FileObject, init_body["file_id"])
+    owner = db.get(models.User, file_obj.owner_id)
+    bucket, object_key, owner_id = file_obj.bucket, file_obj.object_key, owner.id
+    owner.created_at = dt.datetime.now(dt.UTC).replace(tzinfo=None) - dt.timedelta(
+        days=1
+    )
+    db.commit()
+    db.close()
+
+    stats = cleanup_expired_demos()
+
+    assert stats["users"] >= 1
+    db = SessionLocal()
+    assert db.get(models.FileObject, init_body["file_id"]) is None
+    assert db.get(models.User, owner_id) is None
+    assert db.get(models.UsageCounter, owner_id) is None
+    db.close()
+    storage = get_storage()
+    with pytest.raises(storage.not_found_exc):
+        storage.head_object(bucket, object_key)
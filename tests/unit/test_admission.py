@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services.admission import Admission, backlog_limit
+
+
+def limits(**overrides):
+    values = {
+        "scan_admission_max_backlog": 1000,
+        "scan_admission_min_backlog": 50,
+        "scan_admission_max_wait_seconds": 100,
+        "scan_admission_retry_after_seconds": 30,
+        **overrides,
+    }
+    return patch.multiple(settings, **values)
+
+
+def test_backlog_limit_follows_throughput_within_bounds():
+    with limits():
+        assert backlog_limit(0) == 1000  # noqa: PLR2004
+        assert backlog_limit(2.5) == 250  # noqa: PLR2004
+        assert backlog_limit(0.1) == 50  # noqa: PLR2004
+        assert backlog_limit(100) == 1000  # noqa: PLR2004
+
+
+def test_admission_refuses_at_the_limit_with_time_to_drain():
+    with limits():
+        assert Admission("small", backlog=249, throughput=2.5, limit=250).admitted
+        refused = Admission("small", backlog=259, throughput=2.5, limit=250)
+        assert not refused.admitted
+        assert refused.retry_after == 4  # noqa: PLR2004
+        stalled = Admission("large", backlog=1000, throughput=0, limit=1000)
+        assert stalled.retry_after == 30  # noqa: PLR2004
+        flood = Admission("large", backlog=10_000, throughput=1, limit=50)
+        assert flood.retry_after == 100  # noqa: PLR2004
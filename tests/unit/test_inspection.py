@@ -0,0 +1,82 @@
+import hashlib
+import io
+import os
+import zipfile
+
+from app.services.inspection import (
+    SNIFF_SAMPLE_BYTES,
+    ZIP_TAIL_BYTES,
+    ObjectInspector,
+    inspect_zip_tail,
+    inspection_record,
+    magic_head,
+)
+
+OFFICE_ENTRIES = ("[Content_Types].xml", "word/document.xml")
+
+
+def build_zip(*entries: tuple[str, bytes]) -> bytes:
+    payload = io.BytesIO()
+    with zipfile.ZipFile(payload, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for name, content in entries:
+            zf.writestr(name, content)
+    return payload.getvalue()
+
+
+def inspect(data: bytes, chunk_size: int = 4096) -> ObjectInspector:
+    inspector = ObjectInspector(tail_bytes=ZIP_TAIL_BYTES)
+    for offset in range(0, len(data), chunk_size):
+        inspector.update(data[offset : offset + chunk_size])
+    return inspector
+
+
+def test_single_pass_collects_hash_sample_and_size():
+    data = os.urandom(SNIFF_SAMPLE_BYTES * 3 + 17)
+
+    result = inspect(data).result()
+
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert result.size_bytes == len(data)
+    assert result.sample == data[:SNIFF_SAMPLE_BYTES]
+
+
+def test_zip_tail_answers_for_archive_larger_than_tail():
+    data = build_zip(
+        ("[Content_Types].xml", b"<Types/>"),
+        ("media/blob.bin", os.urandom(ZIP_TAIL_BYTES * 2)),
+        ("word/document.xml", b"<w:document/>"),
+    )
+    result = inspect(data).result()
+
+    assert len(result.tail) == ZIP_TAIL_BYTES
+    office_entries, archive = inspect_zip_tail(
+        result.tail, OFFICE_ENTRIES, size=len(data)
+    )
+    assert office_entries
+    assert archive.entries == len(OFFICE_ENTRIES) + 1
+    assert archive.total_uncompressed > ZIP_TAIL_BYTES * 2
+    assert inspect_zip_tail(result.tail, ("ppt/presentation.xml",), size=len(data)) == (
+        False,
+        archive,
+    )
+
+
+def test_zip_tail_is_inconclusive_when_directory_precedes_tail():
+    names = [f"customXml/item{i}.xml" for i in range(8000)]
+    data = build_zip(*[(name, b"") for name in names])
+    tail = data[-ZIP_TAIL_BYTES:]
+
+    assert len(data) > ZIP_TAIL_BYTES
+    assert inspect_zip_tail(tail, OFFICE_ENTRIES, size=len(data)) == (None, None)
+    assert inspect_zip_tail(b"not a zip", OFFICE_ENTRIES, size=9) == (False, None)
+
+
+def test_inspection_record_round_trips_magic_head():
+    record = inspection_record(etag='"abc"', sample=b"%PDF-1.7\n", office_entries=None)
+
+    assert magic_head(record) == b"%PDF-1.7\n"
+    assert (
+        magic_head(inspection_record(etag=None, sample=None, office_entries=None))
+        == b""
+    )
+    assert magic_head(None) is None
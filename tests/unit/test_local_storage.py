@@ -0,0 +1,112 @@
+import hashlib
+
+import pytest
+from app.api.routers import local_storage as local_storage_router
+from app.services.local_storage import ROUTE_PREFIX, LocalStorageClient
+from app.services.utils import parse_byte_range
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+HTTP_200_OK = 200
+HTTP_400_BAD_REQUEST = 400
+HTTP_403_FORBIDDEN = 403
+BODY = b"hello local storage" * 100
+
+
+@pytest.fixture()
+def storage(tmp_path):
+    return LocalStorageClient(
+        root=str(tmp_path), public_url="http://testserver", secret="test-secret"
+    )
+
+
+@pytest.fixture()
+def client(storage, monkeypatch):
+    monkeypatch.setattr(local_storage_router, "get_storage", lambda: storage)
+    app = FastAPI()
+    app.include_router(local_storage_router.router, prefix=ROUTE_PREFIX)
+    return TestClient(app)
+
+
+def put_via_presigned(client, storage, key, body, checksum_hex=None):
+    presigned = storage.generate_presigned_put(
+        key, "text/plain", expires_in=60, checksum_sha256=checksum_hex
+    )
+    return client.put(presigned.url, content=body, headers=presigned.headers)
+
+
+def test_presigned_put_then_head_and_reads(client, storage):
+    key = "a b/../weird_name.txt"
+    checksum = hashlib.sha256(BODY).hexdigest()
+
+    response = put_via_presigned(client, storage, key, BODY, checksum)
+
+    assert response.status_code == HTTP_200_OK
+    head = storage.head_object(storage.bucket, key, checksum=True)
+    assert head["ContentLength"] == len(BODY)
+    assert head["ContentType"] == "text/plain"
+    assert bytes.fromhex(head["ETag"].strip('"')) == hashlib.sha256(BODY).digest()
+    assert b"".join(storage.iter_object(storage.bucket, key, chunk_size=7)) == BODY
+    assert storage.get_object_range(storage.bucket, key, "bytes=0-4") == BODY[:5]
+    assert storage.get_object_range(storage.bucket, key, "bytes=-3") == BODY[-3:]
+    ranged = storage.iter_object(
+        storage.bucket, key, chunk_size=3, byte_range="bytes=2-9"
+    )
+    assert b"".join(ranged) == BODY[2:10]
+    assert storage.object_path(storage.bucket, key).is_relative_to(storage.root)
+
+
+def test_put_rejects_checksum_mismatch(client, storage):
+    wrong = hashlib.sha256(b"something else").hexdigest()
+
+    response = put_via_presigned(client, storage, "f.txt", BODY, wrong)
+
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert b"BadDigest" in response.content
+    with pytest.raises(storage.not_found_exc):
+        storage.head_object(storage.bucket, "f.txt")
+
+
+def test_signature_covers_signed_headers_and_key(client, storage):
+    presigned = storage.generate_presigned_put("f.txt", "text/plain", expires_in=60)
+
+    wrong_type = client.put(
+        presigned.url, content=BODY, headers={"Content-Type": "text/html"}
+    )
+    other_key = client.put(
+        presigned.url.replace("f.txt", "g.txt"), content=BODY, headers=presigned.headers
+    )
+
+    assert wrong_type.status_code == HTTP_403_FORBIDDEN
+    assert other_key.status_code == HTTP_403_FORBIDDEN
+
+
+def test_presigned_download_sets_disposition(client, storage):
+    put_via_presigned(client, storage, "f.txt", BODY)
+    url = storage.generate_presigned_get_download(
+        key="f.txt", download_filename="report.txt", response_content_type="text/plain"
+    )
+
+    response = client.get(url)
+
+    assert response.status_code == HTTP_200_OK
+    assert response.content == BODY
+    assert response.headers["content-disposition"].startswith(
+        'attachment; filename="report.txt"'
+    )
+
+
+def test_expired_url_is_rejected(client, storage):
+    put_via_presigned(client, storage, "f.txt", BODY)
+
+    response = client.get(storage.generate_presigned_get("f.txt", expires=-1))
+
+    assert response.status_code == HTTP_403_FORBIDDEN
+
+
+def test_parse_byte_range():
+    assert parse_byte_range("bytes=0-9", 5) == (0, 4)
+    assert parse_byte_range("bytes=2-", 5) == (2, 4)
+    assert parse_byte_range("bytes=-2", 5) == (3, 4)
+    assert parse_byte_range("bytes=5-", 5) is None
+    assert parse_byte_range("bytes=-", 5) is None
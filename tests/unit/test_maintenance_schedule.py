@@ -0,0 +1,40 @@
+import datetime as dt
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.services.maintenance import SWEEP_JOB, ensure_scheduled
+from app.workers.rq_worker import MaintenanceScheduleMixin
+
+
+def test_schedule_key_outlives_the_pending_run():
+    connection = MagicMock()
+    connection.set.return_value = True
+    with (
+        patch.object(settings, "maintenance_job_timeout_seconds", 600),
+        patch("app.services.maintenance.get_maintenance_queue") as queue,
+    ):
+        assert ensure_scheduled(SWEEP_JOB, 300, connection)
+        connection.set.return_value = None
+        assert not ensure_scheduled(SWEEP_JOB, 300, connection)
+
+    assert connection.set.call_args.kwargs == {"nx": True, "ex": 900}
+    queue.return_value.enqueue_in.assert_called_once_with(
+        dt.timedelta(seconds=300), SWEEP_JOB, job_timeout=600
+    )
+
+
+def test_worker_maintenance_tick_rebooks_schedules():
+    class Base:
+        ticks = 0
+
+        def run_maintenance_tasks(self):
+            self.ticks += 1
+
+    class Worker(MaintenanceScheduleMixin, Base):
+        connection = object()
+
+    worker = Worker()
+    with patch("app.workers.rq_worker.ensure_maintenance_scheduled") as ensure:
+        worker.run_maintenance_tasks()
+    assert worker.ticks == 1
+    ensure.assert_called_once_with(worker.connection)
@@ -0,0 +1,64 @@
+from contextlib import suppress
+
+from app.core.metrics import MetricsMiddleware, instrument_storage
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/things/{thing_id}")
+    def thing(thing_id: str):
+        return {"id": thing_id}
+
+    labels = {"method": "GET", "route": "/things/{thing_id}", "status": "200"}
+    missing = {"method": "GET", "route": "unmatched", "status": "404"}
+    before = sample("http_request_duration_seconds_count", labels)
+    before_missing = sample("http_request_duration_seconds_count", missing)
+    client = TestClient(app)
+    client.get("/things/a")
+    client.get("/things/b")
+    client.get("/nowhere")
+    assert sample("http_request_duration_seconds_count", labels) == before + 2
+    assert sample("http_request_duration_seconds_count", missing) == before_missing + 1
+
+
+@instrument_storage("fake")
+class FakeStorage:
+    def head_object(self, bucket, key):  # noqa: ARG002
+        raise KeyError(key)
+
+    def iter_object(self, bucket, key):  # noqa: ARG002
+        yield b"a"
+        yield b"b"
+
+    def generate_presigned_get(self, key):
+        return key
+
+
+def test_storage_calls_are_timed_by_operation_and_outcome():
+    def count(operation, outcome):
+        return sample(
+            "storage_operation_duration_seconds_count",
+            {"backend": "fake", "operation": operation, "outcome": outcome},
+        )
+
+    storage = FakeStorage()
+    assert list(storage.iter_object("b", "k")) == [b"a", b"b"]
+    stream = storage.iter_object("b", "k")
+    next(stream)
+    stream.close()
+    with suppress(KeyError):
+        storage.head_object("b", "k")
+    assert storage.generate_presigned_get("k") == "k"
+    assert count("iter_object", "ok") == 1
+    assert count("iter_object", "closed") == 1
+    assert count("head_object", "error") == 1
+    assert count("generate_presigned_get", "ok") == 0
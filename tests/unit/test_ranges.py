@@ -0,0 +1,64 @@
+import datetime as dt
+
+import pytest
+from app.api.ranges import (
+    ObjectInfo,
+    RangeNotSatisfiableError,
+    object_headers,
+    requested_range,
+)
+
+SIZE = 100
+LAST_BYTE = SIZE - 1
+TAIL_START = 90
+ETAG = '"abc"'
+LAST_MODIFIED = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.UTC)
+INFO = ObjectInfo(
+    size=SIZE, etag=ETAG, last_modified=LAST_MODIFIED, content_type="text/plain"
+)
+
+
+def test_requested_range_single_ranges():
+    assert requested_range({}, INFO) is None
+    assert requested_range({"range": "bytes=0-9"}, INFO) == (0, 9)
+    assert requested_range({"range": "bytes=90-"}, INFO) == (TAIL_START, LAST_BYTE)
+    assert requested_range({"range": "bytes=-10"}, INFO) == (TAIL_START, LAST_BYTE)
+    assert requested_range({"range": "Bytes=0-1"}, INFO) == (0, 1)
+
+
+def test_requested_range_serves_full_object_for_multi_and_other_units():
+    assert requested_range({"range": "bytes=0-1,5-6"}, INFO) is None
+    assert requested_range({"range": "items=0-1"}, INFO) is None
+
+
+def test_requested_range_ignores_malformed_headers():
+    for header in ("bytes=abc-", "bytes=5-2x", "bytes=5-2", "bytes=-"):
+        assert requested_range({"range": header}, INFO) is None
+
+
+def test_requested_range_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiableError):
+        requested_range({"range": "bytes=100-"}, INFO)
+
+
+def test_if_range_requires_matching_strong_validator():
+    headers = {"range": "bytes=0-9"}
+    assert requested_range({**headers, "if-range": ETAG}, INFO) == (0, 9)
+    assert requested_range({**headers, "if-range": '"other"'}, INFO) is None
+    assert requested_range({**headers, "if-range": f"W/{ETAG}"}, INFO) is None
+    assert requested_range(
+        {**headers, "if-range": "Tue, 02 Jan 2024 03:04:05 GMT"}, INFO
+    ) == (0, 9)
+    assert (
+        requested_range({**headers, "if-range": "Tue, 02 Jan 2024 03:04:06 GMT"}, INFO)
+        is None
+    )
+
+
+def test_object_headers_for_partial_content():
+    headers = object_headers(INFO, (10, 19), {})
+
+    assert headers["Content-Range"] == f"bytes 10-19/{SIZE}"
+    assert headers["Content-Length"] == "10"
+    assert headers["Last-Modified"] == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert "Content-Range" not in object_headers(INFO, None, {})
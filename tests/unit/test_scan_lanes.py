@@ -0,0 +1,31 @@
+import random
+from collections import Counter
+
+from app.services.scanner import SCAN_LANES, scan_lane, weighted_lane_order
+
+MB = 1024 * 1024
+DRAWS = 10_000
+
+
+def test_scan_lane_by_size():
+    assert scan_lane(0) == "small"
+    assert scan_lane(MB) == "small"
+    assert scan_lane(MB + 1) == "medium"
+    assert scan_lane(16 * MB) == "medium"
+    assert scan_lane(16 * MB + 1) == "large"
+    assert scan_lane(None) == "medium"
+
+
+def test_weighted_lane_order_leads_in_proportion_to_weight():
+    rng = random.Random(7)
+    weights = {"small": 6, "medium": 3, "large": 1}
+    leads = Counter(weighted_lane_order(weights, rng.random)[0] for _ in range(DRAWS))
+    assert sorted(weighted_lane_order(weights, rng.random)) == sorted(SCAN_LANES)
+    for lane, weight in weights.items():
+        assert abs(leads[lane] / DRAWS - weight / 10) < 0.02  # noqa: PLR2004
+
+
+def test_unweighted_lanes_come_last():
+    order = weighted_lane_order({"small": 1, "medium": 0})
+    assert order[0] == "small"
+    assert set(order[1:]) == {"medium", "large"}
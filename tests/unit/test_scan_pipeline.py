@@ -0,0 +1,155 @@
+import io
+import zipfile
+from unittest.mock import patch
+
+from app.db import models
+from app.services import scanner
+from app.services.inspection import inspection_record
+
+ETAG = '"etag"'
+PDF = b"%PDF-1.7\n" + b"0" * 100
+
+
+class FakeStorage:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.range_reads = 0
+
+    def head_object(self, bucket, key):  # noqa: ARG002
+        return {"ContentLength": len(self.data), "ETag": ETAG}
+
+    def iter_object(self, bucket, key, chunk_size=4):  # noqa: ARG002
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start : start + chunk_size]
+
+    def get_object_range(self, bucket, key, *, byte_range):  # noqa: ARG002
+        self.range_reads += 1
+        start, end = byte_range.removeprefix("bytes=").split("-")
+        return self.data[int(start) : int(end) + 1]
+
+
+def make_file(filename: str, content_type: str, **inspection) -> models.FileObject:
+    return models.FileObject(
+        id="f1",
+        owner_id="u1",
+        bucket="b",
+        object_key="k",
+        original_filename=filename,
+        declared_content_type=content_type,
+        checksum_sha256="00" * 32,
+        checksum_verified=False,
+        sniffed_content_type=content_type,
+        state=models.FileObjectState.SCANNING,
+        inspection={"etag": ETAG, **inspection},
+    )
+
+
+def scan(file_obj: models.FileObject, storage: FakeStorage) -> scanner.ScanOutcome:
+    with patch.object(scanner, "QuotaService"):
+        return scanner._scan_object(None, storage, file_obj)
+
+
+def test_pipeline_reuses_complete_inspection_and_times_every_stage():
+    file_obj = make_file(
+        "report.pdf",
+        "application/pdf",
+        **inspection_record(etag=ETAG, sample=PDF, office_entries=None),
+    )
+    storage = FakeStorage(PDF)
+    outcome = scan(file_obj, storage)
+    assert outcome.result == "active"
+    assert storage.range_reads == 0
+    assert list(outcome.metadata["stages_ms"]) == [
+        "size",
+        "magic",
+        "structure",
+        "signatures",
+        "quota",
+    ]
+
+
+def test_pipeline_short_circuits_on_first_failure():
+    file_obj = make_file("report.pdf", "application/pdf")
+    storage = FakeStorage(PDF)
+    with patch.object(scanner, "MAX_SIZE_BYTES", len(PDF) - 1):
+        outcome = scan(file_obj, storage)
+    assert outcome.metadata["reason"] == "too_large"
+    assert list(outcome.metadata["stages_ms"]) == ["size"]
+    assert storage.range_reads == 0
+
+
+def test_structure_stage_reads_only_the_zip_directory():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/other.xml", "x" * 10_000)
+    data = buffer.getvalue()
+    file_obj = make_file(
+        "letter.docx",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        **inspection_record(etag=ETAG, sample=data, office_entries=None),
+    )
+    file_obj.sniffed_content_type = "application/zip"
+    outcome = scan(file_obj, FakeStorage(data))
+    assert outcome.result == "quarantined"
+    assert outcome.metadata["reason"] == "office_zip_invalid"
+    assert "structure" in outcome.metadata["stages_ms"]
+
+
+def test_signature_stage_quarantines_matching_content():
+    data = (
+        PDF + b"X5O!P%@AP[4\\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+    )
+    file_obj = make_file(
+        "report.pdf",
+        "application/pdf",
+        **inspection_record(etag=ETAG, sample=data, office_entries=None),
+    )
+    outcome = scan(file_obj, FakeStorage(data))
+    assert outcome.result == "quarantined"
+    assert outcome.metadata["reason"] == "signature_match"
+    assert outcome.metadata["signature"] == "eicar-test-file"
+
+
+def test_structure_stage_quarantines_zip_bombs_from_the_directory():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", bytes(16 * 1024 * 1024))
+    data = buffer.getvalue()
+    file_obj = make_file(
+        "letter.docx",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        **inspection_record(etag=ETAG, sample=data, office_entries=None),
+    )
+    file_obj.sniffed_content_type = "application/zip"
+    outcome = scan(file_obj, FakeStorage(data))
+    assert outcome.metadata["reason"] == "zip_bomb"
+    assert outcome.metadata["limit"] == "max_ratio"
+
+
+def test_structure_stage_quarantines_macros_in_macro_free_formats():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", "<w:document/>")
+        archive.writestr("word/vbaProject.bin", b"\xd0\xcf\x11\xe0")
+    data = buffer.getvalue()
+    file_obj = make_file(
+        "letter.docx",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        **inspection_record(etag=ETAG, sample=data, office_entries=None),
+    )
+    file_obj.sniffed_content_type = "application/zip"
+    outcome = scan(file_obj, FakeStorage(data))
+    assert outcome.metadata["reason"] == "office_macros"
+
+
+def test_signature_stage_ignores_documents_that_quote_executables():
+    data = PDF + b"This program cannot be run in DOS mode; see vbaProject.bin"
+    file_obj = make_file(
+        "report.pdf",
+        "application/pdf",
+        **inspection_record(etag=ETAG, sample=data, office_entries=None),
+    )
+    assert scan(file_obj, FakeStorage(data)).result == "active"
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.services import scanner
+from app.services.scanner import requeue_stranded, retry_intervals
+from app.services.state import FileState, can_transition
+
+
+def test_retry_intervals_back_off_exponentially_with_capped_jitter():
+    values = {
+        "scan_retry_max": 5,
+        "scan_retry_base_seconds": 10,
+        "scan_retry_max_seconds": 60,
+    }
+    with patch.multiple(settings, **values):
+        assert retry_intervals(lambda: 0.0) == [5, 10, 20, 30, 30]
+        assert retry_intervals(lambda: 1.0) == [10, 20, 40, 60, 60]
+        for interval, ceiling in zip(
+            retry_intervals(), [10, 20, 40, 60, 60], strict=True
+        ):
+            assert ceiling / 2 <= interval <= ceiling
+
+
+def test_dead_lettered_files_can_only_be_replayed():
+    assert can_transition(FileState.SCANNING, FileState.SCAN_FAILED)
+    assert can_transition(FileState.SCAN_FAILED, FileState.SCANNING)
+    assert not can_transition(FileState.SCAN_FAILED, FileState.ACTIVE)
+
+
+def test_claims_of_dead_batches_go_to_per_file_jobs():
+    def fetch(owner, connection):  # noqa: ARG001
+        if owner == "dead":
+            raise scanner.NoSuchJobError(owner)
+        return MagicMock(get_status=lambda: scanner.JobStatus.STARTED)
+
+    redis = MagicMock()
+    redis.smembers.return_value = {b"dead", b"live"}
+    redis.pipeline.return_value.execute.return_value = [[b"f1|1.5", b"f2"], 1, 1]
+    with (
+        patch.object(scanner.Job, "fetch", side_effect=fetch),
+        patch.object(scanner, "_enqueue_single") as enqueue,
+    ):
+        assert requeue_stranded(redis, "small") == 2  # noqa: PLR2004
+
+    assert [call.args[1] for call in enqueue.call_args_list] == ["f1", "f2"]
+    redis.pipeline.return_value.lrange.assert_called_once_with(
+        "scan:processing:small:dead", 0, -1
+    )
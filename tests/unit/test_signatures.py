@@ -0,0 +1,79 @@
+import random
+
+import pytest
+from app.services.signatures import (
+    DEFAULT_RULES_PATH,
+    Signature,
+    SignatureEngine,
+    SignatureRulesError,
+    load_engine,
+    parse_rules,
+    scan_chunks,
+)
+
+BLOCK = 64 * 1024
+
+
+def chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+def test_parse_rules_reads_hex_and_text_patterns():
+    signatures = parse_rules(
+        "# comment\n\nzip-magic hex:504b 0304\nphrase text:two words here \n"
+    )
+    assert signatures == [
+        Signature("zip-magic", b"PK\x03\x04"),
+        Signature("phrase", b"two words here"),
+    ]
+
+
+@pytest.mark.parametrize("line", ["bad other:x", "bad hex:zz", "bad text:"])
+def test_parse_rules_rejects_invalid_lines(line):
+    with pytest.raises(SignatureRulesError, match="line 1"):
+        parse_rules(line)
+
+
+def test_bundled_rules_load():
+    engine = load_engine(DEFAULT_RULES_PATH)
+    assert engine.signatures
+    assert scan_chunks(engine, [b"...", b"\x7fELF\x02\x01\x01" + bytes(5)])
+    assert not scan_chunks(engine, [b"This program cannot be run in DOS mode"])
+
+
+def test_overlapping_patterns_report_first_ending_match():
+    engine = SignatureEngine(
+        [Signature("hers", b"hers"), Signature("she", b"she"), Signature("his", b"his")]
+    )
+    assert scan_chunks(engine, [b"ushers"]).name == "she"
+    assert scan_chunks(engine, [b"h", b"i", b"s"]).name == "his"
+    assert scan_chunks(engine, [b"hes", b"h"]) is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, BLOCK, BLOCK + 1, 1 << 20])
+@pytest.mark.parametrize("offset", [-9, -4, -1, 0, 3])
+def test_matches_straddling_chunk_and_block_boundaries(chunk_size, offset):
+    pattern = b"SIGNATURE-STRADDLE"
+    data = bytearray(3 * BLOCK)
+    position = 2 * BLOCK + offset
+    data[position : position + len(pattern)] = pattern
+    for prefilter in (True, False):
+        engine = SignatureEngine([Signature("s", pattern)], prefilter=prefilter)
+        assert scan_chunks(engine, chunked(bytes(data), chunk_size)) is not None
+
+
+def test_prefilter_agrees_with_plain_automaton():
+    rng = random.Random(7)
+    for _ in range(20):
+        signatures = [
+            Signature(str(index), rng.randbytes(rng.randint(7, 24)))
+            for index in range(100)
+        ]
+        data = bytearray(rng.randbytes(rng.randint(0, 3 * BLOCK)))
+        if data and rng.random() < 0.7:  # noqa: PLR2004
+            pattern = rng.choice(signatures).pattern
+            position = rng.randrange(max(len(data) - len(pattern), 1))
+            data[position : position + len(pattern)] = pattern
+        chunks = chunked(bytes(data), rng.choice([1000, BLOCK, 100_000]))
+        expected = scan_chunks(SignatureEngine(signatures, prefilter=False), chunks)
+        assert scan_chunks(SignatureEngine(signatures), chunks) == expected
@@ -0,0 +1,95 @@
+from app.services.url_cache import DownloadUrlCache
+
+TTL = 300
+WINDOW = 60
+# Aligned to a window boundary (1_000_020 % 60 == 0).
+START = 1_000_020
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(clock: FakeClock, *, maxsize: int = 10) -> DownloadUrlCache:
+    return DownloadUrlCache(
+        ttl_seconds=TTL, window_seconds=WINDOW, maxsize=maxsize, clock=clock
+    )
+
+
+def counting_signer(calls: list):
+    def sign(signed_at, expires):
+        calls.append((signed_at, expires))
+        return f"https://example.test/obj?t={int(signed_at.timestamp())}"
+
+    return sign
+
+
+def test_reuses_url_within_window_and_reports_remaining_lifetime():
+    clock = FakeClock(START)
+    cache = make_cache(clock)
+    calls = []
+
+    url, expires_in = cache.get_or_sign("f1", "attachment", counting_signer(calls))
+    clock.now += WINDOW // 2
+    again, later_expires_in = cache.get_or_sign(
+        "f1", "attachment", counting_signer(calls)
+    )
+
+    assert again == url
+    assert len(calls) == 1
+    assert calls[0][0].timestamp() == START
+    assert expires_in == TTL
+    assert later_expires_in == TTL - WINDOW // 2
+
+
+def test_new_window_signs_a_new_url():
+    clock = FakeClock(START)
+    cache = make_cache(clock)
+    calls = []
+
+    first, _ = cache.get_or_sign("f1", "attachment", counting_signer(calls))
+    clock.now += WINDOW
+    second, expires_in = cache.get_or_sign("f1", "attachment", counting_signer(calls))
+
+    assert first != second
+    assert [signed_at.timestamp() for signed_at, _ in calls] == [START, START + WINDOW]
+    assert expires_in == TTL
+
+
+def test_invalidate_drops_cached_urls():
+    clock = FakeClock(START)
+    cache = make_cache(clock)
+    calls = []
+
+    cache.get_or_sign("f1", "attachment", counting_signer(calls))
+    cache.invalidate("f1")
+    cache.get_or_sign("f1", "attachment", counting_signer(calls))
+
+    assert [expires for _, expires in calls] == [TTL, TTL]
+
+
+def test_window_is_capped_to_half_the_ttl():
+    cache = DownloadUrlCache(ttl_seconds=TTL, window_seconds=10 * TTL, maxsize=10)
+
+    assert cache.window_seconds == TTL // 2
+
+
+def test_lru_evicts_least_recently_used_file():
+    clock = FakeClock(START)
+    cache = make_cache(clock, maxsize=2)
+    calls = []
+    sign = counting_signer(calls)
+
+    cache.get_or_sign("f1", "attachment", sign)
+    cache.get_or_sign("f2", "attachment", sign)
+    cache.get_or_sign("f1", "attachment", sign)
+    cache.get_or_sign("f3", "attachment", sign)
+    cache.get_or_sign("f1", "attachment", sign)
+    cache.get_or_sign("f2", "attachment", sign)
+
+    # f1 stays cached; f2 is evicted by f3 and has to be signed again.
+    assert calls == [calls[0]] * 4
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from app.services import file_type_policy
+from app.services.file_type_policy import FileTypePolicy, policy_fingerprint
+from app.services.verdict_cache import Verdict, VerdictCache
+
+DIGEST = "ab" * 32
+SIZE = 42
+TTL = 3600
+
+
+def make_key(**overrides) -> str:
+    fields = {
+        "sha256": DIGEST,
+        "size": SIZE,
+        "extension": ".pdf",
+        "declared_content_type": "application/pdf",
+        "policy_version": "v1",
+        **overrides,
+    }
+    return VerdictCache.key(**fields)
+
+
+def test_key_normalizes_digest_and_declared_type():
+    assert (
+        make_key(sha256=DIGEST.upper(), declared_content_type="Application/PDF; q=1")
+        == make_key()
+    )
+    assert make_key(size=SIZE + 1) != make_key()
+    assert make_key(policy_version="v2") != make_key()
+
+
+def test_lru_evicts_least_recently_used():
+    cache = VerdictCache(maxsize=2, ttl_seconds=TTL)
+    passed = Verdict(ok=True, sniffed_content_type="application/pdf")
+    cache.set("a", passed)
+    cache.set("b", passed)
+    assert cache.get("a") == passed
+    cache.set("c", passed)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == passed
+    assert cache.get("c") == passed
+
+
+def test_policy_fingerprint_changes_with_policies():
+    before = policy_fingerprint()
+    changed = {
+        **file_type_policy.FILE_TYPE_POLICIES,
+        ".md": FileTypePolicy(
+            allowed=True, expected_mimes=("text/markdown",), sniff_mimes=()
+        ),
+    }
+
+    with patch.object(file_type_policy, "FILE_TYPE_POLICIES", changed):
+        assert policy_fingerprint() != before
+    assert policy_fingerprint() == before
+    assert policy_fingerprint("extra") != before
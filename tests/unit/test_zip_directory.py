@@ -0,0 +1,147 @@
+import io
+import os
+import zipfile
+
+import pytest
+from app.services.zip_directory import (
+    ZipDirectory,
+    ZipDirectoryError,
+    ZipEntry,
+    archive_stats,
+    read_central_directory,
+)
+
+MB = 1024 * 1024
+
+
+def build_zip(entries: list[tuple[str, bytes]], comment: bytes = b"") -> bytes:
+    payload = io.BytesIO()
+    with zipfile.ZipFile(payload, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.comment = comment
+        for name, content in entries:
+            zf.writestr(name, content)
+    return payload.getvalue()
+
+
+class RecordingReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.bytes_read = 0
+
+    def __call__(self, start: int, length: int) -> bytes:
+        self.bytes_read += length
+        return self.data[start : start + length]
+
+
+def assert_matches_zipfile(data: bytes) -> None:
+    listing = read_central_directory(RecordingReader(data), len(data))
+    expected = zipfile.ZipFile(io.BytesIO(data)).infolist()
+
+    assert [entry.name for entry in listing.entries] == [i.filename for i in expected]
+    assert [entry.uncompressed_size for entry in listing.entries] == [
+        i.file_size for i in expected
+    ]
+    assert [entry.compressed_size for entry in listing.entries] == [
+        i.compress_size for i in expected
+    ]
+
+
+def test_lists_entries_with_comment_and_unicode_names():
+    data = build_zip(
+        [("[Content_Types].xml", b"<Types/>"), ("word/résumé.xml", b"x" * 4096)],
+        comment=b"c" * 2000,
+    )
+
+    assert_matches_zipfile(data)
+
+
+def test_reads_only_directory_bytes_for_large_archive():
+    data = build_zip(
+        [("[Content_Types].xml", b"<Types/>"), ("media/big.bin", os.urandom(4 << 20))]
+    )
+    reader = RecordingReader(data)
+
+    listing = read_central_directory(reader, len(data))
+
+    assert listing.names == {"[Content_Types].xml", "media/big.bin"}
+    assert reader.bytes_read < 70 * 1024
+
+
+def test_handles_zip64_records(monkeypatch):
+    monkeypatch.setattr(zipfile, "ZIP_FILECOUNT_LIMIT", 1)
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 16)
+    data = build_zip([("a.xml", b"a" * 100), ("b.xml", b"b" * 200)])
+    monkeypatch.undo()
+
+    listing = read_central_directory(RecordingReader(data), len(data))
+
+    assert listing.zip64 is True
+    assert_matches_zipfile(data)
+
+
+def test_handles_prepended_data():
+    data = b"MZ" + b"\0" * 500 + build_zip([("a.txt", b"hello")])
+
+    assert read_central_directory(RecordingReader(data), len(data)).names == {"a.txt"}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"not a zip at all" * 10, build_zip([("a.txt", b"hello")])[:-30]],
+)
+def test_rejects_missing_or_truncated_directory(data: bytes):
+    with pytest.raises(ZipDirectoryError):
+        read_central_directory(RecordingReader(data), len(data))
+
+
+def test_rejects_oversized_directory():
+    data = build_zip([(f"f{i}.txt", b"") for i in range(50)])
+
+    with pytest.raises(ZipDirectoryError):
+        read_central_directory(
+            RecordingReader(data), len(data), max_directory_bytes=100
+        )
+
+
+def test_archive_stats_from_directory_only():
+    data = build_zip(
+        [
+            ("word/document.xml", b"<w:document/>"),
+            ("word/media/zeros.bin", bytes(8 * MB)),
+            ("word/embeddings/sheet.xlsx", os.urandom(1024)),
+            ("nested/", b""),
+        ]
+    )
+    stats = archive_stats(read_central_directory(RecordingReader(data), len(data)))
+
+    assert stats.entries == 4  # noqa: PLR2004
+    assert stats.total_uncompressed == 8 * MB + 1024 + len(b"<w:document/>")
+    assert stats.max_ratio > 500  # noqa: PLR2004
+    assert stats.nested_archives == 1
+    assert stats.overlapping_entries == 0
+
+
+def entry(name: str, offset: int, compressed: int, uncompressed: int) -> ZipEntry:
+    return ZipEntry(
+        name=name,
+        compressed_size=compressed,
+        uncompressed_size=uncompressed,
+        compress_type=zipfile.ZIP_DEFLATED,
+        flag_bits=0,
+        header_offset=offset,
+    )
+
+
+def test_archive_stats_counts_overlapping_members():
+    # Every member points into the same compressed kernel.
+    kernel = entry("a", 0, 10_000, 10 * MB)
+    directory = ZipDirectory(
+        entries=(kernel, entry("b", 40, 10_000, 10 * MB), entry("c", 80, 10, MB)),
+        directory_size=0,
+        zip64=False,
+    )
+    stats = archive_stats(directory)
+
+    assert stats.overlapping_entries == 2  # noqa: PLR2004
+    assert stats.total_uncompressed == 21 * MB
+    assert stats.max_ratio == MB / 10